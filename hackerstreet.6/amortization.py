@@ -0,0 +1,77 @@
+import math
+
+import numpy as np
+
+
+def _as_arrays(principal, interest_rate, years):
+    principal, interest_rate, years = np.broadcast_arrays(
+        *(np.asarray(values, dtype=np.float64) for values in (principal, interest_rate, years))
+    )
+    if (principal <= 0).any() or (interest_rate <= 0).any() or (years <= 0).any():
+        raise ValueError("All values must be positive")
+    return principal, interest_rate, years
+
+
+def _power(base, exponent):
+    # NumPy's SIMD power can differ from libm's pow in the last bit, which is
+    # enough to flip a rounded cent now and then; math.pow is what the scalar
+    # float ** in app.calculate_payment_plan calls
+    return np.fromiter(map(math.pow, base.ravel().tolist(), exponent.ravel().tolist()),
+                       dtype=np.float64, count=base.size).reshape(base.shape)
+
+
+def amortize(principal, interest_rate, years, exact=True):
+    """Monthly payment, total payment and total interest for arrays of fixed-rate loans.
+
+    interest_rate is the annual rate in percent. With exact=True the arithmetic
+    is the same, operation for operation, as app.calculate_payment_plan, so
+    results agree with it bit for bit; exact=False uses NumPy's faster power.
+    """
+    principal, interest_rate, years = _as_arrays(principal, interest_rate, years)
+    monthly_rate = interest_rate / 12 / 100
+    num_payments = years * 12
+    growth = _power(1 + monthly_rate, num_payments) if exact else (1 + monthly_rate)**num_payments
+    monthly_payment = principal * (monthly_rate * growth) / (growth - 1)
+    total_payment = monthly_payment * num_payments
+    return {
+        'monthly_payment': monthly_payment,
+        'total_payment': total_payment,
+        'total_interest': total_payment - principal
+    }
+
+
+def schedules(principal, interest_rate, years):
+    """Month-by-month interest, principal and remaining balance for each loan.
+
+    Returns arrays shaped (loans, months of the longest loan); months past the
+    end of a shorter loan are NaN. Terms must be whole months.
+    """
+    principal, interest_rate, years = _as_arrays(principal, interest_rate, years)
+    principal, interest_rate, years = np.atleast_1d(principal, interest_rate, years)
+    num_payments = years * 12
+    if (num_payments != np.round(num_payments)).any():
+        raise ValueError("Schedules need terms that are a whole number of months")
+
+    monthly_payment = amortize(principal, interest_rate, years)['monthly_payment'][:, None]
+    monthly_rate = (interest_rate / 12 / 100)[:, None]
+    num_payments = num_payments[:, None]
+    months = np.arange(1, int(num_payments.max()) + 1)[None, :]
+
+    # Closed-form balance after k payments: P * (g^n - g^k) / (g^n - 1)
+    growth_total = (1 + monthly_rate)**num_payments
+    balance = principal[:, None] * (growth_total - (1 + monthly_rate)**months) / (growth_total - 1)
+    previous_balance = np.concatenate([principal[:, None], balance[:, :-1]], axis=1)
+    interest = previous_balance * monthly_rate
+    paid_principal = monthly_payment - interest
+
+    past_end = months > num_payments
+    for values in (balance, interest, paid_principal):
+        values[past_end] = np.nan
+    np.maximum(balance, 0, out=balance, where=~past_end)
+    return {
+        'month': months[0],
+        'payment': np.where(past_end, np.nan, monthly_payment),
+        'interest': interest,
+        'principal': paid_principal,
+        'balance': balance
+    }
@@ -1,20 +1,60 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-import numpy as np
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-import re
 import json
 import logging
+import math
 from logging.handlers import RotatingFileHandler
 import os
-from dotenv import load_dotenv
-from functools import wraps
-import time
+import re
+from functools import partial
+from lazy_loader import LazyResource, ensure_loaded, lazy_import
+from startup_timing import StartupTimer
+
+startup = StartupTimer()
+
+with startup.phase('flask'):
+    from flask import Flask, Response, request, jsonify
+    from flask_cors import CORS
+    from dotenv import load_dotenv
+
+with startup.phase('nltk'):
+    from text_preprocessing import NLTK_DATA_DIR, check_nltk_resources, normalize_batch, normalize_text
+    missing_nltk_resources = check_nltk_resources()
+
+from async_server import AsyncServer, serve
+from entity_matcher import EntityMatcher
+from intent_router import Intent, IntentRouter, no_entities
+from metrics import CONTENT_TYPE, REGISTRY, cache_collector, intents, stage
+from profiling import request_profiler
+from rate_limiter import ClientLimiter
+from response_cache import ResponseCache
+
+# numpy is only needed for the global statistics and batch payment plans;
+# each import shows up under 'lazy' in /api/startup once it has happened
+np = lazy_import('numpy', on_load=startup.record_lazy)
+amortization = lazy_import('amortization', on_load=startup.record_lazy)
+payoff = lazy_import('payoff', on_load=startup.record_lazy)
+knowledge_index = lazy_import('knowledge_index', on_load=startup.record_lazy)
+
+MAX_BATCH_PLANS = 10000
+MAX_BATCH_SCHEDULES = 100
+# Longest accepted term: schedules grow by four values per plan and month,
+# and far longer terms overflow the amortization formula
+MAX_TERM_YEARS = 50
+# Highest accepted annual rate in percent; much higher rates overflow the
+# growth factor over a long term
+MAX_INTEREST_RATE = 1000
+MAX_PAYOFF_DEBTS = 1000
+MAX_PAYOFF_ORDERS = 10
+# Balances per run, debt and month returned when a timeline is requested
+MAX_TIMELINE_VALUES = 200000
+MAX_BATCH_MESSAGES = 1000
+
+# Debts in chat messages: "5000 at 18%", optionally followed by "min 100"
+DEBT_PATTERN = re.compile(
+    r'\$?(\d[\d,]*(?:\.\d+)?)\s*(?:at|@)\s*(\d+(?:\.\d+)?)\s*%'
+    r'(?:\s*(?:apr|interest))?(?:,?\s*min(?:imum)?(?:\s+payment)?\s*(?:of\s*)?\$?(\d[\d,]*(?:\.\d+)?))?',
+    re.IGNORECASE
+)
+BUDGET_PATTERN = re.compile(r'(?:budget|afford)\D{0,12}?(\d[\d,]*(?:\.\d+)?)', re.IGNORECASE)
 
 # Load environment variables
 load_dotenv()
@@ -28,30 +68,20 @@ handler.setFormatter(logging.Formatter(
 ))
 logger.addHandler(handler)
 
-# Download NLTK resources
-try:
-    nltk.download('punkt')
-    nltk.download('stopwords')
-except Exception as e:
-    logger.error(f"Error downloading NLTK resources: {str(e)}")
+# Check the vendored NLTK resources (no network access)
+if missing_nltk_resources:
+    logger.error(f"Missing NLTK resources in {NLTK_DATA_DIR}: {', '.join(missing_nltk_resources)}")
 
 app = Flask(__name__)
 CORS(app)
 
-# Rate limiting decorator
-def rate_limit(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        # Simple rate limiting - 10 requests per minute
-        if not hasattr(app, 'request_times'):
-            app.request_times = []
-        current_time = time.time()
-        app.request_times = [t for t in app.request_times if current_time - t < 60]
-        if len(app.request_times) >= 10:
-            return jsonify({"error": "Rate limit exceeded. Please try again later."}), 429
-        app.request_times.append(current_time)
-        return f(*args, **kwargs)
-    return decorated_function
+# Per-client token buckets; RATE_LIMIT_FILE shares them between worker processes
+limiter = ClientLimiter.from_env()
+rate_limit = limiter.limit
+# /api/chat/batch has its own budget, counted in messages rather than requests:
+# BATCH_RATE_LIMIT messages per BATCH_RATE_LIMIT_PERIOD, ten full batches a minute by default
+batch_limiter = ClientLimiter.from_env('BATCH_RATE_LIMIT', limit=10 * MAX_BATCH_MESSAGES,
+                                       backend=limiter.limiter.backend, scope='batch:')
 
 # Global debt data
 debt_data = {
@@ -69,6 +99,9 @@ debt_data = {
     ]
 }
 
+# Matches country names and aliases in chat messages
+country_matcher = EntityMatcher(c["name"] for c in debt_data["countries"])
+
 # Knowledge base for responses
 knowledge_base = {
     "greeting": [
@@ -84,6 +117,10 @@ knowledge_base = {
         "I can help create a payment plan. Please provide:\n1. Total debt amount\n2. Interest rate\n3. Repayment period",
         "For a payment plan, I need:\n- Debt amount\n- Interest rate\n- Years to repay"
     ],
+    "payoff_plan": [
+        "To plan paying off several debts, tell me each one and your monthly budget, e.g. "
+        "\"5000 at 18% min 100, 12000 at 6% min 250, budget 1000\""
+    ],
     "error": [
         "I'm not sure I understand. Could you rephrase that?",
         "I need more information to help with that. Could you be more specific?",
@@ -94,12 +131,7 @@ knowledge_base = {
 def preprocess_text(text):
     """Preprocess text for similarity comparison"""
     try:
-        text = text.lower()
-        text = re.sub(r'[^\w\s]', '', text)
-        tokens = word_tokenize(text)
-        stop_words = set(stopwords.words('english'))
-        tokens = [token for token in tokens if token not in stop_words]
-        return ' '.join(tokens)
+        return normalize_text(text)
     except Exception as e:
         logger.error(f"Error in text preprocessing: {str(e)}")
         return text.lower()
@@ -166,86 +198,291 @@ def get_global_stats():
         logger.error(f"Error calculating global stats: {str(e)}")
         raise
 
-def process_query(query):
-    """Process user query and generate appropriate response"""
+def parse_payoff_request(raw_query):
+    """Find several debts, a monthly budget and a preferred strategy in a chat message.
+
+    Returns ((balance, rate, minimum) tuples, budget or None, strategy) or None
+    when the message names no budget, strategy or more than one debt.
+    """
+    debts = []
+    for balance, rate, minimum in DEBT_PATTERN.findall(raw_query):
+        balance = float(balance.replace(',', ''))
+        # Without a stated minimum, assume the common 2% of the balance, at least $25
+        minimum = float(minimum.replace(',', '')) if minimum else max(25.0, round(balance * 0.02, 2))
+        debts.append((balance, float(rate), minimum))
+    budget = BUDGET_PATTERN.search(raw_query)
+    lowered = raw_query.lower()
+    strategy = 'snowball' if 'snowball' in lowered else 'avalanche'
+    if len(debts) < 2 and not budget and 'avalanche' not in lowered and 'snowball' not in lowered:
+        return None
+    return tuple(debts), float(budget.group(1).replace(',', '')) if budget else None, strategy
+
+def payoff_plan_response(debts, budget, strategy):
+    """Compare avalanche and snowball payoff of several debts under a monthly budget"""
+    if budget is None or not debts:
+        return {"type": "payoff_plan_request", "message": knowledge_base["payoff_plan"][0]}
+    balances, rates, minimums = zip(*debts)
+    strategies = (strategy,) + tuple(name for name in payoff.STRATEGIES if name != strategy)
     try:
-        query = preprocess_text(query)
-        
-        # Check for payment plan request
-        if any(word in query for word in ["payment", "repay", "plan", "monthly"]):
-            numbers = re.findall(r'\d+', query)
-            if len(numbers) >= 2:
-                try:
-                    principal = float(numbers[0]) * 1000
-                    interest_rate = float(numbers[1])
-                    years = float(numbers[2]) if len(numbers) > 2 else 10
-                    plan = calculate_payment_plan(principal, interest_rate, years)
-                    return {
-                        "type": "payment_plan",
-                        "data": plan,
-                        "message": f"Here's your payment plan:\n\n" +
-                                  f"💰 Monthly Payment: ${plan['monthly_payment']}\n" +
-                                  f"💵 Total Interest: ${plan['total_interest']}\n" +
-                                  f"💸 Total Payment: ${plan['total_payment']}\n" +
-                                  f"⏱️ Term: {years} years"
-                    }
-                except ValueError as e:
-                    return {
-                        "type": "error",
-                        "message": "Please provide valid numbers for the payment plan calculation."
-                    }
+        result = payoff.compare_strategies(balances, rates, minimums, budget, strategies=strategies)
+    except ValueError as e:
+        return {"type": "error", "message": str(e)}
+
+    lines = []
+    for plan in result["plans"]:
+        if plan["paid_off"]:
+            order = sorted(range(len(debts)), key=lambda i: plan["debts"][i]["payoff_month"])
+            lines.append(f"{'❄️' if plan['strategy'] == 'snowball' else '🏔️'} {plan['strategy'].title()}: "
+                         f"debt-free in {plan['months']} months ({plan['debt_free_date'][:7]})\n"
+                         f"   💵 Total Interest: ${plan['total_interest']:,.2f} "
+                         f"(saves ${plan['interest_saved']:,.2f} over minimum payments)\n"
+                         f"   📋 Payoff order: " + ", ".join(f"${debts[i][0]:,.0f} at {debts[i][1]:g}%" for i in order))
+        else:
+            lines.append(f"{plan['strategy'].title()}: not paid off within {plan['months']} months at this budget")
+    return {
+        "type": "payoff_plan",
+        "data": result,
+        "message": f"Here's your debt payoff plan with ${budget:,.2f} a month:\n\n" + "\n\n".join(lines)
+    }
+
+def payoff_response(message, raw_query):
+    """Plan paying off the debts in the query; declines messages about a single loan"""
+    payoff_request = parse_payoff_request(raw_query)
+    if payoff_request is None:
+        return None
+    return payoff_plan_response(*payoff_request)
+
+def payment_plan_response(message, raw_query):
+    """Build a payment plan from the numbers in the query, or ask for them"""
+    numbers = re.findall(r'\d+', message.text)
+    if len(numbers) >= 2:
+        try:
+            principal = float(numbers[0]) * 1000
+            interest_rate = float(numbers[1])
+            years = float(numbers[2]) if len(numbers) > 2 else 10
+            plan = calculate_payment_plan(principal, interest_rate, years)
             return {
-                "type": "payment_plan_request",
-                "message": knowledge_base["payment_plan"][0]
+                "type": "payment_plan",
+                "data": plan,
+                "message": f"Here's your payment plan:\n\n" +
+                          f"💰 Monthly Payment: ${plan['monthly_payment']}\n" +
+                          f"💵 Total Interest: ${plan['total_interest']}\n" +
+                          f"💸 Total Payment: ${plan['total_payment']}\n" +
+                          f"⏱️ Term: {years} years"
             }
-        
-        # Check for country-specific query
-        for country in debt_data["countries"]:
-            if country["name"].lower() in query:
-                info = get_country_info(country["name"])
-                if info:
-                    return {
-                        "type": "country_info",
-                        "data": info,
-                        "message": f"Here's the debt information for {info['name']}:\n\n" +
-                                  f"📊 Debt-to-GDP Ratio: {info['debt_gdp']}%\n" +
-                                  f"💰 Total Debt: {info['debt_usd_formatted']}"
-                    }
-        
-        # Check for global statistics
-        if any(word in query for word in ["global", "total", "average", "highest", "lowest"]):
-            stats = get_global_stats()
+        except ValueError as e:
             return {
-                "type": "global_stats",
-                "data": stats,
-                "message": f"Global Debt Statistics:\n\n" +
-                          f"🌍 Total Global Debt: {stats['total_debt']}\n" +
-                          f"📊 Average Debt-to-GDP: {stats['average_debt_gdp']}\n" +
-                          f"⬆️ Highest Debt: {stats['highest_debt']['country']} ({stats['highest_debt']['ratio']})\n" +
-                          f"⬇️ Lowest Debt: {stats['lowest_debt']['country']} ({stats['lowest_debt']['ratio']})"
+                "type": "error",
+                "message": "Please provide valid numbers for the payment plan calculation."
             }
+    return {
+        "type": "payment_plan_request",
+        "message": knowledge_base["payment_plan"][0]
+    }
+
+def country_info_response(message, raw_query):
+    """Answer with debt data for the first country mentioned"""
+    country = country_matcher.find(raw_query)
+    if not country:
+        return None
+    info = get_country_info(country)
+    if not info:
+        return None
+    return {
+        "type": "country_info",
+        "data": info,
+        "message": f"Here's the debt information for {info['name']}:\n\n" +
+                  f"📊 Debt-to-GDP Ratio: {info['debt_gdp']}%\n" +
+                  f"💰 Total Debt: {info['debt_usd_formatted']}"
+    }
+
+def global_stats_response(message, raw_query):
+    """Answer with global debt statistics"""
+    stats = get_global_stats()
+    return {
+        "type": "global_stats",
+        "data": stats,
+        "message": f"Global Debt Statistics:\n\n" +
+                  f"🌍 Total Global Debt: {stats['total_debt']}\n" +
+                  f"📊 Average Debt-to-GDP: {stats['average_debt_gdp']}\n" +
+                  f"⬆️ Highest Debt: {stats['highest_debt']['country']} ({stats['highest_debt']['ratio']})\n" +
+                  f"⬇️ Lowest Debt: {stats['lowest_debt']['country']} ({stats['lowest_debt']['ratio']})"
+    }
+
+def greeting_response(message, raw_query):
+    """Answer greetings and requests for help"""
+    return {
+        "type": "greeting",
+        "message": knowledge_base["greeting"][0]
+    }
+
+def payoff_key(message, raw_query):
+    return parse_payoff_request(raw_query)
+
+def payment_plan_key(message, raw_query):
+    return tuple(re.findall(r'\d+', message.text))
+
+def country_key(message, raw_query):
+    return country_matcher.find(raw_query)
+
+# Answers are pure functions of the intent and its entities (debt_data is
+# static), so repeated questions are served from the cache
+response_cache = ResponseCache(
+    max_entries=int(os.getenv('RESPONSE_CACHE_SIZE', 1024)),
+    ttl=float(os.getenv('RESPONSE_CACHE_TTL', 300))
+)
+REGISTRY.add_collector(cache_collector(response_cache))
+
+# Opt-in sampling profiler for single requests; see /api/profiles
+profiler = request_profiler()
+
+# Intent table, checked in priority order; keywords ending in * match as prefixes
+query_router = IntentRouter([
+    # Driven by the debts and budget in the message rather than keywords, so
+    # a bare "5000 at 18%, 12000 at 6%, budget 1000" is still understood
+    Intent("payoff_plan", payoff_response, priority=5, cache_key=payoff_key),
+    Intent("payment_plan", payment_plan_response,
+           ("payment*", "repay*", "plan*", "monthly", "payoff*"), priority=10,
+           cache_key=payment_plan_key),
+    Intent("country_info", country_info_response, priority=20, cache_key=country_key),
+    Intent("global_stats", global_stats_response, ("global*", "total*", "average*", "highest", "lowest"), priority=30,
+           cache_key=no_entities),
+    Intent("greeting", greeting_response, ("hello", "hi", "hey", "help*"), priority=40, cache_key=no_entities)
+], cache=response_cache)
+
+# Ways people ask for each knowledge-base category, for similarity search.
+# Each phrasing is its own entry: short queries score far higher against a
+# short phrasing than against one long document per category.
+KNOWLEDGE_TOPICS = {
+    "greeting": [
+        "hello", "hi there", "hey", "greetings", "good morning", "good afternoon",
+        "good evening", "good day", "howdy", "welcome"
+    ],
+    "capabilities": [
+        "what can this assistant do", "what are your features", "features and services", "what services do you offer",
+        "your abilities", "what are you able to help with", "what do you specialize in", "capabilities"
+    ],
+    "payment_plan": [
+        "payment plan", "repay a loan", "monthly installment", "how long to pay off my loan",
+        "loan repayment schedule", "how much should I pay each month"
+    ],
+    "payoff_plan": [
+        "pay off several debts", "pay off multiple credit cards", "avalanche or snowball",
+        "which debt to pay first", "budget to pay down debts", "I have several credit cards"
+    ]
+}
+
+def knowledge_entries():
+    """Searchable text for the knowledge-base answers: every phrasing and every answer text"""
+    entries = []
+    for category, phrasings in KNOWLEDGE_TOPICS.items():
+        answer = {"type": category, "message": knowledge_base[category][0]}
+        entries += [(text, answer) for text in phrasings + knowledge_base[category]]
+    return entries
+
+# Built on the first query the router can't place; KNOWLEDGE_INDEX_PATH
+# persists it between restarts
+knowledge_search = LazyResource('knowledge index', lambda: knowledge_index.KnowledgeIndex.load_or_build(
+    knowledge_entries(), os.getenv('KNOWLEDGE_INDEX_PATH')), on_load=startup.record_lazy)
+RETRIEVAL_THRESHOLD = float(os.getenv('RETRIEVAL_THRESHOLD', 0.3))
+
+def retrieve_knowledge(query):
+    """The closest knowledge-base answer, or None if nothing is similar enough"""
+    try:
+        return knowledge_search.get().best(query, RETRIEVAL_THRESHOLD)
+    except Exception as e:
+        logger.error(f"Error searching the knowledge index: {str(e)}")
+        return None
+
+def retrieve_knowledge_batch(queries):
+    """retrieve_knowledge for many queries, scored in one pass"""
+    try:
+        matches = knowledge_search.get().search_batch(queries, 1, RETRIEVAL_THRESHOLD)
+        return [found[0][0] if found else None for found in matches]
+    except Exception as e:
+        logger.error(f"Error searching the knowledge index: {str(e)}")
+        return [None] * len(queries)
+
+def fallback_response():
+    return {
+        "type": "error",
+        "message": knowledge_base["error"][0]
+    }
+
+def processing_error_response():
+    return {
+        "type": "error",
+        "message": "I encountered an error processing your request. Please try again."
+    }
+
+def process_queries(queries):
+    """Answer a batch of queries in order, like process_query but with the work shared.
+
+    Each distinct query is answered once, all of them are normalized in one
+    pass, and the ones no intent matches are scored against the knowledge
+    index together.
+    """
+    unique = list(dict.fromkeys(queries))
+    try:
+        with stage('preprocess'):
+            normalized = normalize_batch(unique)
+    except Exception as e:
+        logger.error(f"Error in text preprocessing: {str(e)}")
+        normalized = [preprocess_text(query) for query in unique]
+
+    answers = {}
+    for raw_query, query in zip(unique, normalized):
+        try:
+            intent, response = query_router.route(query, raw_query=raw_query)
+        except Exception as e:
+            logger.error(f"Error processing query: {str(e)}")
+            intent, response = 'error', processing_error_response()
+        if response:
+            answers[raw_query] = (intent, response)
+
+    unmatched = [query for query in unique if query not in answers]
+    if unmatched:
+        with stage('retrieve'):
+            retrieved = retrieve_knowledge_batch(unmatched)
+        for query, response in zip(unmatched, retrieved):
+            answers[query] = ('retrieval', response) if response else ('fallback', fallback_response())
+
+    results = []
+    for query in queries:
+        intent, response = answers[query]
+        intents.inc(intent)
+        results.append(response)
+    return results
+
+def process_query(query):
+    """Process user query and generate appropriate response"""
+    try:
+        raw_query = query
+        with stage('preprocess'):
+            query = preprocess_text(query)
         
-        # Check for greeting or capabilities
-        if any(word in query for word in ["hello", "hi", "hey", "help"]):
-            return {
-                "type": "greeting",
-                "message": knowledge_base["greeting"][0]
-            }
+        intent, response = query_router.route(query, raw_query=raw_query)
+        if response:
+            intents.inc(intent)
+            return response
+
+        # Then the closest knowledge-base entry, if it is similar enough
+        with stage('retrieve'):
+            response = retrieve_knowledge(raw_query)
+        if response:
+            intents.inc('retrieval')
+            return response
         
         # Default response
-        return {
-            "type": "error",
-            "message": knowledge_base["error"][0]
-        }
+        intents.inc('fallback')
+        return fallback_response()
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}")
-        return {
-            "type": "error",
-            "message": "I encountered an error processing your request. Please try again."
-        }
+        return processing_error_response()
 
 @app.route('/api/chat', methods=['POST'])
 @rate_limit
+@profiler.wrap
 def chat():
     try:
         if not request.is_json:
@@ -259,13 +496,210 @@ def chat():
         if not query or not isinstance(query, str):
             return jsonify({"error": "Invalid message format"}), 400
         
-        response = process_query(query)
-        return jsonify(response)
+        with stage('request'):
+            response = process_query(query)
+            with stage('format'):
+                return jsonify(response)
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+def parse_plan(plan, with_schedule=False):
+    """Validate one batch entry; returns ((principal, interest_rate, years), None) or (None, error)"""
+    if not isinstance(plan, dict):
+        return None, "Each plan must be an object"
+    try:
+        values = tuple(float(plan[key]) for key in ('principal', 'interest_rate', 'years'))
+    except (KeyError, TypeError, ValueError):
+        return None, "Each plan needs numeric principal, interest_rate and years"
+    if not all(math.isfinite(value) and value > 0 for value in values):
+        return None, "All values must be positive"
+    if values[1] > MAX_INTEREST_RATE:
+        return None, f"Interest rates are limited to {MAX_INTEREST_RATE}% a year"
+    if values[2] > MAX_TERM_YEARS:
+        return None, f"Terms are limited to {MAX_TERM_YEARS} years"
+    if with_schedule and values[2] * 12 != round(values[2] * 12):
+        return None, "Schedules need a term that is a whole number of months"
+    return values, None
+
+@app.route('/api/chat/batch', methods=['POST'])
+@profiler.wrap
+def chat_batch():
+    """Answer many messages in one request: {"messages": [...]} -> {"results": [...]}, in order.
+
+    Each message costs one token of the client's batch budget (BATCH_RATE_LIMIT
+    messages per BATCH_RATE_LIMIT_PERIOD), separate from the per-request limit.
+    """
+    try:
+        if not request.is_json:
+            return jsonify({"error": "Request must be JSON"}), 400
+
+        data = request.json
+        messages = data.get('messages') if isinstance(data, dict) else None
+        if not isinstance(messages, list) or not messages:
+            return jsonify({"error": "messages must be a non-empty list"}), 400
+        max_messages = min(MAX_BATCH_MESSAGES, batch_limiter.capacity)
+        if len(messages) > max_messages:
+            return jsonify({"error": f"At most {max_messages} messages per request"}), 400
+        limited = batch_limiter.check(cost=len(messages))
+        if limited:
+            return limited
+
+        valid = [message for message in messages if message and isinstance(message, str)]
+        answers = iter(process_queries(valid) if valid else [])
+        results = [next(answers) if message and isinstance(message, str) else {"error": "Invalid message format"}
+                   for message in messages]
+        with stage('format'):
+            return jsonify({"results": results})
+    except Exception as e:
+        logger.error(f"Error in batch chat endpoint: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/api/payment-plans/batch', methods=['POST'])
+@rate_limit
+def payment_plans_batch():
+    """Compute many payment plans, optionally with monthly schedules, in one vectorized call"""
+    try:
+        if not request.is_json:
+            return jsonify({"error": "Request must be JSON"}), 400
+
+        data = request.json
+        plans = data.get('plans') if isinstance(data, dict) else None
+        if not isinstance(plans, list) or not plans:
+            return jsonify({"error": "plans must be a non-empty list"}), 400
+        with_schedule = bool(data.get('schedule'))
+        max_plans = MAX_BATCH_SCHEDULES if with_schedule else MAX_BATCH_PLANS
+        if len(plans) > max_plans:
+            return jsonify({"error": f"At most {max_plans} plans per request"}), 400
+
+        parsed = [parse_plan(plan, with_schedule) for plan in plans]
+        valid = [values for values, error in parsed if error is None]
+        if valid:
+            principal, interest_rate, years = np.array(valid).T
+            # Overflowing plans are reported one by one below
+            with np.errstate(over='ignore', invalid='ignore'):
+                summary = amortization.amortize(principal, interest_rate, years)
+                schedule = amortization.schedules(principal, interest_rate, years) if with_schedule else None
+
+        results = []
+        row = 0
+        for plan, (values, error) in zip(plans, parsed):
+            if error:
+                results.append({"error": error})
+                continue
+            if not math.isfinite(summary['total_payment'][row]):
+                # A principal near the float limit overflows even at a bounded rate
+                results.append({"error": "Plan values are too large"})
+                row += 1
+                continue
+            result = {
+                "monthly_payment": round(float(summary['monthly_payment'][row]), 2),
+                "total_interest": round(float(summary['total_interest'][row]), 2),
+                "total_payment": round(float(summary['total_payment'][row]), 2),
+                "years": values[2]
+            }
+            if with_schedule:
+                months = int(round(values[2] * 12))
+                result["schedule"] = {
+                    key: [round(value, 2) for value in schedule[key][row, :months].tolist()]
+                    for key in ('payment', 'interest', 'principal', 'balance')
+                }
+            results.append(result)
+            row += 1
+        return jsonify({"plans": results})
+    except Exception as e:
+        logger.error(f"Error in batch payment plans: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+def debt_index(value):
+    """A debt index from JSON: an integer, or a float or string holding one"""
+    index = int(value)
+    if index != float(value):
+        raise ValueError(f"{value!r} is not a debt index")
+    return index
+
+@app.route('/api/payoff-plans', methods=['POST'])
+@rate_limit
+def payoff_plans():
+    """Simulate paying off several debts with avalanche, snowball and custom orderings"""
+    try:
+        if not request.is_json:
+            return jsonify({"error": "Request must be JSON"}), 400
+
+        data = request.json if isinstance(request.json, dict) else {}
+        debts = data.get('debts')
+        if not isinstance(debts, list) or not debts or len(debts) > MAX_PAYOFF_DEBTS:
+            return jsonify({"error": f"debts must be a list of 1 to {MAX_PAYOFF_DEBTS} debts"}), 400
+        try:
+            balances = [float(debt['balance']) for debt in debts]
+            rates = [float(debt['interest_rate']) for debt in debts]
+            minimums = [float(debt.get('minimum_payment', max(25.0, round(float(debt['balance']) * 0.02, 2))))
+                        for debt in debts]
+            budget = float(data['budget'])
+            max_months = min(int(data.get('max_months', 360)), 600)
+        except (KeyError, TypeError, ValueError, AttributeError, OverflowError):
+            return jsonify({"error": "Each debt needs a numeric balance and interest_rate, plus a numeric budget"}), 400
+        if max_months < 1:
+            return jsonify({"error": "max_months must be at least 1"}), 400
+        if not all(math.isfinite(value) and value >= 0 for value in balances + rates + minimums + [budget]):
+            return jsonify({"error": "Balances, rates, minimum payments and the budget must be non-negative numbers"}), 400
+        orders = data.get('orders') or []
+        if not isinstance(orders, list) or len(orders) > MAX_PAYOFF_ORDERS:
+            return jsonify({"error": f"orders must be a list of at most {MAX_PAYOFF_ORDERS} orders"}), 400
+        try:
+            orders = [[debt_index(index) for index in order] for order in orders]
+        except (TypeError, ValueError, OverflowError):
+            return jsonify({"error": "orders must be lists of debt indexes"}), 400
+        # Checked here rather than in the simulation, before any work is done
+        if any(sorted(order) != list(range(len(debts))) for order in orders):
+            return jsonify({"error": "Each order must list every debt index exactly once"}), 400
+        timeline = bool(data.get('timeline'))
+        if timeline and (len(payoff.STRATEGIES) + len(orders)) * len(debts) * max_months > MAX_TIMELINE_VALUES:
+            return jsonify({"error": f"Timelines are limited to {MAX_TIMELINE_VALUES} values; "
+                                     f"lower max_months or send fewer debts or orders"}), 400
+
+        result = payoff.compare_strategies(balances, rates, minimums, budget,
+                                           orders=orders, max_months=max_months, timeline=timeline)
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in payoff plans: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/api/cache', methods=['GET'])
+def cache_stats():
+    """Response cache counters"""
+    return jsonify(response_cache.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Stage latencies, intents and cache statistics in Prometheus text format"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+@app.route('/api/profiles', methods=['GET'])
+def profiles():
+    """Sampled stacks of the latest requests sent with X-Profile: 1 (PROFILE_REQUESTS=true)"""
+    return jsonify({"enabled": profiler.enabled, "profiles": profiler.recent()})
+
+@app.route('/api/startup', methods=['GET'])
+def startup_report():
+    """Import and initialization cost of this worker, by phase, plus what has been loaded on first use"""
+    return jsonify(startup.report())
+
+startup.log_report(logger)
+
+# ASGI entry point; every handler here is rule-based and runs inline, so the
+# lazily loaded modules and the knowledge index are loaded before serving, and
+# rate limits stay in memory rather than behind RATE_LIMIT_FILE's file locks
+asgi_app = AsyncServer(app, warm_up=(knowledge_search.get, partial(ensure_loaded, np),
+                                     partial(ensure_loaded, amortization), partial(ensure_loaded, payoff)),
+                       on_start=(limiter.keep_in_memory, batch_limiter.keep_in_memory))
+
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('DEBUG', 'False').lower() == 'true'
-    app.run(debug=debug, port=port) 
\ No newline at end of file
+    if os.getenv('SERVER_MODE') == 'asgi':
+        serve(asgi_app, host='127.0.0.1', port=port)
+    else:
+        app.run(debug=debug, port=port) 
\ No newline at end of file
@@ -0,0 +1,322 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+BUSY_BODY = json.dumps({"error": "Server busy, please try again shortly", "status": "error"}).encode()
+
+_inline = threading.local()
+
+
+class Offload(BaseException):
+    """Raised by offload() while a request runs on the event loop.
+
+    Derives from BaseException, like GeneratorExit, so handlers' own
+    `except Exception` blocks let it through to the server.
+    """
+
+    def __init__(self, pool, state):
+        super().__init__(pool)
+        self.pool = pool
+        self.state = state
+
+
+def offload(pool, state=True):
+    """Mark the current request as slow: under AsyncServer it is restarted on the named
+    executor; under a plain WSGI server this is a no-op.
+
+    The restarted request sees `state` through resumed(), so it can skip
+    straight past the work done before offloading.
+    """
+    if getattr(_inline, 'active', False):
+        raise Offload(pool, state)
+
+
+def resumed():
+    """The state passed to offload() if this request was restarted on an executor, else None"""
+    return getattr(_inline, 'resumed', None)
+
+
+class BoundedExecutor:
+    """A thread pool that refuses work once workers + queue_size tasks are in flight"""
+
+    def __init__(self, name, workers, queue_size):
+        self.name = name
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{name}-worker')
+
+    def submit(self, fn, *args):
+        """Schedule fn(*args); returns a Future, or None when the pool is full"""
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.rejected += 1
+                return None
+            self.in_flight += 1
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'capacity': self.capacity,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def default_executors():
+    """The 'model' pool for inference and the 'io' pool for disk reads, sized from the environment"""
+    return {
+        'model': BoundedExecutor('model', int(os.getenv('ASYNC_MODEL_WORKERS', 2)),
+                                 int(os.getenv('ASYNC_MODEL_QUEUE', 16))),
+        'io': BoundedExecutor('io', int(os.getenv('ASYNC_IO_WORKERS', 4)),
+                              int(os.getenv('ASYNC_IO_QUEUE', 64)))
+    }
+
+
+def wsgi_environ(scope, body):
+    """A WSGI environ for an ASGI HTTP request whose body has been read in full"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client')
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False
+    }
+    if client:
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = client[0], str(client[1])
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def response_start(status, headers):
+    return {
+        'type': 'http.response.start',
+        'status': int(status.split(' ', 1)[0]),
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+    }
+
+
+class AsyncServer:
+    """Serve a WSGI app over ASGI without letting slow requests hold up fast ones.
+
+    Requests run inline on the event loop, which suits the rule-based
+    handlers. A handler that is about to run the model or read from disk
+    calls offload(pool); the request is then restarted on that bounded
+    executor, and answered with 503 if the executor's queue is full. Bodies
+    produced on an executor are streamed back chunk by chunk.
+
+    warm_up callables (e.g. LazyResource.get) run on threads at lifespan
+    startup, before any request is served, so lazily built resources are
+    never built on the event loop. on_start callables run once, before
+    anything else, to switch the app into its ASGI configuration; they also
+    run on the first request when the server skips the lifespan protocol.
+    """
+
+    def __init__(self, wsgi_app, executors=None, warm_up=(), on_start=()):
+        self.wsgi_app = wsgi_app
+        self.executors = executors if executors is not None else default_executors()
+        self.warm_up = tuple(warm_up)
+        self.on_start = tuple(on_start)
+        self.inline = 0
+        self.offloaded = 0
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def stats(self):
+        return {
+            'inline': self.inline,
+            'offloaded': self.offloaded,
+            'executors': {name: executor.stats() for name, executor in self.executors.items()}
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self._start()
+                await self._warm_up()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for executor in self.executors.values():
+                    executor.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _start(self):
+        if self._started:
+            return
+        with self._start_lock:
+            if not self._started:
+                for start in self.on_start:
+                    start()
+                self._started = True
+
+    async def _warm_up(self):
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(loop.run_in_executor(None, warm) for warm in self.warm_up),
+                                       return_exceptions=True)
+        for warm, result in zip(self.warm_up, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error warming up {getattr(warm, '__qualname__', warm)}: {str(result)}")
+
+    async def _http(self, scope, receive, send):
+        self._start()
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body = b''.join(chunks)
+
+        try:
+            status, headers, content = self._run_inline(wsgi_environ(scope, body))
+        except Offload as request:
+            await self._run_offloaded(request.pool, request.state, wsgi_environ(scope, body), receive, send)
+            return
+
+        self.inline += 1
+        await send(response_start(status, headers))
+        await send({'type': 'http.response.body', 'body': content})
+
+    def _run_inline(self, environ):
+        # Buffer the whole response so an offload() anywhere in the handler,
+        # even while its body is being generated, leaves nothing half-sent
+        started = []
+        _inline.active = True
+        try:
+            result = self.wsgi_app(environ, lambda status, headers, exc_info=None: started.append((status, headers)))
+            try:
+                content = b''.join(result)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        finally:
+            _inline.active = False
+        status, headers = started[-1]
+        return status, headers, content
+
+    async def _run_offloaded(self, pool, state, environ, receive, send):
+        executor = self.executors.get(pool)
+        if executor is None:
+            raise RuntimeError(f"No executor named {pool!r}")
+
+        loop = asyncio.get_running_loop()
+        messages = asyncio.Queue()
+        disconnected = threading.Event()
+
+        def put(message):
+            loop.call_soon_threadsafe(messages.put_nowait, message)
+
+        def respond():
+            started = []
+            headers_sent = False
+            _inline.resumed = state
+            try:
+                result = self.wsgi_app(environ, lambda status, headers, exc_info=None: started.append((status, headers)))
+                try:
+                    for chunk in result:
+                        if disconnected.is_set():
+                            break
+                        if started:
+                            put(response_start(*started.pop()))
+                            headers_sent = True
+                        if chunk:
+                            put({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                    if started:
+                        put(response_start(*started.pop()))
+                        headers_sent = True
+                finally:
+                    if hasattr(result, 'close'):
+                        result.close()
+            except Exception:
+                logger.exception(f"Error serving {environ['PATH_INFO']} on the {pool} executor")
+                if not headers_sent:
+                    put(response_start('500 Internal Server Error', [('Content-Type', 'text/plain')]))
+            finally:
+                _inline.resumed = None
+                put(None)
+
+        if executor.submit(respond) is None:
+            await send(response_start('503 Service Unavailable', [
+                ('Content-Type', 'application/json'), ('Retry-After', '1')
+            ]))
+            await send({'type': 'http.response.body', 'body': BUSY_BODY})
+            return
+
+        self.offloaded += 1
+        watcher = asyncio.ensure_future(self._watch_disconnect(receive, disconnected))
+        try:
+            while True:
+                message = await messages.get()
+                if message is None:
+                    break
+                await send(message)
+            await send({'type': 'http.response.body', 'body': b''})
+        except (OSError, asyncio.CancelledError):
+            # The client went away; stop generating for it
+            disconnected.set()
+            raise
+        finally:
+            watcher.cancel()
+
+    async def _watch_disconnect(self, receive, disconnected):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        disconnected.set()
+
+
+def serve(asgi_app, host='0.0.0.0', port=5000):
+    """Run an AsyncServer under uvicorn (SERVER_MODE=asgi)"""
+    import uvicorn
+    uvicorn.run(asgi_app, host=host, port=port)
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from amortization import amortize, schedules
+
+
+def scalar_plan(principal, interest_rate, years):
+    """The per-call annuity of app.calculate_payment_plan, without the Flask app around it"""
+    monthly_rate = interest_rate / 12 / 100
+    num_payments = years * 12
+    monthly_payment = principal * (monthly_rate * (1 + monthly_rate)**num_payments) / ((1 + monthly_rate)**num_payments - 1)
+    total_payment = monthly_payment * num_payments
+    total_interest = total_payment - principal
+    return {
+        "monthly_payment": round(monthly_payment, 2),
+        "total_interest": round(total_interest, 2),
+        "total_payment": round(total_payment, 2),
+        "years": years
+    }
+
+
+def make_plans(n_plans, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.uniform(1_000, 1_000_000, n_plans).round(2),
+            rng.uniform(0.5, 25, n_plans).round(3),
+            rng.integers(1, 41, n_plans).astype(float))
+
+
+def timed(function, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    print(f"{'plans':>8} {'loop ms':>9} {'exact ms':>9} {'fast ms':>9} {'schedules ms':>13}")
+    for n_plans in (100, 1_000, 10_000, 100_000):
+        principal, interest_rate, years = make_plans(n_plans)
+        plans = list(zip(principal.tolist(), interest_rate.tolist(), years.tolist()))
+
+        loop_time, looped = timed(lambda: [scalar_plan(*plan) for plan in plans])
+        exact_time, exact = timed(lambda: amortize(principal, interest_rate, years))
+        fast_time, _ = timed(lambda: amortize(principal, interest_rate, years, exact=False))
+        schedule_time, _ = timed(lambda: schedules(principal[:1000], interest_rate[:1000], years[:1000]), repeat=1)
+
+        assert [plan["monthly_payment"] for plan in looped] == [round(value, 2) for value in exact['monthly_payment'].tolist()]
+        assert [plan["total_interest"] for plan in looped] == [round(value, 2) for value in exact['total_interest'].tolist()]
+        print(f"{n_plans:>8} {loop_time * 1000:>9.2f} {exact_time * 1000:>9.2f} {fast_time * 1000:>9.2f} "
+              f"{schedule_time * 1000:>13.2f}")
+    print("(schedules: the first 1000 plans, month by month)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Rule-based answers and ones that need the model, for trained_chatbot
+FAST_MESSAGES = ["Tell me about Japan", "What is inflation?", "Compare debt of Japan and Germany"]
+SLOW_MESSAGES = ["hey, how has your week been?", "what do you think about the weather lately"]
+
+
+def post(url, message):
+    """POST one chat message; returns (status, seconds)"""
+    request = urllib.request.Request(url, data=json.dumps({"message": message}).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - start
+
+
+def client(url, messages, deadline, results):
+    i = 0
+    while time.perf_counter() < deadline:
+        results.append(post(url, messages[i % len(messages)]))
+        i += 1
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float('nan')
+
+
+def main(url, fast_clients=8, slow_clients=4, duration=20.0):
+    """Run fast and slow chat clients side by side against a running server.
+
+    Start the server once with the Flask dev server and once with
+    SERVER_MODE=asgi and compare the fast clients' latency and throughput.
+    """
+    deadline = time.perf_counter() + duration
+    results = {'fast': [], 'slow': []}
+    threads = [threading.Thread(target=client, args=(url, FAST_MESSAGES, deadline, results['fast']))
+               for _ in range(fast_clients)]
+    threads += [threading.Thread(target=client, args=(url, SLOW_MESSAGES, deadline, results['slow']))
+                for _ in range(slow_clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"{'load':<6} {'requests':>9} {'req/s':>8} {'503s':>6} {'p50 ms':>9} {'p99 ms':>9}")
+    for load, timings in results.items():
+        latencies = sorted(seconds for status, seconds in timings if status == 200)
+        busy = sum(1 for status, _ in timings if status == 503)
+        print(f"{load:<6} {len(timings):>9} {len(latencies) / duration:>8.1f} {busy:>6} "
+              f"{percentile(latencies, 0.5) * 1000:>9.1f} {percentile(latencies, 0.99) * 1000:>9.1f}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else os.getenv('CHAT_URL', 'http://localhost:5000/api/chat'))
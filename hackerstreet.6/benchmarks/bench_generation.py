@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generation_scheduler import GenerationScheduler
+
+
+def simulated_model(overhead=0.05, per_prompt=0.005):
+    """A stand-in for the pipeline: a fixed cost per forward pass plus a small cost per prompt.
+
+    Pass --model to time the real DialoGPT pipeline instead.
+    """
+    def generate_batch(prompts, **options):
+        time.sleep(overhead + per_prompt * len(prompts))
+        return [prompt + ' ...' for prompt in prompts]
+    return generate_batch
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_load(call, clients, requests_per_client):
+    """Fire requests from concurrent clients; returns (throughput, latencies)"""
+    latencies = []
+
+    def client(i):
+        for j in range(requests_per_client):
+            start = time.perf_counter()
+            call(f"client {i} says hello number {j}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(client, range(clients)))
+    return len(latencies) / (time.perf_counter() - start), latencies
+
+
+def report(label, throughput, latencies):
+    print(f"{label:>22} {throughput:>9.1f} "
+          + ' '.join(f"{percentile(latencies, q) * 1000:>8.1f}" for q in (0.5, 0.95, 0.99)))
+
+
+def main(clients=32, requests_per_client=10, use_model=False):
+    if use_model:
+        import trained_chatbot
+        generate_batch = trained_chatbot.generate_batch
+        trained_chatbot.chatbot.get()
+        # Decode like the server does for one-off messages
+        options = trained_chatbot.ONE_OFF_OPTIONS
+    else:
+        generate_batch = simulated_model()
+        options = {}
+
+    # One model on CPU: unbatched requests effectively run one at a time
+    model_lock = threading.Lock()
+
+    def unbatched(prompt):
+        with model_lock:
+            return generate_batch([prompt], **options)[0]
+
+    print(f"{'mode':>22} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    report('one at a time', *run_load(unbatched, clients, requests_per_client))
+    for max_batch_size in (4, 8, 16):
+        scheduler = GenerationScheduler(generate_batch, max_batch_size=max_batch_size, max_wait=0.01)
+        report(f"micro-batch <= {max_batch_size}",
+               *run_load(lambda prompt: scheduler.generate(prompt, **options), clients, requests_per_client))
+
+
+if __name__ == '__main__':
+    main(use_model='--model' in sys.argv[1:])
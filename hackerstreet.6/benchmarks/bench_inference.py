@@ -0,0 +1,75 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROMPT = "Hey, how has your week been going so far?"
+
+
+def rss_mb():
+    """Resident set size of this process in MB"""
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(mode, model_name, new_tokens, repeat, num_threads):
+    """Load the model in one mode and time first-token latency and decode speed"""
+    from model_runtime import inference_mode, load_causal_lm
+    import torch
+
+    baseline = rss_mb()
+    start = time.perf_counter()
+    model, tokenizer = load_causal_lm(model_name, mode=mode, num_threads=num_threads)
+    load_seconds = time.perf_counter() - start
+    input_ids = torch.tensor([tokenizer.encode(PROMPT + tokenizer.eos_token)])
+
+    first_token, tokens_per_second = [], []
+    with inference_mode():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            model(input_ids, use_cache=True)
+            first_token.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            output = model.generate(input_ids, attention_mask=torch.ones_like(input_ids),
+                                    max_new_tokens=new_tokens, min_new_tokens=new_tokens,
+                                    pad_token_id=tokenizer.eos_token_id)
+            generated = output.shape[1] - input_ids.shape[1]
+            tokens_per_second.append(generated / (time.perf_counter() - start))
+
+    return {
+        'mode': mode,
+        'threads': torch.get_num_threads(),
+        'load_s': load_seconds,
+        'first_token_ms': sorted(first_token)[len(first_token) // 2] * 1000,
+        'tokens_per_s': sorted(tokens_per_second)[len(tokens_per_second) // 2],
+        'model_rss_mb': rss_mb() - baseline
+    }
+
+
+def main(model_name="microsoft/DialoGPT-medium", new_tokens=32, repeat=3, num_threads=None):
+    # Each mode runs in a fresh interpreter so RSS isn't polluted by the other
+    print(f"{'mode':>6} {'threads':>8} {'load s':>7} {'first token ms':>15} {'tokens/s':>9} {'RSS MB':>8}")
+    for mode in ('fp32', 'int8'):
+        output = subprocess.run(
+            [sys.executable, __file__, '--measure', mode, model_name, str(new_tokens), str(repeat), str(num_threads or 0)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{result['mode']:>6} {result['threads']:>8} {result['load_s']:>7.1f} {result['first_token_ms']:>15.1f} "
+              f"{result['tokens_per_s']:>9.1f} {result['model_rss_mb']:>8.0f}")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--measure']:
+        mode, model_name, new_tokens, repeat, num_threads = sys.argv[2:7]
+        print(json.dumps(measure(mode, model_name, int(new_tokens), int(repeat), int(num_threads) or None)))
+    else:
+        main(num_threads=int(os.getenv('TORCH_NUM_THREADS', 0)) or None)
@@ -0,0 +1,36 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from payoff import compare_strategies
+
+
+def make_debts(n_debts, seed=0):
+    """Balances, APRs and 2%/$25 minimums for a synthetic borrower"""
+    rng = np.random.default_rng(seed)
+    balances = rng.uniform(100, 50_000, n_debts).round(2)
+    rates = rng.uniform(0, 30, n_debts).round(2)
+    return balances, rates, np.maximum(25, balances * 0.02).round(2)
+
+
+def main(repeat=5):
+    print(f"{'debts':>6} {'budget':>7} {'months':>12} {'ms (avalanche+snowball+minimums)':>34}")
+    for n_debts in (10, 100, 500, 1000):
+        balances, rates, minimums = make_debts(n_debts)
+        for headroom in (1.05, 1.5):
+            budget = float(minimums.sum()) * headroom
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = compare_strategies(balances, rates, minimums, budget, max_months=360)
+                best = min(best, time.perf_counter() - start)
+            months = '/'.join(str(plan['months']) for plan in result['plans'])
+            print(f"{n_debts:>6} {headroom:>6.2f}x {months:>12} {best * 1000:>34.2f}")
+
+
+if __name__ == '__main__':
+    main()
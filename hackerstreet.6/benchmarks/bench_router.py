@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_router import Intent, IntentRouter
+
+MESSAGES = [
+    "What is the total payment plan for 50 at 5 percent over 10 years?",
+    "Which country has the highest debt right now?",
+    "Tell me about investment portfolios for aggressive investors",
+    "hello there, can you help me understand compound interest",
+    "something completely unrelated to any of the rules"
+]
+
+
+def make_rules(n_rules):
+    """Synthetic intents with three keywords each, plus the real ones at the end"""
+    rules = [(f"rule{i}", (f"kw{i}a", f"kw{i}b", f"kw{i}c*")) for i in range(n_rules)]
+    rules.append(("payment_plan", ("payment*", "repay*", "plan*", "monthly")))
+    rules.append(("greeting", ("hello", "hi", "hey", "help*")))
+    return rules
+
+
+def cascaded(rules):
+    """The old style: one any(word in message) scan per rule"""
+    def route(message):
+        message = message.lower()
+        for name, words in rules:
+            if any(word.rstrip('*') in message for word in words):
+                return name
+        return None
+    return route
+
+
+def compiled(rules):
+    router = IntentRouter([Intent(name, lambda message: True, words, priority=i)
+                           for i, (name, words) in enumerate(rules)])
+    return lambda message: router.route(message)[0]
+
+
+def per_call(route, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in MESSAGES:
+            route(message)
+    return (time.perf_counter() - start) / (repeat * len(MESSAGES))
+
+
+def main():
+    print(f"{'rules':>7} {'cascaded (us)':>14} {'router (us)':>12}")
+    for n_rules in (10, 100, 1000, 10000):
+        rules = make_rules(n_rules)
+        old, new = cascaded(rules), compiled(rules)
+        # Substring matching also fires "hi" inside "which"; the router doesn't
+        assert [new(m) for m in MESSAGES] == ["payment_plan", None, None, "greeting", None]
+        repeat = max(2, 20000 // n_rules)
+        print(f"{n_rules:>7} {per_call(old, repeat) * 1e6:>14.2f} {per_call(new, repeat) * 1e6:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
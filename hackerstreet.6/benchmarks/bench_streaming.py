@@ -0,0 +1,37 @@
+import json
+import os
+import sys
+import time
+import urllib.request
+
+MESSAGES = [
+    "Tell me about Japan",
+    "hey, how has your week been?",
+    "what do you think about the weather lately"
+]
+
+
+def timed_post(url, payload):
+    """POST JSON; returns (seconds to first body byte, seconds to the end of the body)"""
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read(1)
+        first_byte = time.perf_counter() - start
+        response.read()
+    return first_byte, time.perf_counter() - start
+
+
+def main(url, repeat=3):
+    """Compare time-to-first-byte of buffered and streamed answers from a running trained_chatbot"""
+    print(f"{'message':<45} {'mode':>9} {'TTFB ms':>9} {'total ms':>9}")
+    for message in MESSAGES:
+        for stream in (False, True):
+            timings = sorted(timed_post(url, {"message": message, "stream": stream}) for _ in range(repeat))
+            first_byte, total = timings[len(timings) // 2]
+            print(f"{message[:45]:<45} {'stream' if stream else 'buffered':>9} {first_byte * 1000:>9.1f} {total * 1000:>9.1f}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else os.getenv('CHAT_URL', 'http://localhost:5000/api/chat'))
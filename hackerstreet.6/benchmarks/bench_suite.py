@@ -0,0 +1,398 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import timeit
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from synthetic import make_debt_frame, write_debt_csv
+
+SIZES = (10, 100, 1000, 10000)
+QUICK_SIZES = (10, 100)
+N_YEARS = 20
+SEED = 0
+
+# Lower is better for latencies, higher for throughput
+LOWER_IS_BETTER = ('median_us', 'p50_ms', 'p95_ms', 'p99_ms')
+HIGHER_IS_BETTER = ('req_per_s', 'msg_per_s')
+
+# /api/chat mixes per server; trained_chatbot only gets rule-based messages
+# so the load test never waits on the model
+CHAT_MESSAGES = {
+    'app': ["Tell me about Japan", "What are the global debt statistics?", "hello",
+            "payment plan for 10000 at 5% over 10 years", "5000 at 18% min 100, 12000 at 6% min 250, budget 1000",
+            "something unrelated"],
+    'chatbot': ["Tell me about Japan", "investment strategy for the United States", "retirement advice",
+                "which country has the highest debt", "hi"],
+    'trained_chatbot': ["Tell me about Japan", "Compare debt of Japan and Germany", "What is inflation?",
+                        "Which country has the highest debt?", "retirement planning for young people"]
+}
+
+
+def measure(fn, repeat=5, target=0.05):
+    """Median and best seconds per call over `repeat` timed runs of about `target` seconds each"""
+    fn()
+    number = 1
+    while True:
+        elapsed = timeit.Timer(fn).timeit(number)
+        if elapsed >= target / 4 or number >= 1 << 20:
+            break
+        number *= 4
+    number = max(1, int(number * target / max(elapsed, 1e-9)))
+    per_call = sorted(timeit.Timer(fn).timeit(number) / number for _ in range(repeat))
+    return {
+        'median_us': per_call[len(per_call) // 2] * 1e6,
+        'min_us': per_call[0] * 1e6,
+        'calls': number * repeat
+    }
+
+
+@contextmanager
+def patched(target, **values):
+    """Temporarily replace attributes of a module or object"""
+    saved = {name: getattr(target, name) for name in values}
+    for name, value in values.items():
+        setattr(target, name, value)
+    try:
+        yield target
+    finally:
+        for name, value in saved.items():
+            setattr(target, name, value)
+
+
+class StaticDataset:
+    """Stands in for trained_chatbot's DatasetReloader with a fixed processor"""
+
+    def __init__(self, processor):
+        self.processor = processor
+
+    def current(self):
+        return self.processor
+
+
+def synthetic_countries(frame):
+    """Per-country latest figures from a synthetic frame, for the servers' static tables"""
+    latest = frame[frame['Year'] == frame['Year'].max()]
+    return list(zip(latest['Country'], latest['Debt-to-GDP Ratio'], latest['Total Debt (USD)']))
+
+
+def processor_benchmarks(frame, csv_path):
+    from data_processor import DebtDataProcessor
+
+    processor = DebtDataProcessor(csv_path, data=frame)
+    countries = list(processor.countries)
+    country = countries[len(countries) // 2]
+    some = [countries[0], country, countries[-1]]
+    year = processor.years[len(processor.years) // 2]
+
+    def cold(attribute, method):
+        # Drop the memoized result so the build is timed, not the lookup
+        def run():
+            setattr(processor, attribute, None)
+            return method()
+        return run
+
+    return {
+        'DebtDataProcessor.__init__': lambda: DebtDataProcessor(csv_path, data=frame),
+        'DebtDataProcessor.reload': processor.reload,
+        'DebtDataProcessor.from_stream': lambda: DebtDataProcessor.from_stream(csv_path),
+        'DebtDataProcessor.get_entity_matcher': cold('_entity_matcher', processor.get_entity_matcher),
+        'DebtDataProcessor.get_all_trends': cold('_trends', processor.get_all_trends),
+        'DebtDataProcessor.get_trend_summary': lambda: processor.get_trend_summary(country),
+        'DebtDataProcessor.get_country_debt': lambda: processor.get_country_debt(country),
+        'DebtDataProcessor.get_country_debt(year)': lambda: processor.get_country_debt(country, year),
+        'DebtDataProcessor.get_top_countries': lambda: processor.get_top_countries(n=10),
+        'DebtDataProcessor.get_global_average': processor.get_global_average,
+        'DebtDataProcessor.get_debt_trend': lambda: processor.get_debt_trend(country),
+        'DebtDataProcessor.get_comparison': lambda: processor.get_comparison(some),
+        'DebtDataProcessor.get_historical_data': lambda: processor.get_historical_data(country, year),
+    }, processor
+
+
+def handler_benchmarks(frame, processor, stack):
+    """Benchmarks of the chat handlers against a dataset of this size, with answer caches off"""
+    import app
+    import chatbot
+    import trained_chatbot
+    from entity_matcher import EntityMatcher
+
+    table = synthetic_countries(frame)
+    names = [name for name, _, _ in table]
+    country = names[len(names) // 2]
+
+    stack.enter_context(patched(app, debt_data={"countries": [
+        {"name": name, "debt_gdp": ratio, "debt_usd": total * 1e12} for name, ratio, total in table
+    ]}, country_matcher=EntityMatcher(names)))
+    stack.enter_context(patched(chatbot, financial_data=dict(chatbot.financial_data, countries={
+        name: {"debt_to_gdp": ratio, "total_debt": total, "trend": "High" if ratio > 90 else "Moderate"}
+        for name, ratio, total in table
+    }), country_matcher=EntityMatcher(names)))
+    stack.enter_context(patched(trained_chatbot, dataset=StaticDataset(processor)))
+    for router in (app.query_router, chatbot.message_router, trained_chatbot.debt_router):
+        stack.enter_context(patched(router, cache=None))
+
+    return {
+        'app.process_query(country)': lambda: app.process_query(f"Tell me about {country}"),
+        'app.process_query(global)': lambda: app.process_query("What are the global debt statistics?"),
+        'chatbot.process_message(country)': lambda: chatbot.process_message(f"Tell me about {country}"),
+        'chatbot.process_message(highest)': lambda: chatbot.process_message("which country has the highest debt"),
+        'trained_chatbot.process_debt_query(country)':
+            lambda: trained_chatbot.process_debt_query(f"Tell me about {country}"),
+        'trained_chatbot.process_debt_query(compare)':
+            lambda: trained_chatbot.process_debt_query(f"Compare debt of {names[0]} and {names[-1]}"),
+        'trained_chatbot.process_debt_query(highest)':
+            lambda: trained_chatbot.process_debt_query("Which country has the highest debt?"),
+    }
+
+
+def fixed_benchmarks():
+    """Benchmarks that don't depend on the dataset"""
+    import app
+    from text_preprocessing import normalize_text
+
+    text = "Could you tell me what the debt-to-GDP ratios of Japan and Germany were, and how they've changed?"
+    return {
+        'app.preprocess_text': lambda: app.preprocess_text(text),
+        'app.preprocess_text(uncached)': lambda: normalize_text.__wrapped__(text),
+        'app.calculate_payment_plan': lambda: app.calculate_payment_plan(25000, 6.5, 15),
+    }
+
+
+def run_micro(sizes, repeat, target, only=None):
+    results = {}
+
+    def record(name, size, fn):
+        if only and only not in name:
+            return
+        key = f"micro/{name}" + (f"/n={size}" if size is not None else "")
+        results[key] = measure(fn, repeat, target)
+        print(f"{key:<70} {results[key]['median_us']:>12.2f} us")
+
+    for name, fn in fixed_benchmarks().items():
+        record(name, None, fn)
+
+    for size in sizes:
+        frame = make_debt_frame(size, N_YEARS, SEED)
+        csv_path = write_debt_csv(size, N_YEARS, SEED)
+        try:
+            benchmarks, processor = processor_benchmarks(frame, csv_path)
+            for name, fn in benchmarks.items():
+                record(name, size, fn)
+            with ExitStack() as stack:
+                for name, fn in handler_benchmarks(frame, processor, stack).items():
+                    record(name, size, fn)
+        finally:
+            os.remove(csv_path)
+    return results
+
+
+def load_test(flask_app, messages, requests=2000, concurrency=8):
+    """Drive POST /api/chat through the Flask test client from `concurrency` threads"""
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+
+    def worker(index):
+        client = flask_app.test_client()
+        for i in range(index, requests, concurrency):
+            start = time.perf_counter()
+            response = client.post('/api/chat', json={"message": messages[i % len(messages)]})
+            latencies[index].append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors[index] += 1
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    timings = np.sort(np.concatenate([np.asarray(l) for l in latencies])) * 1000
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': sum(errors),
+        'req_per_s': requests / elapsed,
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99)
+    }
+
+
+def batch_test(flask_app, messages, batch_size=100, batches=20):
+    """Messages per second through POST /api/chat/batch, with no repeats inside a batch"""
+    client = flask_app.test_client()
+    timings = []
+    for b in range(batches):
+        # Numbered so every message is distinct and nothing is deduplicated
+        batch = [f"{messages[i % len(messages)]} {b * batch_size + i}" for i in range(batch_size)]
+        start = time.perf_counter()
+        response = client.post('/api/chat/batch', json={"messages": batch})
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    timings = np.array(timings) * 1000
+    return {
+        'batch_size': batch_size,
+        'batches': batches,
+        'msg_per_s': batch_size * batches / (timings.sum() / 1000),
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p99_ms': float(np.percentile(timings, 99))
+    }
+
+
+def run_load(requests, concurrency, only=None):
+    import app
+    import chatbot
+    import trained_chatbot
+    from rate_limiter import RateLimiter
+
+    results = {}
+    servers = {'app': app, 'chatbot': chatbot, 'trained_chatbot': trained_chatbot}
+    for name, module in servers.items():
+        key = f"load/{name}"
+        if only and only not in key:
+            continue
+        # The load generator is a single client; don't let app.py throttle it
+        with patched(app.limiter, limiter=RateLimiter(limit=requests + 1, period=3600)):
+            module.response_cache.clear()
+            results[key] = load_test(module.app, CHAT_MESSAGES[name], requests, concurrency)
+        r = results[key]
+        print(f"{key:<30} {r['req_per_s']:>9.1f} req/s  p50 {r['p50_ms']:.2f} ms  "
+              f"p95 {r['p95_ms']:.2f} ms  p99 {r['p99_ms']:.2f} ms  errors {r['errors']}")
+
+    # The batch endpoints, for messages/s against the single-message req/s above
+    for name, module in (('app', app), ('trained_chatbot', trained_chatbot)):
+        key = f"batch/{name}"
+        if only and only not in key:
+            continue
+        # Batches are charged per message
+        with patched(module.batch_limiter, limiter=RateLimiter(limit=100 * 20, period=3600)):
+            module.response_cache.clear()
+            results[key] = batch_test(module.app, CHAT_MESSAGES[name], batch_size=100, batches=20)
+        r = results[key]
+        print(f"{key:<30} {r['msg_per_s']:>9.1f} msg/s  batch of {r['batch_size']}: "
+              f"p50 {r['p50_ms']:.2f} ms  p99 {r['p99_ms']:.2f} ms")
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__
+    }
+
+
+def run(args):
+    # Relative to where the suite was started, not to the server directory
+    output = os.path.abspath(args.output)
+    os.chdir(ROOT)
+    sizes = args.sizes or (QUICK_SIZES if args.quick else SIZES)
+    repeat, target = (3, 0.02) if args.quick else (args.repeat, 0.1)
+    results = {}
+    if not args.skip_micro:
+        results.update(run_micro(sizes, repeat, target, args.only))
+    if not args.skip_load:
+        results.update(run_load(args.requests, args.concurrency, args.only))
+
+    report = {
+        'environment': environment(),
+        'config': {'sizes': list(sizes), 'years': N_YEARS, 'seed': SEED, 'repeat': repeat,
+                   'requests': args.requests, 'concurrency': args.concurrency},
+        'results': results
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {output}")
+
+
+def compare_results(baseline, current, threshold):
+    """(key, metric, baseline value, current value, change) for every metric worse than threshold"""
+    regressions = []
+    for key, before in baseline.items():
+        after = current.get(key)
+        if after is None:
+            continue
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            if metric not in before or metric not in after or not before[metric]:
+                continue
+            change = after[metric] / before[metric] - 1
+            worse = change > threshold if metric in LOWER_IS_BETTER else change < -threshold / (1 + threshold)
+            if worse:
+                regressions.append((key, metric, before[metric], after[metric], change))
+    return regressions
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    with open(args.current) as f:
+        current = json.load(f)['results']
+
+    regressions = compare_results(baseline, current, args.threshold)
+    missing = sorted(set(baseline) - set(current))
+    print(f"{len(set(baseline) & set(current))} results compared, threshold {args.threshold:.0%}")
+    for key, metric, before, after, change in regressions:
+        print(f"REGRESSION {key} {metric}: {before:.2f} -> {after:.2f} ({change:+.1%})")
+    for key in missing:
+        print(f"missing    {key}")
+    if not regressions:
+        print("No regressions")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    """Microbenchmarks on synthetic datasets plus an in-process /api/chat load test.
+
+    python benchmarks/bench_suite.py run --output baseline.json
+    python benchmarks/bench_suite.py compare baseline.json results.json
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="run the benchmarks and write the results as JSON")
+    run_parser.add_argument('--output', default='bench_results.json',
+                            help="results file, relative to the current directory (default bench_results.json)")
+    run_parser.add_argument('--sizes', type=int, nargs='+', help=f"countries per dataset (default {SIZES})")
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--quick', action='store_true', help="small datasets and short runs, for a smoke test")
+    run_parser.add_argument('--only', help="only benchmarks whose name contains this")
+    run_parser.add_argument('--requests', type=int, default=2000)
+    run_parser.add_argument('--concurrency', type=int, default=8)
+    run_parser.add_argument('--skip-micro', action='store_true')
+    run_parser.add_argument('--skip-load', action='store_true')
+
+    compare_parser = commands.add_parser('compare', help="flag regressions against a baseline")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help="relative slowdown to flag (default 0.1, i.e. 10%%)")
+
+    args = parser.parse_args(argv)
+    return run(args) if args.command == 'run' else compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_processor import DebtDataProcessor
+from synthetic import write_debt_csv
+
+
+def looped_trends(processor):
+    """Per-country classification the way _calculate_trend used to do it"""
+    trends = {}
+    for country in processor.countries:
+        ratios = processor.data[processor.data['Country'] == country]['Debt-to-GDP Ratio'].values
+        if len(ratios) < 3:
+            trends[country] = "Insufficient data"
+        elif all(ratios[i] <= ratios[i+1] for i in range(len(ratios)-1)):
+            trends[country] = "Increasing"
+        elif all(ratios[i] >= ratios[i+1] for i in range(len(ratios)-1)):
+            trends[country] = "Decreasing"
+        else:
+            trends[country] = "Fluctuating"
+    return trends
+
+
+def indexed_looped_trends(processor):
+    """Per-country classification over the pre-built per-country arrays"""
+    trends = {}
+    for country in processor._country_codes:
+        ratios = processor._ratio_col[processor._country_rows(country)]
+        if len(ratios) < 3:
+            trends[country] = "Insufficient data"
+        elif (ratios[:-1] <= ratios[1:]).all():
+            trends[country] = "Increasing"
+        elif (ratios[:-1] >= ratios[1:]).all():
+            trends[country] = "Decreasing"
+        else:
+            trends[country] = "Fluctuating"
+    return trends
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(n_countries=200, n_years=60, repeat=5):
+    path = write_debt_csv(n_countries, n_years)
+    try:
+        processor = DebtDataProcessor(path)
+    finally:
+        os.remove(path)
+
+    def batch():
+        processor._trends = None
+        return processor._trend_table()
+
+    looped = looped_trends(processor)
+    table = batch()
+    mismatches = sum(looped[c] != table['trend'][processor._country_codes[c]] for c in looped)
+
+    loop_time = best_of(lambda: looped_trends(processor), repeat)
+    indexed_time = best_of(lambda: indexed_looped_trends(processor), repeat)
+    batch_time = best_of(batch, repeat)
+    print(f"{n_countries} countries x {n_years} years")
+    print(f"  per-country DataFrame loop: {loop_time * 1000:9.2f} ms  ({loop_time / batch_time:.1f}x)")
+    print(f"  per-country indexed loop:   {indexed_time * 1000:9.2f} ms  ({indexed_time / batch_time:.1f}x)")
+    print(f"  batch engine:               {batch_time * 1000:9.2f} ms  (all labels incl. slope and CAGR)")
+    print(f"  label mismatches:           {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+def make_debt_frame(n_countries=200, n_years=60, seed=0, end_year=2023):
+    """Build a synthetic table with the same columns as global_debt_data.csv"""
+    rng = np.random.default_rng(seed)
+    countries = np.array([f"Country {i:05d}" for i in range(n_countries)])
+    years = np.arange(end_year, end_year - n_years, -1)
+
+    # Newest year first, like the bundled CSV
+    country_col = np.tile(countries, n_years)
+    year_col = np.repeat(years, n_countries)
+    drift = rng.normal(1.0, 3.0, size=(n_years, n_countries)).cumsum(axis=0)
+    ratio = np.round(np.abs(60 + drift[::-1]), 1).ravel()
+    total = np.round(rng.uniform(0.1, 30.0, size=n_countries * n_years), 2)
+
+    return pd.DataFrame({
+        'Country': country_col,
+        'Year': year_col,
+        'Debt-to-GDP Ratio': ratio,
+        'Total Debt (USD)': total
+    })
+
+
+def write_debt_csv(n_countries=200, n_years=60, seed=0, directory=None):
+    """Write a synthetic dataset to a temporary CSV and return its path"""
+    fd, path = tempfile.mkstemp(prefix='debt_', suffix='.csv', dir=directory)
+    os.close(fd)
+    make_debt_frame(n_countries, n_years, seed).to_csv(path, index=False)
+    return path
@@ -0,0 +1,208 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('id', 'session_id', 'timestamp', 'message', 'response', 'status')
+
+
+class HistoryStore:
+    """Chat history in a fixed-size in-memory ring, optionally persisted to SQLite.
+
+    Entries get increasing ids; entry n lives in ring slot n % capacity, so
+    appends and cursor lookups are O(1). With a db_path, a background thread
+    inserts entries into SQLite in batches, SQLite assigns their ids (so
+    several processes can share one database) and older pages are read from
+    there. An entry reaches the ring once it has been written; ids that other
+    processes took leave gaps in the ring, and those ranges are read from
+    the database as well.
+    """
+
+    def __init__(self, capacity=1000, db_path=None, batch_size=256):
+        self.capacity = capacity
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self._ring = [None] * capacity
+        self._last_id = 0
+        self._lock = threading.Lock()
+        # Entries queued and entries the writer has finished with, so readers
+        # can wait for what was queued before them without waiting on writers
+        # that keep appending
+        self._queued = 0
+        self._written = 0
+        self._persisted = threading.Condition(self._lock)
+        self._queue = None
+        if db_path:
+            self._open_db()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _open_db(self):
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(f"CREATE TABLE IF NOT EXISTS chat_history ("
+                               f"id INTEGER PRIMARY KEY, session_id TEXT, timestamp TEXT, "
+                               f"message TEXT, response TEXT, status TEXT)")
+            connection.execute("CREATE INDEX IF NOT EXISTS chat_history_session ON chat_history (session_id, id)")
+            # Warm the ring with the newest entries
+            rows = connection.execute("SELECT * FROM chat_history ORDER BY id DESC LIMIT ?", (self.capacity,)).fetchall()
+        for row in reversed(rows):
+            entry = dict(row)
+            self._ring[entry['id'] % self.capacity] = entry
+            self._last_id = entry['id']
+
+        self._queue = queue.Queue()
+        threading.Thread(target=self._write, name='history-writer', daemon=True).start()
+
+    def append(self, message, response, status, timestamp, session_id=None):
+        """Record one exchange; returns its id, or None when the database has yet to assign it"""
+        entry = {'id': None, 'session_id': session_id, 'timestamp': timestamp,
+                 'message': message, 'response': response, 'status': status}
+        if self._queue is not None:
+            # Stored as SQLite can bind them, so the ring and the database agree
+            for column in COLUMNS[1:]:
+                entry[column] = _storable(entry[column])
+            with self._lock:
+                self._queued += 1
+                self._queue.put(entry)
+            return None
+        with self._lock:
+            self._last_id += 1
+            entry['id'] = self._last_id
+            self._ring[entry['id'] % self.capacity] = entry
+        return entry['id']
+
+    def flush(self):
+        """Block until every entry queued before this call has been written to disk"""
+        if self._queue is not None:
+            with self._persisted:
+                target = self._queued
+                self._persisted.wait_for(lambda: self._written >= target)
+
+    def needs_disk(self, cursor):
+        """Whether a page starting after cursor touches the database.
+
+        Always true with a database: every page asks it for the newest id,
+        since other processes may have written since this one last did.
+        """
+        return bool(self.db_path)
+
+    def page(self, cursor=0, limit=50, session_id=None):
+        """Entries with id > cursor, oldest first, optionally for one session.
+
+        Returns (entries, next_cursor); next_cursor is None once the newest
+        entry has been reached. With a database, entries queued before the
+        call and rows other processes wrote are included; the ids they took
+        leave gaps in the ring, which are read from disk.
+        """
+        if self.db_path:
+            self.flush()
+            self._catch_up()
+        entries = []
+        position = cursor
+        while len(entries) < limit:
+            with self._lock:
+                last_id = self._last_id
+                oldest = max(1, last_id - self.capacity + 1)
+                if position >= last_id:
+                    break
+                if position + 1 >= oldest or not self.db_path:
+                    # Serve from the ring; without a database, evicted entries are gone
+                    entry_id = max(position + 1, oldest)
+                    gap = False
+                    while len(entries) < limit and entry_id <= last_id:
+                        entry = self._ring[entry_id % self.capacity]
+                        if entry is None or entry['id'] != entry_id:
+                            # Another process took this id; its row is only on disk
+                            gap = bool(self.db_path)
+                            if gap:
+                                break
+                        elif session_id is None or entry['session_id'] == session_id:
+                            entries.append(dict(entry))
+                        entry_id += 1
+                    position = entry_id - 1
+                    if not gap:
+                        continue
+                    before_id = last_id + 1
+                else:
+                    # The page starts before the ring: read disk up to where the ring begins
+                    before_id = oldest
+
+            self.flush()
+            rows = self._read_db(position, limit - len(entries), session_id, before_id)
+            entries.extend(rows)
+            position = rows[-1]['id'] if len(entries) == limit else before_id - 1
+
+        with self._lock:
+            next_cursor = position if position < self._last_id else None
+        return entries, next_cursor
+
+    def _catch_up(self):
+        """Extend the id range to the newest row in the database, whoever wrote it"""
+        with self._connect() as connection:
+            newest = connection.execute("SELECT max(id) FROM chat_history").fetchone()[0] or 0
+        with self._lock:
+            self._last_id = max(self._last_id, newest)
+
+    def _read_db(self, cursor, limit, session_id, before_id):
+        query = "SELECT * FROM chat_history WHERE id > ? AND id < ?"
+        params = [cursor, before_id]
+        if session_id is not None:
+            query += " AND session_id = ?"
+            params.append(session_id)
+        query += " ORDER BY id LIMIT ?"
+        params.append(limit)
+        with self._connect() as connection:
+            return [dict(row) for row in connection.execute(query, params)]
+
+    def _write(self):
+        connection = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                try:
+                    written = self._insert(connection, batch)
+                except sqlite3.Error as e:
+                    # Retry one row at a time so a bad entry only loses itself
+                    logger.error(f"Error writing {len(batch)} history entries, retrying one by one: {str(e)}")
+                    written = []
+                    for entry in batch:
+                        try:
+                            written += self._insert(connection, [entry])
+                        except sqlite3.Error as e:
+                            logger.error(f"Dropping history entry: {str(e)}")
+                with self._lock:
+                    for entry in written:
+                        self._ring[entry['id'] % self.capacity] = entry
+                        self._last_id = max(self._last_id, entry['id'])
+            finally:
+                with self._persisted:
+                    self._written += len(batch)
+                    self._persisted.notify_all()
+
+    def _insert(self, connection, batch):
+        with connection:
+            for entry in batch:
+                entry['id'] = connection.execute(
+                    f"INSERT INTO chat_history ({', '.join(COLUMNS[1:])}) VALUES (?, ?, ?, ?, ?)",
+                    tuple(entry[column] for column in COLUMNS[1:])
+                ).lastrowid
+        return batch
+
+
+def _storable(value):
+    """A value SQLite can bind: text and numbers as they are, anything else as JSON"""
+    if value is None or isinstance(value, (str, float)) or (isinstance(value, int) and -2**63 <= value < 2**63):
+        return value
+    return json.dumps(value, default=str)
@@ -1,8 +1,15 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import json
 import os
 from datetime import datetime
+from async_server import AsyncServer, offload, serve
+from chat_history import HistoryStore
+from entity_matcher import EntityMatcher
+from intent_router import Intent, IntentRouter, keyword_flags, no_entities
+from metrics import CONTENT_TYPE, REGISTRY, cache_collector, intents, stage
+from profiling import request_profiler
+from response_cache import ResponseCache
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
@@ -28,74 +35,112 @@ financial_data = {
     }
 }
 
-# Chat history storage
-chat_history = []
+# Matches country names and aliases in chat messages
+country_matcher = EntityMatcher(financial_data["countries"])
+
+# Chat history storage: the newest CHAT_HISTORY_SIZE exchanges in memory,
+# and every exchange on disk when CHAT_HISTORY_DB is set
+chat_history = HistoryStore(
+    capacity=int(os.getenv('CHAT_HISTORY_SIZE', 1000)),
+    db_path=os.getenv('CHAT_HISTORY_DB')
+)
+MAX_HISTORY_PAGE = 500
+
+def country_response(message, country):
+    """Answer with the financial data for a mentioned country"""
+    if not country:
+        return None
+    data = financial_data["countries"][country]
+    return {
+        "response": f"Here's the financial data for {country}:\n\n" \
+                  f"📊 Debt-to-GDP Ratio: {data['debt_to_gdp']}%\n" \
+                  f"💰 Total Debt: ${data['total_debt']} trillion\n" \
+                  f"📈 Trend: {data['trend']}\n\n" \
+                  f"Would you like to compare this with other countries?",
+        "status": "success"
+    }
+
+def investment_response(message, country):
+    """Suggest investment strategies for the requested risk profile"""
+    if message.has("conservative*"):
+        strategies = financial_data["investment_strategies"]["conservative"]
+    elif message.has("aggressive*"):
+        strategies = financial_data["investment_strategies"]["aggressive"]
+    else:
+        strategies = financial_data["investment_strategies"]["balanced"]
+    
+    return {
+        "response": "Here are some investment strategies:\n\n" + \
+                   "\n".join([f"• {strategy}" for strategy in strategies]) + \
+                   "\n\nWould you like more specific advice?",
+        "status": "success"
+    }
+
+def retirement_response(message, country):
+    """Give retirement advice for the requested age group"""
+    if message.has("young*"):
+        advice = financial_data["retirement_advice"]["young"]
+    elif message.has("middle*"):
+        advice = financial_data["retirement_advice"]["middle"]
+    elif message.has("near*"):
+        advice = financial_data["retirement_advice"]["near"]
+    else:
+        advice = "It's important to start planning early. Would you like specific advice for your age group?"
+    
+    return {
+        "response": f"Retirement Planning Advice:\n\n{advice}\n\nWould you like more detailed information?",
+        "status": "success"
+    }
+
+def highest_debt_response(message, country):
+    """Name the country with the highest debt-to-GDP ratio"""
+    highest = max(financial_data["countries"].items(), key=lambda x: x[1]["debt_to_gdp"])
+    return {
+        "response": f"The country with the highest debt-to-GDP ratio is {highest[0]} at {highest[1]['debt_to_gdp']}%.",
+        "status": "success"
+    }
+
+def lowest_debt_response(message, country):
+    """Name the country with the lowest debt-to-GDP ratio"""
+    lowest = min(financial_data["countries"].items(), key=lambda x: x[1]["debt_to_gdp"])
+    return {
+        "response": f"The country with the lowest debt-to-GDP ratio is {lowest[0]} at {lowest[1]['debt_to_gdp']}%.",
+        "status": "success"
+    }
+
+def country_key(message, country):
+    return country
+
+# financial_data is static, so answers only depend on the intent and its entities
+response_cache = ResponseCache(
+    max_entries=int(os.getenv('RESPONSE_CACHE_SIZE', 1024)),
+    ttl=float(os.getenv('RESPONSE_CACHE_TTL', 300))
+)
+REGISTRY.add_collector(cache_collector(response_cache))
+
+# Opt-in sampling profiler for single requests; see /api/profiles
+profiler = request_profiler()
+
+# Intent table, checked in priority order; keywords ending in * match as prefixes
+message_router = IntentRouter([
+    Intent("country", country_response, priority=10, cache_key=country_key),
+    Intent("investment", investment_response, ("invest*", "portfolio*"), priority=20,
+           cache_key=keyword_flags("conservative*", "aggressive*")),
+    Intent("retirement", retirement_response, ("retirement*",), priority=30,
+           cache_key=keyword_flags("young*", "middle*", "near*")),
+    Intent("highest_debt", highest_debt_response, ("highest",), ("debt*",), priority=40, cache_key=no_entities),
+    Intent("lowest_debt", lowest_debt_response, ("lowest",), ("debt*",), priority=50, cache_key=no_entities)
+], cache=response_cache)
 
 def process_message(message):
     try:
-        message = message.lower()
-        
-        # Check for country-specific queries
-        for country in financial_data["countries"]:
-            if country.lower() in message:
-                data = financial_data["countries"][country]
-                return {
-                    "response": f"Here's the financial data for {country}:\n\n" \
-                              f"📊 Debt-to-GDP Ratio: {data['debt_to_gdp']}%\n" \
-                              f"💰 Total Debt: ${data['total_debt']} trillion\n" \
-                              f"📈 Trend: {data['trend']}\n\n" \
-                              f"Would you like to compare this with other countries?",
-                    "status": "success"
-                }
-
-        # Check for investment queries
-        if "invest" in message or "portfolio" in message:
-            if "conservative" in message:
-                strategies = financial_data["investment_strategies"]["conservative"]
-            elif "aggressive" in message:
-                strategies = financial_data["investment_strategies"]["aggressive"]
-            else:
-                strategies = financial_data["investment_strategies"]["balanced"]
-            
-            return {
-                "response": "Here are some investment strategies:\n\n" + \
-                           "\n".join([f"• {strategy}" for strategy in strategies]) + \
-                           "\n\nWould you like more specific advice?",
-                "status": "success"
-            }
-
-        # Check for retirement queries
-        if "retirement" in message:
-            if "young" in message:
-                advice = financial_data["retirement_advice"]["young"]
-            elif "middle" in message:
-                advice = financial_data["retirement_advice"]["middle"]
-            elif "near" in message:
-                advice = financial_data["retirement_advice"]["near"]
-            else:
-                advice = "It's important to start planning early. Would you like specific advice for your age group?"
-            
-            return {
-                "response": f"Retirement Planning Advice:\n\n{advice}\n\nWould you like more detailed information?",
-                "status": "success"
-            }
-
-        # Check for highest/lowest debt queries
-        if "highest" in message and "debt" in message:
-            highest = max(financial_data["countries"].items(), key=lambda x: x[1]["debt_to_gdp"])
-            return {
-                "response": f"The country with the highest debt-to-GDP ratio is {highest[0]} at {highest[1]['debt_to_gdp']}%.",
-                "status": "success"
-            }
-
-        if "lowest" in message and "debt" in message:
-            lowest = min(financial_data["countries"].items(), key=lambda x: x[1]["debt_to_gdp"])
-            return {
-                "response": f"The country with the lowest debt-to-GDP ratio is {lowest[0]} at {lowest[1]['debt_to_gdp']}%.",
-                "status": "success"
-            }
+        intent, result = message_router.route(message, country=country_matcher.find(message))
+        if result:
+            intents.inc(intent)
+            return result
 
         # Default response
+        intents.inc('fallback')
         return {
             "response": "I can help you with:\n\n" \
                        "1. Country-specific financial data\n" \
@@ -113,6 +158,7 @@ def process_message(message):
         }
 
 @app.route('/api/chat', methods=['POST'])
+@profiler.wrap
 def chat():
     try:
         # Get the message from the request
@@ -125,19 +171,17 @@ def chat():
 
         message = data['message']
         
-        # Process the message
-        result = process_message(message)
-        
-        # Store chat history
-        chat_history.append({
-            "timestamp": datetime.now().isoformat(),
-            "message": message,
-            "response": result["response"],
-            "status": result["status"]
-        })
-        
-        # Return the response
-        return jsonify(result)
+        with stage('request'):
+            # Process the message
+            result = process_message(message)
+
+            # Store chat history
+            chat_history.append(message, result["response"], result["status"],
+                                timestamp=datetime.now().isoformat(), session_id=data.get('session_id'))
+
+            # Return the response
+            with stage('format'):
+                return jsonify(result)
         
     except Exception as e:
         return jsonify({
@@ -147,8 +191,40 @@ def chat():
 
 @app.route('/api/history', methods=['GET'])
 def get_history():
-    return jsonify(chat_history)
+    """Page through the history oldest first: ?cursor=<next_cursor>&limit=50&session_id=..."""
+    try:
+        cursor = int(request.args.get('cursor', 0))
+        limit = min(int(request.args.get('limit', 50)), MAX_HISTORY_PAGE)
+    except ValueError:
+        return jsonify({"error": "cursor and limit must be integers", "status": "error"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be positive", "status": "error"}), 400
+
+    if chat_history.needs_disk(cursor):
+        offload('io')
+    entries, next_cursor = chat_history.page(cursor, limit, request.args.get('session_id'))
+    return jsonify({"history": entries, "next_cursor": next_cursor})
+
+@app.route('/api/cache', methods=['GET'])
+def cache_stats():
+    return jsonify(response_cache.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Stage latencies, intents and cache statistics in Prometheus text format"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+@app.route('/api/profiles', methods=['GET'])
+def profiles():
+    """Sampled stacks of the latest requests sent with X-Profile: 1 (PROFILE_REQUESTS=true)"""
+    return jsonify({"enabled": profiler.enabled, "profiles": profiler.recent()})
+
+# ASGI entry point: chat inline, history pages that query the database on the io pool
+asgi_app = AsyncServer(app)
 
 if __name__ == '__main__':
     print("Starting chatbot server...")
-    app.run(debug=True, port=5000, host='0.0.0.0') 
\ No newline at end of file
+    if os.getenv('SERVER_MODE') == 'asgi':
+        serve(asgi_app, host='0.0.0.0', port=5000)
+    else:
+        app.run(debug=True, port=5000, host='0.0.0.0') 
\ No newline at end of file
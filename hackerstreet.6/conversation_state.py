@@ -0,0 +1,188 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from lazy_loader import lazy_import
+from model_runtime import inference_mode
+
+logger = logging.getLogger(__name__)
+
+torch = lazy_import('torch')
+
+
+class Conversation:
+    """Token history of one chat session plus the model's cached keys/values for it.
+
+    past_key_values always covers the first cached_tokens tokens of the
+    history, so a new turn only runs the tokens the model hasn't seen yet.
+    """
+
+    def __init__(self):
+        self.turns = []
+        self.past_key_values = None
+        self.cached_tokens = 0
+        self.cache_bytes = 0
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def n_tokens(self):
+        return sum(len(turn) for turn in self.turns)
+
+    def drop_cache(self):
+        """Forget the cached keys/values; the history is re-encoded on the next turn"""
+        self.past_key_values = None
+        self.cached_tokens = 0
+        self.cache_bytes = 0
+
+    def reply(self, text, model, tokenizer, max_new_tokens=100, max_history_tokens=512):
+        """Add a user turn and greedily decode the model's answer to the whole dialogue"""
+        return ''.join(self.stream_reply(text, model, tokenizer, max_new_tokens, max_history_tokens))
+
+    def stream_reply(self, text, model, tokenizer, max_new_tokens=100, max_history_tokens=512):
+        """Like reply, but yields the answer in pieces as its tokens are decoded"""
+        eos = tokenizer.eos_token_id
+        self.turns.append(tokenizer.encode(text) + [eos])
+        # Leave room for the answer and its closing EOS
+        self._truncate(max_history_tokens - max_new_tokens - 1)
+
+        history = [token for turn in self.turns for token in turn]
+        reply_ids = []
+        try:
+            yield from self._decode(history[self.cached_tokens:], model, tokenizer, max_new_tokens, reply_ids)
+        finally:
+            # Runs even if the caller stops reading early, so the history
+            # always holds whatever part of the answer was produced
+            self.turns.append(reply_ids + [eos])
+            if self.past_key_values is not None:
+                self.cache_bytes = sum(tensor.element_size() * tensor.nelement()
+                                       for layer in self.past_key_values for tensor in layer)
+
+    def _decode(self, ids, model, tokenizer, max_new_tokens, reply_ids):
+        # Feed ids, then greedily decode up to max_new_tokens into reply_ids,
+        # yielding the text as it grows; stops at EOS
+        emitted = ''
+        with inference_mode():
+            logits = self._feed(model, ids)
+            while len(reply_ids) < max_new_tokens:
+                token = int(logits[0, -1].argmax())
+                if token == tokenizer.eos_token_id:
+                    break
+                reply_ids.append(token)
+                # Hold back a trailing partial character until the next
+                # byte-level token completes it
+                decoded = tokenizer.decode(reply_ids, skip_special_tokens=True)
+                if len(decoded) > len(emitted) and not decoded.endswith('\ufffd'):
+                    yield decoded[len(emitted):]
+                    emitted = decoded
+                # The last token is left for the next turn to feed
+                if len(reply_ids) < max_new_tokens:
+                    logits = self._feed(model, [token])
+
+        decoded = tokenizer.decode(reply_ids, skip_special_tokens=True)
+        if len(decoded) > len(emitted):
+            yield decoded[len(emitted):]
+
+    def _feed(self, model, ids):
+        output = model(torch.tensor([ids]), past_key_values=self.past_key_values, use_cache=True)
+        self.past_key_values = output.past_key_values
+        self.cached_tokens += len(ids)
+        return output.logits
+
+    def _truncate(self, budget):
+        # Cached positions are invalid once earlier tokens go, so drop down to
+        # half the budget and amortize the re-encode over the following turns
+        if self.n_tokens <= budget:
+            return
+        while len(self.turns) > 1 and self.n_tokens > budget // 2:
+            self.turns.pop(0)
+        if self.n_tokens > budget:
+            self.turns[0] = self.turns[0][-budget:]
+        self.drop_cache()
+
+
+def stream_completion(text, model, tokenizer, max_length=150):
+    """Yield text, then its greedy continuation as it is decoded, up to max_length tokens in all.
+
+    The same text the text-generation pipeline returns for text and max_length.
+    """
+    prompt = tokenizer.encode(text)
+    yield text
+    if len(prompt) < max_length:
+        yield from Conversation()._decode(prompt, model, tokenizer, max_length - len(prompt), [])
+
+
+class ConversationStore:
+    """Conversations by session id, evicted by idle time (ttl), count and cache memory.
+
+    Over the memory cap, the least recently used sessions lose their cached
+    keys/values first; their token history stays until the session expires.
+    """
+
+    def __init__(self, max_sessions=1000, ttl=1800, max_cache_bytes=512 * 1024 * 1024,
+                 max_history_tokens=512, max_new_tokens=100):
+        # The history budget has to fit the answer, its closing EOS and at least one token of dialogue
+        if max_history_tokens <= max_new_tokens + 1:
+            raise ValueError(f"max_history_tokens (CONVERSATION_MAX_TOKENS) is {max_history_tokens}, "
+                             f"it must be more than max_new_tokens + 1 = {max_new_tokens + 1}")
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_cache_bytes = max_cache_bytes
+        self.max_history_tokens = max_history_tokens
+        self.max_new_tokens = max_new_tokens
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """Return the session's conversation, starting a new one if needed"""
+        with self._lock:
+            conversation = self._sessions.get(session_id)
+            if conversation is None:
+                conversation = self._sessions[session_id] = Conversation()
+            else:
+                self._sessions.move_to_end(session_id)
+            conversation.last_used = time.monotonic()
+            return conversation
+
+    def reply(self, session_id, text, model, tokenizer):
+        """Generate the model's next turn in the session's dialogue"""
+        return ''.join(self.stream_reply(session_id, text, model, tokenizer))
+
+    def stream_reply(self, session_id, text, model, tokenizer):
+        """Yield the model's next turn in the session's dialogue piece by piece"""
+        conversation = self.get(session_id)
+        try:
+            with conversation.lock:
+                yield from conversation.stream_reply(text, model, tokenizer, self.max_new_tokens, self.max_history_tokens)
+        finally:
+            conversation.last_used = time.monotonic()
+            self.evict()
+
+    def evict(self):
+        """Drop expired and surplus sessions, then caches until under the memory cap"""
+        now = time.monotonic()
+        with self._lock:
+            for session_id, conversation in list(self._sessions.items()):
+                if now - conversation.last_used > self.ttl or len(self._sessions) > self.max_sessions:
+                    del self._sessions[session_id]
+                else:
+                    break
+
+            cache_bytes = sum(conversation.cache_bytes for conversation in self._sessions.values())
+            for conversation in self._sessions.values():
+                if cache_bytes <= self.max_cache_bytes:
+                    break
+                # Sessions generating right now keep their cache
+                if conversation.cache_bytes and conversation.lock.acquire(blocking=False):
+                    cache_bytes -= conversation.cache_bytes
+                    conversation.drop_cache()
+                    conversation.lock.release()
+
+    def stats(self):
+        """Session count and bytes held in cached keys/values"""
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'cache_bytes': sum(conversation.cache_bytes for conversation in self._sessions.values())
+            }
@@ -0,0 +1,234 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from data_ingest import stream_debt_frame
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT = 2
+META_FILE = 'meta.json'
+
+# Cache entries are named <source id>-<source digest>; nothing else in
+# cache_dir is ours to prune
+ENTRY_NAME = re.compile(r'^([0-9a-f]{16})-([0-9a-f]{64})$')
+
+
+def source_digest(data_path=None, raw=None):
+    """SHA-256 of the source CSV, from its bytes if already read"""
+    digest = hashlib.sha256()
+    if raw is not None:
+        digest.update(raw)
+    else:
+        with open(data_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_id(data_path):
+    """Short stable id of the source file's location, shared by all its cache versions"""
+    location = os.path.abspath(data_path) if data_path else ''
+    return hashlib.sha256(location.encode('utf-8')).hexdigest()[:16]
+
+
+def _entry_name(data_path, digest):
+    return f'{_source_id(data_path)}-{digest}'
+
+
+def _read_meta(path, digest):
+    """The metadata of a complete cache entry in the current format, or None"""
+    if not os.path.isfile(os.path.join(path, META_FILE)):
+        return None
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    if meta.get('format') != CACHE_FORMAT or meta.get('source_sha256') != digest:
+        return None
+    return meta
+
+
+def read_frame_cache(cache_dir, digest, data_path=None):
+    """Memory-map a cached frame for the given source digest, or return None if absent or stale"""
+    path = os.path.join(cache_dir, _entry_name(data_path, digest))
+    try:
+        meta = _read_meta(path, digest)
+        if meta is None:
+            return None
+
+        columns = {}
+        for column in meta['columns']:
+            values = np.load(os.path.join(path, column['file']), mmap_mode='r')
+            if len(values) != meta['rows']:
+                return None
+            if column['kind'] == 'categorical':
+                values = pd.Categorical.from_codes(values, categories=column['categories'])
+            columns[column['name']] = values
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring unreadable data cache {path}: {str(e)}")
+        return None
+
+    # copy=False keeps the numeric columns backed by the shared read-only mapping
+    return pd.DataFrame(columns, copy=False)
+
+
+def read_array_cache(cache_dir, digest, data_path=None):
+    """Memory-map the arrays stored with a cached frame, or return None if there are none"""
+    path = os.path.join(cache_dir, _entry_name(data_path, digest))
+    try:
+        meta = _read_meta(path, digest)
+        if meta is None or not meta.get('arrays'):
+            return None
+        return {name: np.load(os.path.join(path, filename), mmap_mode='r')
+                for name, filename in meta['arrays'].items()}
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring unreadable data cache {path}: {str(e)}")
+        return None
+
+
+def _encode_array(name, values):
+    """Arrays are stored as is, except text, which numpy can only map as fixed-width strings"""
+    values = np.asarray(values)
+    if values.dtype == object:
+        if not all(isinstance(value, str) for value in values):
+            raise ValueError(f"Array {name!r} can't be stored")
+        values = values.astype(str)
+    return values
+
+
+def _encode_column(series):
+    """Return (kind, values, categories) for one column of the frame"""
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biuf':
+        return 'numeric', np.ascontiguousarray(series.to_numpy()), None
+
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('category')
+    categories = series.cat.categories.tolist()
+    if not all(isinstance(c, str) for c in categories):
+        raise ValueError(f"Column {series.name!r} can't be dictionary-encoded")
+    return 'categorical', series.cat.codes.to_numpy().astype(np.int32), categories
+
+
+def write_frame_cache(cache_dir, digest, data, data_path=None, arrays=None):
+    """Write a frame as one .npy file per column, with text columns stored as integer codes.
+
+    arrays are derived structures (e.g. a lookup index) stored next to the
+    columns, so readers can map them instead of building a copy each.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    final = os.path.join(cache_dir, _entry_name(data_path, digest))
+    if os.path.isdir(final):
+        try:
+            meta = _read_meta(final, digest)
+        except (OSError, ValueError):
+            meta = None
+        if meta is not None and (not arrays or set(arrays) <= set(meta.get('arrays') or ())):
+            return final
+
+    tmp = tempfile.mkdtemp(prefix='.tmp-', dir=cache_dir)
+    try:
+        meta = {'format': CACHE_FORMAT, 'source_sha256': digest, 'rows': len(data), 'columns': []}
+        for i, name in enumerate(data.columns):
+            kind, values, categories = _encode_column(data[name])
+            filename = f'col{i}.npy'
+            np.save(os.path.join(tmp, filename), values)
+            meta['columns'].append({'name': name, 'file': filename, 'kind': kind, 'categories': categories})
+        meta['arrays'] = {}
+        for i, (name, values) in enumerate((arrays or {}).items()):
+            filename = f'arr{i}.npy'
+            np.save(os.path.join(tmp, filename), _encode_array(name, values))
+            meta['arrays'][name] = filename
+
+        # Metadata goes last so a half-written directory is never considered valid
+        with open(os.path.join(tmp, META_FILE), 'w') as f:
+            json.dump(meta, f)
+
+        if os.path.isdir(final):
+            # Written in an older format or without these arrays; processes
+            # still mapping its files keep them until they let go
+            _retire(cache_dir, final)
+        try:
+            os.rename(tmp, final)
+        except OSError:
+            # Another worker published the same version first
+            if not os.path.isdir(final):
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    _prune(cache_dir, data_path, keep=digest)
+    return final
+
+
+def _retire(cache_dir, path):
+    """Remove a published entry, moving it out of the way first so readers never see it half-deleted"""
+    retired = tempfile.mkdtemp(prefix='.old-', dir=cache_dir)
+    try:
+        os.rename(path, os.path.join(retired, 'entry'))
+    except OSError:
+        # Another worker replaced it already
+        pass
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def _prune(cache_dir, data_path, keep):
+    """Remove caches built from older versions of the same source file"""
+    source_id = _source_id(data_path)
+    for name in os.listdir(cache_dir):
+        match = ENTRY_NAME.match(name)
+        if match and match.group(1) == source_id and match.group(2) != keep:
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+
+
+def _parse(data_path, raw, stream_options):
+    if stream_options is not None:
+        return stream_debt_frame(data_path, **stream_options)
+    return pd.read_csv(io.BytesIO(raw) if raw is not None else data_path)
+
+
+def load_debt_frame(data_path, cache_dir=None, raw=None, stream_options=None):
+    """Load the debt CSV, going through the binary cache when cache_dir is set"""
+    return load_debt_dataset(data_path, cache_dir, raw, stream_options)[0]
+
+
+def load_debt_dataset(data_path, cache_dir=None, raw=None, stream_options=None, build_arrays=None):
+    """Load the debt CSV and build_arrays(frame), both memory-mapped from the cache when cache_dir is set.
+
+    Returns (frame, arrays); arrays is None without build_arrays.
+    """
+    if not cache_dir:
+        data = _parse(data_path, raw, stream_options)
+        return data, build_arrays(data) if build_arrays else None
+
+    digest = source_digest(data_path, raw)
+    data = read_frame_cache(cache_dir, digest, data_path)
+    if data is not None:
+        if build_arrays is None:
+            return data, None
+        arrays = read_array_cache(cache_dir, digest, data_path)
+        if arrays is not None:
+            return data, arrays
+        # Cached without the arrays; build them and rewrite the entry with them
+    else:
+        data = _parse(data_path, raw, stream_options)
+
+    arrays = build_arrays(data) if build_arrays else None
+    try:
+        write_frame_cache(cache_dir, digest, data, data_path, arrays)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not write data cache for {data_path}: {str(e)}")
+        return data, arrays
+
+    # Serve the first load from the mapping too, so every worker sees the same frame
+    cached = read_frame_cache(cache_dir, digest, data_path)
+    cached_arrays = read_array_cache(cache_dir, digest, data_path) if build_arrays else None
+    if cached is None or (build_arrays and cached_arrays is None):
+        return data, arrays
+    return cached, cached_arrays
@@ -0,0 +1,133 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+DEBT_COLUMNS = ['Country', 'Year', 'Debt-to-GDP Ratio', 'Total Debt (USD)']
+METRIC_COLUMNS = ['Debt-to-GDP Ratio', 'Total Debt (USD)']
+
+# Matches wide panel headers such as "2023" or "2023 [YR2023]"
+YEAR_HEADER = re.compile(r'^\s*(\d{4})\b')
+
+
+class CountryEncoder:
+    """Assigns stable integer codes to country names across chunks"""
+
+    def __init__(self):
+        self.names = []
+        self._lookup = pd.Index([], dtype=object)
+
+    def encode(self, values):
+        """Map a chunk of country names to global codes, -1 for missing"""
+        local_codes, uniques = pd.factorize(values)
+        mapping = self._lookup.get_indexer(uniques).astype(np.int32)
+        unseen = mapping < 0
+        if unseen.any():
+            start = len(self.names)
+            self.names.extend(uniques[unseen].tolist())
+            mapping[unseen] = np.arange(start, len(self.names), dtype=np.int32)
+            self._lookup = pd.Index(self.names, dtype=object)
+
+        codes = np.full(len(local_codes), -1, dtype=np.int32)
+        known = local_codes >= 0
+        codes[known] = mapping[local_codes[known]]
+        return codes
+
+    def categorical(self, codes):
+        return pd.Categorical.from_codes(codes, categories=self.names)
+
+
+def _year_array(values):
+    """Smallest integer dtype that holds the years, float if any are missing"""
+    return pd.to_numeric(values, downcast='integer').to_numpy()
+
+
+def _concat_parts(parts, dtypes):
+    """Concatenate per-chunk column tuples into one array per column, consuming parts"""
+    if not parts:
+        return [np.array([], dtype=dtype) for dtype in dtypes]
+
+    # One column at a time, dropping its chunks as we go, so peak memory is
+    # the finished columns plus one column's worth of chunks
+    columns = [list(column) for column in zip(*parts)]
+    parts.clear()
+    result = []
+    for column in columns:
+        result.append(np.concatenate(column))
+        column.clear()
+    return result
+
+
+def _merge_metrics(encoder, parts, float_dtype):
+    """Join per-metric (code, year, value) parts into one row per country and year"""
+    frames = []
+    for metric in METRIC_COLUMNS:
+        codes, years, values = _concat_parts(parts[metric], (np.int32, np.int16, float_dtype))
+        frame = pd.DataFrame({'code': codes, 'Year': years, metric: values})
+        # Later rows win, as they would in the flat CSV
+        frames.append(frame.drop_duplicates(['code', 'Year'], keep='last'))
+
+    merged = frames[0].merge(frames[1], on=['code', 'Year'], how='outer', sort=False)
+    return pd.DataFrame({
+        'Country': encoder.categorical(merged['code'].to_numpy(np.int32)),
+        'Year': _year_array(merged['Year']),
+        'Debt-to-GDP Ratio': merged['Debt-to-GDP Ratio'].to_numpy(float_dtype),
+        'Total Debt (USD)': merged['Total Debt (USD)'].to_numpy(float_dtype)
+    })
+
+
+def stream_debt_frame(data_path, chunksize=100_000, columns=None, indicators=None, float_dtype='float64'):
+    """Read a debt CSV in chunks into a compact frame with a categorical Country column.
+
+    columns maps canonical names (Country, Year, the metrics, Indicator, Value)
+    to the file's headers. With indicators ({metric: indicator code}) the file
+    is read as a multi-indicator panel, long or wide (one column per year).
+    """
+    columns = {name: name for name in DEBT_COLUMNS + ['Indicator', 'Value']} | (columns or {})
+    renames = {source: name for name, source in columns.items()}
+    encoder = CountryEncoder()
+    flat_parts = []
+    metric_parts = {metric: [] for metric in METRIC_COLUMNS}
+
+    for chunk in pd.read_csv(data_path, chunksize=chunksize):
+        chunk = chunk.rename(columns=renames)
+
+        if not indicators:
+            flat_parts.append((
+                encoder.encode(chunk['Country']),
+                _year_array(chunk['Year']),
+                chunk['Debt-to-GDP Ratio'].to_numpy(float_dtype),
+                chunk['Total Debt (USD)'].to_numpy(float_dtype)
+            ))
+            continue
+
+        for metric, indicator in indicators.items():
+            rows = chunk[chunk['Indicator'] == indicator]
+            if rows.empty:
+                continue
+            codes = encoder.encode(rows['Country'])
+
+            if 'Year' in rows.columns:
+                values = pd.to_numeric(rows['Value'], errors='coerce').to_numpy(float_dtype)
+                metric_parts[metric].append((codes, rows['Year'].to_numpy(), values))
+                continue
+
+            # Wide panel: melt the year columns of this chunk only
+            for header in rows.columns:
+                match = YEAR_HEADER.match(str(header))
+                if match:
+                    values = pd.to_numeric(rows[header], errors='coerce').to_numpy(float_dtype)
+                    present = ~np.isnan(values)
+                    years = np.full(present.sum(), int(match.group(1)), dtype=np.int16)
+                    metric_parts[metric].append((codes[present], years, values[present]))
+
+    if indicators:
+        return _merge_metrics(encoder, metric_parts, float_dtype)
+
+    codes, years, ratio, total = _concat_parts(flat_parts, (np.int32, np.int16, float_dtype, float_dtype))
+    return pd.DataFrame({
+        'Country': encoder.categorical(codes),
+        'Year': years,
+        'Debt-to-GDP Ratio': ratio,
+        'Total Debt (USD)': total
+    }, copy=False)
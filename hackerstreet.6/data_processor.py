@@ -1,114 +1,319 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from data_ingest import stream_debt_frame
+from entity_matcher import EntityMatcher
+from metrics import timed
 
 class DebtDataProcessor:
-    def __init__(self, data_path):
-        self.data = pd.read_csv(data_path)
+    TREND_LABELS = ('trend', 'recent_trend', 'slope', 'cagr')
+    RANKING_COLUMNS = ['Country', 'Debt-to-GDP Ratio', 'Total Debt (USD)']
+    HISTORY_COLUMNS = ['Year', 'Debt-to-GDP Ratio', 'Total Debt (USD)']
+
+    def __init__(self, data_path, data=None, stream_options=None, index=None):
+        self.data_path = data_path
+        self.stream_options = stream_options
+        self.version = 0
+        self._set_data(self._read() if data is None else data, index)
+
+    @classmethod
+    def from_stream(cls, data_path, **stream_options):
+        """Load a large CSV in bounded-memory chunks; see data_ingest.stream_debt_frame"""
+        return cls(data_path, stream_options=stream_options)
+
+    def _read(self):
+        if self.stream_options is not None:
+            return stream_debt_frame(self.data_path, **self.stream_options)
+        return pd.read_csv(self.data_path)
+
+    def reload(self):
+        """Re-read the source file and rebuild every derived structure"""
+        self._set_data(self._read())
+
+    def _set_data(self, data, index=None):
+        """Install a dataset and rebuild the indexes and aggregates built on it.
+
+        index is build_row_index(data), e.g. memory-mapped from the data cache.
+        """
+        self.data = data
+        self.version += 1
+        self._trends = None
+        self._entity_matcher = None
         self.countries = self.data['Country'].unique()
         self.years = sorted(self.data['Year'].unique())
-        
+        self._build_index(self.build_row_index(data) if index is None else index)
+        self._build_aggregates()
+
+    @staticmethod
+    def build_row_index(data):
+        """Contiguous per-country arrays and a year-sorted row order for lookups.
+
+        Depends on nothing but the data, so the data cache can store the arrays
+        and every worker maps the same pages instead of building private copies.
+        """
+        codes, uniques = pd.factorize(data['Country'])
+
+        # Stable sort keeps each country's rows in their original file order,
+        # which the existing "latest row" semantics depend on
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        years = data['Year'].to_numpy()[order]
+
+        # Each country's rows again, ordered by year within the country so a
+        # (Country, Year) lookup is a binary search; the stable sort keeps
+        # duplicate years in file order so the later row can win
+        by_year = np.lexsort((years, sorted_codes))
+        return {
+            'countries': np.array(list(uniques), dtype=object),
+            'rows': order,
+            'codes': sorted_codes,
+            'bounds': np.searchsorted(sorted_codes, np.arange(len(uniques) + 1)),
+            'years': years,
+            'ratios': np.ascontiguousarray(data['Debt-to-GDP Ratio'].to_numpy()[order]),
+            'totals': np.ascontiguousarray(data['Total Debt (USD)'].to_numpy()[order]),
+            'by_year': by_year,
+            'sorted_years': years[by_year]
+        }
+
+    def _build_index(self, index):
+        """Install the arrays from build_row_index"""
+        self._rows = index['rows']
+        self._codes_col = index['codes']
+        self._bounds = index['bounds']
+        self._years_col = index['years']
+        self._ratio_col = index['ratios']
+        self._total_col = index['totals']
+        self._by_year = index['by_year']
+        self._sorted_years = index['sorted_years']
+        self._country_codes = {country: code for code, country in enumerate(index['countries'].tolist())}
+
+    def _country_rows(self, country):
+        """Get the slice of the per-country arrays holding a country's rows"""
+        code = self._country_codes.get(country)
+        if code is None:
+            return None
+        return slice(int(self._bounds[code]), int(self._bounds[code + 1]))
+
+    def _row_position(self, country, year):
+        """Find a country's row for a year, the later one if the year repeats"""
+        rows = self._country_rows(country)
+        if rows is None:
+            return None
+        years = self._sorted_years[rows]
+        i = int(np.searchsorted(years, year, side='right')) - 1
+        if i < 0 or years[i] != year:
+            return None
+        return int(self._by_year[rows.start + i])
+
+    def _build_aggregates(self):
+        """Precompute per-year averages, totals and ranked row positions for top-N queries.
+
+        Unlike the row index these are built in every process, about 32 bytes a row.
+        """
+        self._year_stats = {}
+        self._year_rankings = {}
+        for year, positions in self.data.groupby('Year', sort=False).indices.items():
+            year_data = self.data.iloc[positions]
+            self._year_stats[year] = self._summarize_year(year_data)
+
+            # Rank with the same sort the per-request path used so ties keep
+            # their order; descending is sorted separately for the same reason
+            year_data = year_data.reset_index(drop=True)
+            for column in ('Debt-to-GDP Ratio', 'Total Debt (USD)'):
+                for highest in (True, False):
+                    ranked = year_data.sort_values(column, ascending=not highest).index.to_numpy()
+                    self._year_rankings[(year, column, highest)] = positions[ranked]
+
+    def _trend_table(self):
+        """Classify every country's trend in one vectorized pass, cached per data version"""
+        if self._trends is not None and self._trends['version'] == self.version:
+            return self._trends
+
+        # Rows without a country are coded -1 and sort first; leave them out
+        start = int(self._bounds[0])
+        bounds = self._bounds - start
+        n_countries = len(bounds) - 1
+        counts = np.diff(bounds)
+        ratios = self._ratio_col[start:]
+        codes = self._codes_col[start:]
+
+        # Adjacent pairs that belong to the same country, in file order
+        pair_codes = codes[:-1]
+        same = pair_codes == codes[1:]
+        not_rising = same & ~(ratios[:-1] <= ratios[1:])
+        not_falling = same & ~(ratios[:-1] >= ratios[1:])
+        rising = np.bincount(pair_codes[not_rising], minlength=n_countries) == 0
+        falling = np.bincount(pair_codes[not_falling], minlength=n_countries) == 0
+
+        trend = np.full(n_countries, "Fluctuating", dtype=object)
+        trend[falling] = "Decreasing"
+        trend[rising] = "Increasing"
+        trend[counts < 3] = "Insufficient data"
+
+        # Year-over-year direction from the last two rows of each country
+        recent = np.full(n_countries, "Insufficient data", dtype=object)
+        has_pair = counts >= 2
+        last = bounds[1:][has_pair] - 1
+        latest, previous = ratios[last], ratios[last - 1]
+        recent[has_pair] = np.where(latest > previous, "Increasing",
+                                    np.where(latest < previous, "Decreasing", "Stable"))
+
+        # Least-squares slope of ratio against year
+        years = self._years_col[start:].astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_year = np.bincount(codes, weights=years, minlength=n_countries) / counts
+            mean_ratio = np.bincount(codes, weights=ratios, minlength=n_countries) / counts
+            dx = years - mean_year[codes]
+            dy = ratios - mean_ratio[codes]
+            slope = (np.bincount(codes, weights=dx * dy, minlength=n_countries)
+                     / np.bincount(codes, weights=dx * dx, minlength=n_countries))
+
+            # Compound annual growth between the earliest and latest year
+            chronological = self._by_year[start:] - start
+            first = chronological[bounds[:-1][counts > 0]]
+            final = chronological[bounds[1:][counts > 0] - 1]
+            cagr = np.full(n_countries, np.nan)
+            span = years[final] - years[first]
+            growth = ratios[final] / ratios[first]
+            cagr[counts > 0] = np.where((span > 0) & (growth > 0), growth ** (1 / span) - 1, np.nan)
+        slope[counts < 2] = np.nan
+
+        self._trends = {
+            'version': self.version,
+            'trend': trend,
+            'recent_trend': recent,
+            'slope': slope,
+            'cagr': cagr
+        }
+        return self._trends
+
+    def get_entity_matcher(self):
+        """Get the country matcher for this dataset version, building it on first use"""
+        if self._entity_matcher is None:
+            self._entity_matcher = EntityMatcher(self._country_codes)
+        return self._entity_matcher
+
+    def get_trend_summary(self, country):
+        """Get every trend label for a country from the batch trend table"""
+        code = self._country_codes.get(country)
+        if code is None:
+            return None
+
+        trends = self._trend_table()
+        summary = {'country': country}
+        for label in self.TREND_LABELS:
+            summary[label] = trends[label][code]
+        return summary
+
+    @timed('lookup')
+    def get_all_trends(self):
+        """Get the trend labels for every country as a DataFrame"""
+        trends = self._trend_table()
+        return pd.DataFrame({
+            'Country': list(self._country_codes),
+            **{label: trends[label] for label in self.TREND_LABELS}
+        })
+
+    @staticmethod
+    def _summarize_year(year_data):
+        """Reduce one year's rows to (average ratio, total debt)"""
+        return year_data['Debt-to-GDP Ratio'].mean(), year_data['Total Debt (USD)'].sum()
+
     def get_country_debt(self, country, year=None):
         """Get debt data for a specific country"""
         if year:
-            mask = (self.data['Country'] == country) & (self.data['Year'] == year)
+            pos = self._row_position(country, year)
         else:
-            mask = self.data['Country'] == country
+            rows = self._country_rows(country)
+            pos = rows.stop - 1 if rows is not None else None
             year = self.years[-1]  # Latest year
-            
-        country_data = self.data[mask]
-        if country_data.empty:
+
+        if pos is None:
             return None
-            
-        latest = country_data.iloc[-1]
+
         return {
             'country': country,
             'year': year,
-            'debt_to_gdp': latest['Debt-to-GDP Ratio'],
-            'total_debt': latest['Total Debt (USD)'],
+            'debt_to_gdp': self._ratio_col[pos],
+            'total_debt': self._total_col[pos],
             'trend': self._calculate_trend(country)
         }
     
-    def get_top_countries(self, metric='debt_to_gdp', n=5, highest=True):
+    @timed('lookup')
+    def get_top_countries(self, metric='debt_to_gdp', n=5, highest=True, year=None):
         """Get top N countries by debt metric"""
-        latest_year = self.years[-1]
-        latest_data = self.data[self.data['Year'] == latest_year]
-        
+        if not year:
+            year = self.years[-1]
+
         if metric == 'debt_to_gdp':
-            sorted_data = latest_data.sort_values('Debt-to-GDP Ratio', ascending=not highest)
+            column = 'Debt-to-GDP Ratio'
         else:
-            sorted_data = latest_data.sort_values('Total Debt (USD)', ascending=not highest)
-            
-        return sorted_data.head(n)[['Country', 'Debt-to-GDP Ratio', 'Total Debt (USD)']]
-    
+            column = 'Total Debt (USD)'
+
+        positions = self._year_rankings.get((year, column, bool(highest)), [])
+        return self.data.iloc[positions[:n]][self.RANKING_COLUMNS]
+
     def get_global_average(self, year=None):
         """Calculate global average debt metrics"""
-        if year:
-            mask = self.data['Year'] == year
-        else:
+        if not year:
             year = self.years[-1]
-            mask = self.data['Year'] == year
-            
-        year_data = self.data[mask]
+
+        stats = self._year_stats.get(year)
+        if stats is None:
+            stats = self._summarize_year(self.data.iloc[:0])
+
         return {
             'year': year,
-            'avg_debt_to_gdp': year_data['Debt-to-GDP Ratio'].mean(),
-            'total_global_debt': year_data['Total Debt (USD)'].sum()
+            'avg_debt_to_gdp': stats[0],
+            'total_global_debt': stats[1]
         }
     
     def get_debt_trend(self, country):
         """Calculate debt trend for a country"""
-        country_data = self.data[self.data['Country'] == country]
-        if len(country_data) < 2:
+        code = self._country_codes.get(country)
+        if code is None:
             return "Insufficient data"
-            
-        latest_ratio = country_data.iloc[-1]['Debt-to-GDP Ratio']
-        previous_ratio = country_data.iloc[-2]['Debt-to-GDP Ratio']
-        
-        if latest_ratio > previous_ratio:
-            return "Increasing"
-        elif latest_ratio < previous_ratio:
-            return "Decreasing"
-        else:
-            return "Stable"
+        return self._trend_table()['recent_trend'][code]
     
     def _calculate_trend(self, country):
         """Calculate trend based on multiple years of data"""
-        country_data = self.data[self.data['Country'] == country]
-        if len(country_data) < 3:
+        code = self._country_codes.get(country)
+        if code is None:
             return "Insufficient data"
-            
-        ratios = country_data['Debt-to-GDP Ratio'].values
-        if all(ratios[i] <= ratios[i+1] for i in range(len(ratios)-1)):
-            return "Increasing"
-        elif all(ratios[i] >= ratios[i+1] for i in range(len(ratios)-1)):
-            return "Decreasing"
-        else:
-            return "Fluctuating"
+        return self._trend_table()['trend'][code]
     
     def get_comparison(self, countries, metric='debt_to_gdp'):
         """Compare debt metrics between countries"""
         latest_year = self.years[-1]
+        trends = self._trend_table()['trend']
         comparison = []
-        
+
         for country in countries:
-            data = self.get_country_debt(country, latest_year)
-            if data:
+            pos = self._row_position(country, latest_year)
+            if pos is not None:
                 comparison.append({
                     'country': country,
-                    'debt_to_gdp': data['debt_to_gdp'],
-                    'total_debt': data['total_debt'],
-                    'trend': data['trend']
+                    'debt_to_gdp': self._ratio_col[pos],
+                    'total_debt': self._total_col[pos],
+                    'trend': trends[self._country_codes[country]]
                 })
-                
+
         return comparison
     
+    @timed('lookup')
     def get_historical_data(self, country, start_year=None, end_year=None):
         """Get historical debt data for a country"""
-        mask = self.data['Country'] == country
-        if start_year:
-            mask &= self.data['Year'] >= start_year
-        if end_year:
-            mask &= self.data['Year'] <= end_year
-            
-        return self.data[mask][['Year', 'Debt-to-GDP Ratio', 'Total Debt (USD)']] 
\ No newline at end of file
+        rows = self._country_rows(country)
+        if rows is None:
+            return self.data.iloc[:0][self.HISTORY_COLUMNS]
+
+        positions = self._rows[rows]
+        if start_year or end_year:
+            years = self._years_col[rows]
+            keep = np.ones(len(years), dtype=bool)
+            if start_year:
+                keep &= years >= start_year
+            if end_year:
+                keep &= years <= end_year
+            positions = positions[keep]
+        return self.data.iloc[positions][self.HISTORY_COLUMNS]
@@ -0,0 +1,108 @@
+import logging
+import os
+import threading
+
+from data_cache import load_debt_dataset, source_digest
+from data_processor import DebtDataProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class DatasetReloader:
+    """Keeps a DebtDataProcessor in sync with its CSV and swaps new versions in atomically"""
+
+    def __init__(self, data_path, processor_class=DebtDataProcessor, cache_dir=None, stream_options=None):
+        self.data_path = data_path
+        self.cache_dir = cache_dir
+        self.stream_options = stream_options
+        self.processor_class = processor_class
+        self.version = 0
+        self._processor = None
+        self._stat = None
+        self._digest = None
+        self._rejected_digest = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.reload(force=True)
+
+    def current(self):
+        """Return the processor snapshot for the current dataset version"""
+        # Callers should fetch this once per request; reloads publish a fully
+        # built processor with a single assignment, never mutate this one
+        return self._processor
+
+    def _file_stat(self):
+        st = os.stat(self.data_path)
+        return st.st_mtime_ns, st.st_size
+
+    def reload(self, force=False):
+        """Load and publish the CSV if it changed; returns True when a new version was swapped in"""
+        with self._reload_lock:
+            stat = self._file_stat()
+            if not force and stat == self._stat:
+                return False
+
+            # Hash and parse the same bytes so a file being rewritten can't
+            # produce a processor that doesn't match its recorded digest.
+            # Streamed files are too big to hold; a rewrite during the parse
+            # changes the stat, so the next poll picks it up instead
+            raw = None
+            if self.stream_options is None:
+                with open(self.data_path, 'rb') as f:
+                    raw = f.read()
+            digest = source_digest(self.data_path, raw)
+            if not force and digest in (self._digest, self._rejected_digest):
+                self._stat = stat
+                return False
+
+            try:
+                # The lookup index is cached with the data, so workers map it too
+                data, index = load_debt_dataset(self.data_path, self.cache_dir, raw=raw,
+                                                stream_options=self.stream_options,
+                                                build_arrays=self.processor_class.build_row_index)
+                processor = self.processor_class(self.data_path, data=data, index=index,
+                                                 stream_options=self.stream_options)
+                processor.version = self.version + 1
+                processor._trend_table()
+                processor.get_entity_matcher()
+            except Exception:
+                # Don't re-parse the same broken file on every poll
+                self._stat = stat
+                self._rejected_digest = digest
+                raise
+
+            self._processor = processor
+            self.version = processor.version
+            self._stat = stat
+            self._digest = digest
+            logger.info(f"Loaded {self.data_path} as dataset version {self.version}")
+            return True
+
+    def check(self):
+        """Reload if the file changed, keeping the current version on failure"""
+        try:
+            return self.reload()
+        except Exception as e:
+            logger.error(f"Error reloading {self.data_path}, keeping version {self.version}: {str(e)}")
+            return False
+
+    def start(self, interval=30.0):
+        """Poll the CSV for changes on a background thread"""
+        if interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, args=(interval,),
+                                        name='dataset-reloader', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background watcher"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            self.check()
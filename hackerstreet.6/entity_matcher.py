@@ -0,0 +1,78 @@
+import re
+
+# Extra surface forms per country, matched case-insensitively
+COUNTRY_ALIASES = {
+    "United States": ["US", "USA", "U.S.", "U.S.A.", "United States of America"],
+    "United Kingdom": ["UK", "U.K.", "Britain", "Great Britain"],
+    "China": ["PRC", "People's Republic of China"],
+    "Germany": ["Deutschland"],
+    "Japan": ["Nippon"]
+}
+
+# Aliases that are also ordinary words only match in this exact case, so
+# "tell us" is not read as the United States
+CASE_SENSITIVE_ALIASES = {"US"}
+
+
+def _trie_pattern(words):
+    """Compile words into a prefix-sharing regex so matching cost doesn't grow with the word count"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node):
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and '' not in node:
+            return branches[0]
+        group = '(?:' + '|'.join(branches) + ')'
+        # Greedy optional keeps the longest name, e.g. "United States of America"
+        return group + '?' if '' in node else group
+
+    return emit(trie)
+
+
+class EntityMatcher:
+    """Finds every known country mentioned in a message in one regex pass"""
+
+    def __init__(self, names, aliases=COUNTRY_ALIASES):
+        self.names = list(names)
+        self._folded = {}
+        self._exact = {}
+        for name in self.names:
+            self._folded[str(name).lower()] = name
+            for alias in aliases.get(name, []):
+                if alias in CASE_SENSITIVE_ALIASES:
+                    self._exact[alias] = name
+                else:
+                    self._folded[alias.lower()] = name
+
+        branches = []
+        if self._folded:
+            branches.append('(?i:' + _trie_pattern(self._folded) + ')')
+        if self._exact:
+            branches.append(_trie_pattern(self._exact))
+        # Word boundaries stop "india" matching inside "indiana"
+        self._pattern = re.compile(r'(?<!\w)(?:' + '|'.join(branches) + r')(?!\w)') if branches else None
+
+    def find_all(self, text):
+        """Return the countries mentioned in text, in order of first mention"""
+        if self._pattern is None:
+            return []
+
+        found = []
+        for match in self._pattern.finditer(text):
+            surface = match.group(0)
+            name = self._exact.get(surface) or self._folded.get(surface.lower())
+            if name is not None and name not in found:
+                found.append(name)
+        return found
+
+    def find(self, text):
+        """Return the first country mentioned in text, or None"""
+        found = self.find_all(text)
+        return found[0] if found else None
@@ -0,0 +1,115 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationScheduler:
+    """Queues prompts and runs them through generate_batch in micro-batches.
+
+    A batch is closed once it holds max_batch_size prompts, or once max_wait
+    seconds have passed since its first prompt arrived and no more prompts are
+    queued. Prompts are only batched with
+    others that use the same generation options.
+    """
+
+    def __init__(self, generate_batch, max_batch_size=8, max_wait=0.01):
+        self.generate_batch = generate_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.prompts = 0
+        self._queue = queue.Queue()
+        self._pending = []
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the batching thread (idempotent)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='generation-scheduler', daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, prompt, **options):
+        """Queue a prompt; returns a Future for the generated text"""
+        future = Future()
+        self.start()
+        self._queue.put((prompt, tuple(sorted(options.items())), future, time.monotonic()))
+        return future
+
+    def generate(self, prompt, timeout=None, **options):
+        """Queue a prompt and wait for its generated text"""
+        return self.submit(prompt, **options).result(timeout)
+
+    def stats(self):
+        """Batches run, prompts served and the mean batch size so far"""
+        return {
+            'batches': self.batches,
+            'prompts': self.prompts,
+            'mean_batch_size': self.prompts / self.batches if self.batches else 0.0
+        }
+
+    def _next_batch(self):
+        # Block for the first prompt, then gather compatible ones until the
+        # batch is full or its wait budget is spent
+        first = self._pending.pop(0) if self._pending else self._queue.get()
+        batch = [first]
+        options = first[1]
+        # Measured from when the first prompt was queued, so time it spent
+        # waiting behind an earlier batch counts against its budget
+        deadline = first[3] + self.max_wait
+
+        deferred = []
+        for item in self._pending:
+            if len(batch) < self.max_batch_size and item[1] == options:
+                batch.append(item)
+            else:
+                deferred.append(item)
+        self._pending = deferred
+
+        while len(batch) < self.max_batch_size:
+            # Prompts already queued join even after the deadline; under load
+            # they have all waited past it. Only waiting for new ones is bounded.
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item[1] == options:
+                batch.append(item)
+            else:
+                self._pending.append(item)
+        return batch, dict(options)
+
+    def _run(self):
+        while True:
+            batch, options = self._next_batch()
+            # Skip prompts whose callers cancelled while they were queued
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = list(self.generate_batch([item[0] for item in batch], **options))
+            except Exception as e:
+                logger.error(f"Error generating batch of {len(batch)}: {str(e)}")
+                for item in batch:
+                    item[2].set_exception(e)
+                continue
+            self.batches += 1
+            self.prompts += len(batch)
+            for item, result in zip(batch, results):
+                item[2].set_result(result)
+            if len(results) < len(batch):
+                logger.error(f"Generation returned {len(results)} results for a batch of {len(batch)}")
+                for item in batch[len(results):]:
+                    item[2].set_exception(RuntimeError("No generated text was returned for this prompt"))
@@ -0,0 +1,159 @@
+import re
+import time
+
+from metrics import REGISTRY
+from response_cache import MISSING
+
+TOKEN = re.compile(r'[a-z0-9_]+')
+
+# Multi-word keywords ("compound interest") are matched as joined n-grams
+MAX_PHRASE_WORDS = 3
+
+# Timed inline rather than with stage(): routing runs several times per message
+MATCH_SECONDS = REGISTRY.histogram('match')
+HANDLE_SECONDS = REGISTRY.histogram('handle')
+
+
+class Message:
+    """A chat message tokenized once, shared by every routing decision and handler"""
+
+    def __init__(self, text):
+        self.text = text
+        self.lowered = text.lower()
+        self.tokens = TOKEN.findall(self.lowered)
+        self.words = set(self.tokens)
+
+        # Every term a keyword can match: single tokens plus joined n-grams,
+        # so "compound interest" and "compound_interest" look the same
+        self.terms = set(self.words)
+        for n in range(2, min(MAX_PHRASE_WORDS, len(self.tokens)) + 1):
+            self.terms.update(map('_'.join, zip(*(self.tokens[i:] for i in range(n)))))
+
+    def has(self, keyword):
+        """True if any term matches keyword; a trailing * matches as a prefix"""
+        if keyword.endswith('*'):
+            prefix = keyword[:-1]
+            return any(word.startswith(prefix) for word in self.words)
+        return keyword in self.terms
+
+
+def as_message(message):
+    return message if isinstance(message, Message) else Message(message)
+
+
+def normalize_keyword(keyword):
+    """Keywords are lower-case terms; a trailing * makes them match as a prefix"""
+    words = TOKEN.findall(keyword.lower())
+    if not words or len(words) > MAX_PHRASE_WORDS:
+        raise ValueError(f"Keyword {keyword!r} must be 1 to {MAX_PHRASE_WORDS} words")
+    if keyword.endswith('*') and len(words) > 1:
+        raise ValueError(f"Prefix keyword {keyword!r} must be a single word")
+    return '_'.join(words) + ('*' if keyword.endswith('*') else '')
+
+
+def no_entities(message, **context):
+    """cache_key for answers that depend on nothing but the intent"""
+    return ()
+
+
+def keyword_flags(*keywords):
+    """cache_key for handlers that only branch on which of these keywords appear"""
+    keywords = [normalize_keyword(keyword) for keyword in keywords]
+    return lambda message, **context: tuple(message.has(keyword) for keyword in keywords)
+
+
+class Intent:
+    """One routing rule: each group is a tuple of alternative keywords and all groups must match.
+
+    An intent without groups is always a candidate (e.g. rules driven by detected
+    countries). Handlers return None to decline and let the next candidate run.
+    cache_key(message, **context) returns the entities the answer depends on,
+    or None to bypass the cache for that message; only intents that have one
+    are cached by a router with a cache, and only their answers, never a decline.
+    """
+
+    def __init__(self, name, handler, *groups, priority=0, cache_key=None):
+        self.name = name
+        self.handler = handler
+        self.groups = [tuple(normalize_keyword(k) for k in group) for group in groups]
+        self.priority = priority
+        self.cache_key = cache_key
+
+
+class IntentRouter:
+    """Compiles an intent table into keyword lookups so routing cost doesn't grow with the rule count"""
+
+    def __init__(self, intents, cache=None):
+        self.intents = sorted(intents, key=lambda intent: intent.priority)
+        self.cache = cache
+        self._exact = {}
+        self._prefix = {}
+        self._always = []
+        for index, intent in enumerate(self.intents):
+            if not intent.groups:
+                self._always.append(index)
+            for group_index, group in enumerate(intent.groups):
+                for keyword in group:
+                    if keyword.endswith('*'):
+                        table, keyword = self._prefix, keyword[:-1]
+                    else:
+                        table = self._exact
+                    table.setdefault(keyword, []).append((index, group_index))
+        self._prefix_lengths = sorted({len(prefix) for prefix in self._prefix})
+
+    def match(self, message):
+        """Return the intents whose keyword groups all match, in priority order"""
+        message = as_message(message)
+        satisfied = {}
+        exact, prefix = self._exact, self._prefix
+        for term in message.terms:
+            refs = exact.get(term)
+            if refs:
+                for index, group_index in refs:
+                    satisfied.setdefault(index, set()).add(group_index)
+        for word in message.words:
+            for length in self._prefix_lengths:
+                if length > len(word):
+                    break
+                refs = prefix.get(word[:length])
+                if refs:
+                    for index, group_index in refs:
+                        satisfied.setdefault(index, set()).add(group_index)
+
+        candidates = [index for index, groups in satisfied.items()
+                      if len(groups) == len(self.intents[index].groups)]
+        candidates.extend(self._always)
+        return [self.intents[index] for index in sorted(candidates)]
+
+    def route(self, message, **context):
+        """Run matching handlers in priority order; returns (intent name, result) or (None, None)"""
+        message = as_message(message)
+        start = time.perf_counter()
+        intents = self.match(message)
+        matched = time.perf_counter()
+        MATCH_SECONDS.observe(matched - start)
+        for intent in intents:
+            result = self._handle(intent, message, context)
+            start, matched = matched, time.perf_counter()
+            HANDLE_SECONDS.observe(matched - start)
+            if result is not None:
+                return intent.name, result
+        return None, None
+
+    def _handle(self, intent, message, context):
+        if self.cache is None or intent.cache_key is None:
+            return intent.handler(message, **context)
+        entities = intent.cache_key(message, **context)
+        if entities is None:
+            # Not an answer this intent caches (e.g. no country mentioned), so
+            # leave the cache and its hit rate alone
+            return intent.handler(message, **context)
+        key = (intent.name, entities)
+        result = self.cache.get(key, MISSING)
+        if result is MISSING:
+            result = intent.handler(message, **context)
+            # A handler may decline because of state that changes at runtime
+            # (e.g. no dataset loaded yet), so only answers are cached
+            if result is not None:
+                self.cache.put(key, result)
+        return result
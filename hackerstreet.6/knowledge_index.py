@@ -0,0 +1,137 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+from text_preprocessing import normalize_text
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT = 1
+
+
+def analyze(text):
+    """Index terms: normalized words (stopwords dropped) plus adjacent word pairs"""
+    words = normalize_text(text.replace('_', ' ')).split()
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+def entries_digest(entries):
+    return hashlib.sha256(json.dumps([INDEX_FORMAT, entries], sort_keys=True).encode()).hexdigest()
+
+
+class KnowledgeIndex:
+    """Sublinear TF-IDF vectors of knowledge-base entries, searchable by cosine similarity.
+
+    The matrix is kept as CSC arrays, i.e. one postings list per term, so a
+    query only touches the entries that share a term with it. Queries are
+    weighted exactly like sklearn's TfidfVectorizer.transform would, without
+    importing sklearn (or scipy) at query time.
+    """
+
+    def __init__(self, terms, idf, indptr, indices, data, answers, digest):
+        self.vocabulary = {term: index for index, term in enumerate(terms)}
+        self.idf = idf
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.answers = answers
+        self.digest = digest
+
+    @classmethod
+    def build(cls, entries):
+        """Vectorize (text, answer) entries; answers can be any JSON-serializable value"""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        vectorizer = TfidfVectorizer(analyzer=analyze, sublinear_tf=True)
+        matrix = vectorizer.fit_transform([text for text, _ in entries]).tocsc()
+        terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+        return cls(terms, vectorizer.idf_, matrix.indptr, matrix.indices, matrix.data,
+                   [answer for _, answer in entries], entries_digest(entries))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as stored:
+            meta = json.loads(str(stored['meta']))
+            return cls(stored['terms'].tolist(), stored['idf'], stored['indptr'], stored['indices'],
+                       stored['data'], meta['answers'], meta['digest'])
+
+    @classmethod
+    def load_or_build(cls, entries, path=None):
+        """Load the index saved at path if it was built from these entries, else build (and save) it"""
+        digest = entries_digest(entries)
+        if path and os.path.isfile(path):
+            try:
+                index = cls.load(path)
+                if index.digest == digest:
+                    return index
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable knowledge index {path}: {str(e)}")
+        index = cls.build(entries)
+        if path:
+            index.save(path)
+        return index
+
+    def save(self, path):
+        """Write the index atomically, as a single .npz file"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        meta = json.dumps({'format': INDEX_FORMAT, 'digest': self.digest, 'answers': self.answers})
+        fd, tmp = tempfile.mkstemp(prefix='.tmp-', suffix='.npz', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, terms=np.array(terms, dtype=str), idf=self.idf, indptr=self.indptr,
+                         indices=self.indices, data=self.data, meta=np.array(meta))
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _weights(self, text):
+        counts = {}
+        for term in analyze(text):
+            index = self.vocabulary.get(term)
+            if index is not None:
+                counts[index] = counts.get(index, 0) + 1
+        terms = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        weights = (1 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))) * self.idf[terms]
+        norm = np.sqrt(weights @ weights)
+        return terms, weights / norm if norm else weights
+
+    def score_batch(self, queries):
+        """Cosine similarity of every query to every entry, shaped (queries, entries)"""
+        scores = np.zeros((len(queries), len(self.answers)))
+        weighted = [self._weights(query) for query in queries]
+        terms = np.concatenate([terms for terms, _ in weighted] + [np.zeros(0, dtype=np.int64)])
+        if not len(terms):
+            return scores
+        weights = np.concatenate([weights for _, weights in weighted])
+        rows = np.repeat(np.arange(len(queries)), [len(t) for t, _ in weighted])
+
+        # Expand every (query, term) pair into that term's postings in one go
+        starts = self.indptr[terms]
+        lengths = self.indptr[terms + 1] - starts
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+        np.add.at(scores, (np.repeat(rows, lengths), self.indices[offsets]),
+                  np.repeat(weights, lengths) * self.data[offsets])
+        return scores
+
+    def search_batch(self, queries, k=1, threshold=0.3):
+        """Top-k (answer, score) matches at or above threshold for each query"""
+        results = []
+        for row in self.score_batch(queries):
+            best = np.argsort(-row, kind='stable')[:k]
+            results.append([(self.answers[i], float(row[i])) for i in best if row[i] >= threshold])
+        return results
+
+    def search(self, query, k=1, threshold=0.3):
+        return self.search_batch([query], k, threshold)[0]
+
+    def best(self, query, threshold=0.3):
+        """The best answer for query, or None when nothing is similar enough"""
+        matches = self.search(query, 1, threshold)
+        return matches[0][0] if matches else None
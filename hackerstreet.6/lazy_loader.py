@@ -0,0 +1,102 @@
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModule:
+    """Stand-in for a module that is only imported on first attribute access.
+
+    The proxy has no public attributes of its own, so every name (numpy.load,
+    torch.load) is the real module's; use ensure_loaded() and is_loaded().
+    """
+
+    def __init__(self, name, on_load=None):
+        self._name = name
+        self._on_load = on_load
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    self._module = importlib.import_module(self._name)
+                    if self._on_load:
+                        self._on_load(self._name, time.perf_counter() - start)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if is_loaded(self) else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name, on_load=None):
+    """Return a proxy for the named module that defers the import until it is used.
+
+    on_load(name, seconds) is called once the import has happened.
+    """
+    return LazyModule(name, on_load)
+
+
+def ensure_loaded(module):
+    """Import a lazy module now (once) and return the real module; plain modules are returned as is"""
+    return module._load() if isinstance(module, LazyModule) else module
+
+
+def is_loaded(module):
+    """Whether a lazy module has been imported yet; always true for plain modules"""
+    return not isinstance(module, LazyModule) or module._module is not None
+
+
+class LazyResource:
+    """An expensive object (e.g. a model) built by factory on first use.
+
+    on_load(name, seconds) is called once it has been built.
+    """
+
+    def __init__(self, name, factory, on_load=None):
+        self.name = name
+        self._factory = factory
+        self._on_load = on_load
+        self._value = None
+        self._lock = threading.Lock()
+        self._warmup_thread = None
+
+    @property
+    def loaded(self):
+        return self._value is not None
+
+    def get(self):
+        """Return the resource, building it if needed; concurrent callers wait for one build"""
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    logger.info(f"Loading {self.name}")
+                    start = time.perf_counter()
+                    self._value = self._factory()
+                    logger.info(f"Loaded {self.name}")
+                    if self._on_load:
+                        self._on_load(self.name, time.perf_counter() - start)
+        return self._value
+
+    def warm_up(self, background=True):
+        """Build the resource ahead of the first request, by default in a daemon thread"""
+        if not background:
+            return self.get()
+        if self._warmup_thread is None:
+            self._warmup_thread = threading.Thread(target=self._warm_up, name=f"warm-up {self.name}", daemon=True)
+            self._warmup_thread.start()
+        return self._warmup_thread
+
+    def _warm_up(self):
+        try:
+            self.get()
+        except Exception as e:
+            logger.error(f"Error warming up {self.name}: {str(e)}")
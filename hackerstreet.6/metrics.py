@@ -0,0 +1,263 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _Tally
+from functools import wraps
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; spans the sub-millisecond rule-based stages up to model generation
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Shard:
+    __slots__ = ('lock', 'value')
+
+    def __init__(self, value):
+        # Only ever contended by a scrape, never by another request
+        self.lock = threading.Lock()
+        self.value = value
+
+
+class _ThreadShards:
+    """Per-thread accumulators, so the hot path never waits on another request.
+
+    Each shard has its own lock, taken by its thread to update it and by
+    total() to read it. Shards of finished threads are folded into one when
+    a new thread starts, which bounds memory under thread-per-request servers.
+    """
+
+    def __init__(self, new, merge):
+        self.new = new
+        self.merge = merge
+        self.retired = new()
+        self._shards = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def get(self):
+        """This thread's shard; update its value while holding its lock"""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._add()
+        return shard
+
+    def _add(self):
+        shard = _Shard(self.new())
+        self._local.shard = shard
+        with self._lock:
+            live = []
+            for thread, other in self._shards:
+                if thread.is_alive():
+                    live.append((thread, other))
+                else:
+                    with other.lock:
+                        self.retired = self.merge(self.retired, other.value)
+            live.append((threading.current_thread(), shard))
+            self._shards = live
+        return shard
+
+    def total(self):
+        with self._lock:
+            total = self.merge(self.new(), self.retired)
+            for _, shard in self._shards:
+                with shard.lock:
+                    total = self.merge(total, shard.value)
+        return total
+
+
+def _add_lists(a, b):
+    return [x + y for x, y in zip(a, b)]
+
+
+def _add_tallies(a, b):
+    a.update(b)
+    return a
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # Bucket counts followed by the running sum
+        self._shards = _ThreadShards(lambda: [0] * (len(self.buckets) + 1) + [0.0], _add_lists)
+
+    def observe(self, value):
+        shard = self._shards.get()
+        with shard.lock:
+            shard.value[bisect_left(self.buckets, value)] += 1
+            shard.value[-1] += value
+
+    def snapshot(self):
+        """(cumulative count per bucket including +Inf, sum, count)"""
+        totals = self._shards.total()
+        cumulative, running = [], 0
+        for n in totals[:-1]:
+            running += n
+            cumulative.append(running)
+        return cumulative, totals[-1], running
+
+
+class LabeledCounter:
+    """A counter with one label, e.g. answers by intent"""
+
+    def __init__(self, name, label, help):
+        self.name = name
+        self.label = label
+        self.help = help
+        self._shards = _ThreadShards(_Tally, _add_tallies)
+
+    def inc(self, value, amount=1):
+        shard = self._shards.get()
+        with shard.lock:
+            shard.value[value] += amount
+
+    def values(self):
+        return dict(self._shards.total())
+
+
+def _abandoned(exc_type):
+    # A request that calls offload() leaves its stages with a BaseException
+    # and is timed when it is restarted on the executor instead
+    return exc_type is not None and not issubclass(exc_type, Exception)
+
+
+class _Stage:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if not _abandoned(exc_type):
+            self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Stage timers and counters for one server process, rendered in Prometheus text format.
+
+    stage(name) times a block into the chat_stage_seconds histogram;
+    counter() creates a counter with one label. Collectors registered with
+    add_collector() contribute metrics computed at scrape time, such as
+    response cache statistics.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._stages = {}
+        self._counters = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self._stages.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._stages.setdefault(name, Histogram(self.buckets))
+        return histogram
+
+    def stage(self, name):
+        """Context manager timing one stage of answering a request"""
+        return _Stage(self.histogram(name))
+
+    def timed(self, name):
+        """Decorator timing every call of a function as a stage"""
+        def decorator(fn):
+            histogram = self.histogram(name)
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as e:
+                    if not _abandoned(type(e)):
+                        histogram.observe(time.perf_counter() - start)
+                    raise
+                histogram.observe(time.perf_counter() - start)
+                return result
+            return wrapper
+        return decorator
+
+    def counter(self, name, label, help):
+        """The counter called name, created on first use"""
+        with self._lock:
+            return self._counters.setdefault(name, LabeledCounter(name, label, help))
+
+    def add_collector(self, collect):
+        """collect() returns (name, type, help, {label tuple: value}) tuples at every scrape"""
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            stages = sorted(self._stages.items())
+            counters = sorted(self._counters.items())
+
+        if stages:
+            lines.append('# HELP chat_stage_seconds Time spent in each stage of answering a request')
+            lines.append('# TYPE chat_stage_seconds histogram')
+        for stage, histogram in stages:
+            cumulative, total, count = histogram.snapshot()
+            for bound, n in zip(self.buckets + ('+Inf',), cumulative):
+                lines.append(f'chat_stage_seconds_bucket{_labels([("stage", stage), ("le", bound)])} {n}')
+            lines.append(f'chat_stage_seconds_sum{_labels([("stage", stage)])} {_number(total)}')
+            lines.append(f'chat_stage_seconds_count{_labels([("stage", stage)])} {count}')
+
+        for name, counter in counters:
+            lines.append(f'# HELP {name} {counter.help}')
+            lines.append(f'# TYPE {name} counter')
+            for value, n in sorted(counter.values().items()):
+                lines.append(f'{name}{_labels([(counter.label, value)])} {_number(n)}')
+
+        for collect in self._collectors:
+            for name, kind, help, samples in collect():
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples.items():
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def cache_collector(cache, name='chat_response_cache'):
+    """Scrape-time metrics for a ResponseCache"""
+    def collect():
+        stats = cache.stats()
+        return [
+            (f'{name}_hits_total', 'counter', 'Answers served from the cache', {(): stats['hits']}),
+            (f'{name}_misses_total', 'counter', 'Answers that had to be computed', {(): stats['misses']}),
+            (f'{name}_evictions_total', 'counter', 'Entries dropped to stay under the size limit',
+             {(): stats['evictions']}),
+            (f'{name}_hit_ratio', 'gauge', 'Share of lookups answered from the cache',
+             {(): stats['hit_rate']}),
+            (f'{name}_entries', 'gauge', 'Entries currently cached', {(): stats['entries']})
+        ]
+    return collect
+
+
+# One registry per process, like the process-wide response caches
+REGISTRY = Metrics()
+stage = REGISTRY.stage
+timed = REGISTRY.timed
+intents = REGISTRY.counter('chat_intents_total', 'intent', 'Chat answers by intent, retrieval, generation or fallback')
@@ -0,0 +1,60 @@
+import logging
+
+from lazy_loader import lazy_import
+
+logger = logging.getLogger(__name__)
+
+torch = lazy_import('torch')
+transformers = lazy_import('transformers')
+pytorch_utils = lazy_import('transformers.pytorch_utils')
+
+INFERENCE_MODES = ('fp32', 'int8')
+
+
+def linearize(model):
+    """Replace GPT-2 style Conv1D projections with equivalent nn.Linear layers.
+
+    DialoGPT's attention and MLP projections are transformers' Conv1D, which
+    dynamic quantization does not recognise; as nn.Linear they get quantized.
+    """
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, pytorch_utils.Conv1D):
+                # Conv1D computes x @ weight + bias with weight shaped (in, out)
+                n_in, n_out = child.weight.shape
+                linear = torch.nn.Linear(n_in, n_out)
+                with torch.no_grad():
+                    linear.weight.copy_(child.weight.t())
+                    linear.bias.copy_(child.bias)
+                setattr(parent, name, linear)
+    return model
+
+
+def quantize(model):
+    """Dynamically quantize the model's linear layers to int8, in place"""
+    return torch.quantization.quantize_dynamic(linearize(model), {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def load_causal_lm(model_name, mode='fp32', num_threads=None):
+    """Load a causal LM and its tokenizer for CPU inference in the given mode.
+
+    The returned model is in eval mode and safe to share between threads as
+    long as callers only run it under torch.inference_mode().
+    """
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"Unknown inference mode {mode!r}, expected one of {', '.join(INFERENCE_MODES)}")
+    if num_threads:
+        torch.set_num_threads(num_threads)
+
+    tokenizer = transformers.AutoTokenizer.from_pretrained(model_name)
+    model = transformers.AutoModelForCausalLM.from_pretrained(model_name)
+    model.eval()
+    if mode == 'int8':
+        model = quantize(model)
+    logger.info(f"Loaded {model_name} ({mode}, {torch.get_num_threads()} threads)")
+    return model, tokenizer
+
+
+def inference_mode():
+    """Context manager for running the model without autograd bookkeeping"""
+    return torch.inference_mode()
@@ -0,0 +1,145 @@
+import math
+from datetime import date
+
+import numpy as np
+
+STRATEGIES = ('avalanche', 'snowball')
+
+# Balances below half a cent count as paid off
+PAID = 0.005
+
+
+def add_months(start, months):
+    """The first day of the month `months` after start's month"""
+    index = start.year * 12 + start.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _priority(strategy, order, balances, rates):
+    # Extra money goes to debts in this order; snowball re-ranks by the
+    # current balance, avalanche and custom orders are fixed
+    if order is not None:
+        return np.asarray(order)
+    if strategy == 'avalanche':
+        return np.lexsort((balances, -rates))
+    if strategy == 'snowball':
+        return np.lexsort((-rates, balances))
+    raise ValueError(f"Unknown strategy {strategy!r}, expected one of {', '.join(STRATEGIES)} or an order")
+
+
+def simulate_payoff(balances, annual_rates, minimum_payments, budget, strategy='avalanche', order=None,
+                    max_months=360, timeline=False, minimums_only=False):
+    """Pay down several debts month by month with a fixed monthly budget.
+
+    Each month interest accrues, every debt gets its minimum payment and the
+    rest of the budget goes to debts in strategy order (avalanche: highest
+    rate first, snowball: smallest balance first, or an explicit order of
+    debt indexes). Payments freed up by paid-off debts roll into the extra.
+    Stops as soon as everything is paid or after max_months. minimums_only
+    pays just the minimums, with no extra and nothing rolled over.
+    """
+    balance = np.array(balances, dtype=np.float64)
+    rates = np.asarray(annual_rates, dtype=np.float64) / 12 / 100
+    minimums = np.asarray(minimum_payments, dtype=np.float64)
+    if not (balance.shape == rates.shape == minimums.shape) or balance.ndim != 1:
+        raise ValueError("balances, rates and minimum payments must be lists of the same length")
+    if not (np.isfinite(balance).all() and np.isfinite(rates).all() and np.isfinite(minimums).all()
+            and math.isfinite(budget)):
+        raise ValueError("Balances, rates, minimum payments and the budget must be finite numbers")
+    if (balance < 0).any() or (rates < 0).any() or (minimums < 0).any() or budget < 0:
+        raise ValueError("Balances, rates, minimum payments and the budget can't be negative")
+    if not minimums_only and budget < minimums.sum() - PAID:
+        raise ValueError(f"The budget of {budget:.2f} doesn't cover the minimum payments of {minimums.sum():.2f}")
+    if order is not None and sorted(order) != list(range(len(balance))):
+        raise ValueError("A custom order must list every debt index exactly once")
+
+    n_debts = len(balance)
+    interest = np.zeros(n_debts)
+    paid = np.zeros(n_debts)
+    payoff_month = np.full(n_debts, -1)
+    payoff_month[balance <= PAID] = 0
+    history = []
+    priority = _priority(strategy, order, balance, rates)
+
+    month = 0
+    while month < max_months and (balance > PAID).any():
+        month += 1
+        accrued = balance * rates
+        interest += accrued
+        balance += accrued
+
+        payment = np.minimum(minimums, balance)
+        remaining = balance - payment
+        extra = 0.0 if minimums_only else budget - payment.sum()
+
+        if strategy == 'snowball' and order is None:
+            priority = np.lexsort((-rates, remaining))
+        # Fill debts in priority order: each takes what is left of the extra, up to its balance
+        ranked = remaining[priority]
+        before = np.cumsum(ranked) - ranked
+        payment[priority] += np.clip(extra - before, 0, ranked)
+
+        balance -= payment
+        paid += payment
+        newly_paid = (balance <= PAID) & (payoff_month < 0)
+        payoff_month[newly_paid] = month
+        balance[balance <= PAID] = 0
+        if timeline:
+            history.append(balance.copy())
+
+    result = {
+        'strategy': 'minimums' if minimums_only else strategy if order is None else 'custom',
+        'months': month,
+        'paid_off': bool((balance <= PAID).all()),
+        'payoff_month': payoff_month,
+        'interest': interest,
+        'total_interest': float(interest.sum()),
+        'total_paid': float(paid.sum()),
+        'remaining_balance': balance
+    }
+    if timeline:
+        result['timeline'] = np.array(history).reshape(month, n_debts)
+    return result
+
+
+def compare_strategies(balances, annual_rates, minimum_payments, budget, strategies=STRATEGIES, orders=(),
+                       max_months=360, timeline=False, start=None):
+    """Simulate each strategy (and custom order) and how much interest it saves over paying only the minimums"""
+    start = start or date.today()
+    baseline = simulate_payoff(balances, annual_rates, minimum_payments, 0, max_months=max_months,
+                               minimums_only=True)
+    runs = [simulate_payoff(balances, annual_rates, minimum_payments, budget, strategy=strategy,
+                            max_months=max_months, timeline=timeline) for strategy in strategies]
+    runs += [simulate_payoff(balances, annual_rates, minimum_payments, budget, order=order,
+                             max_months=max_months, timeline=timeline) for order in orders]
+
+    plans = []
+    for run in runs:
+        plan = {
+            'strategy': run['strategy'],
+            'months': run['months'],
+            'paid_off': run['paid_off'],
+            'debt_free_date': add_months(start, run['months']).isoformat() if run['paid_off'] else None,
+            'total_interest': round(run['total_interest'], 2),
+            'interest_saved': round(baseline['total_interest'] - run['total_interest'], 2),
+            'total_paid': round(run['total_paid'], 2),
+            'debts': [
+                {
+                    'payoff_month': int(month) if month >= 0 else None,
+                    'payoff_date': add_months(start, int(month)).isoformat() if month >= 0 else None,
+                    'interest': round(float(interest), 2)
+                }
+                for month, interest in zip(run['payoff_month'], run['interest'])
+            ]
+        }
+        if timeline:
+            plan['timeline'] = np.round(run['timeline'], 2).tolist()
+        plans.append(plan)
+    return {
+        'minimum_payments_only': {
+            'months': baseline['months'],
+            'paid_off': baseline['paid_off'],
+            'total_interest': round(baseline['total_interest'], 2)
+        },
+        'plans': plans
+    }
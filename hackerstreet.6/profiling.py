@@ -0,0 +1,107 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from functools import wraps
+
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack every `interval` seconds from a helper thread.
+
+    Unlike cProfile the profiled code runs at full speed; the cost is one
+    stack walk per sample on the helper thread. CPU-bound code only yields
+    the GIL every switch interval (5 ms by default), which caps the rate.
+    """
+
+    def __init__(self, interval=0.001, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+
+    def collapsed(self):
+        """Stacks in the collapsed format flamegraph.pl and speedscope read"""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def hottest(self, n=10):
+        """The functions most often on top of the stack, with their share of the samples"""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return [(function, count / self.samples) for function, count in leaves.most_common(n)]
+
+
+class RequestProfiler:
+    """Profiles the requests that send `X-Profile: 1` while profiling is enabled.
+
+    Profiles of the last `keep` such requests are kept for /api/profiles.
+    """
+
+    HEADER = 'X-Profile'
+
+    def __init__(self, enabled=False, interval=0.001, keep=20):
+        self.enabled = enabled
+        self.interval = interval
+        self.profiles = deque(maxlen=keep)
+
+    def wrap(self, view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not self.enabled or request.headers.get(self.HEADER) != '1':
+                return view(*args, **kwargs)
+            start = time.perf_counter()
+            with SamplingProfiler(self.interval) as profiler:
+                response = view(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            self.profiles.append({
+                'path': request.path,
+                'timestamp': time.time(),
+                'duration_ms': elapsed * 1000,
+                'samples': profiler.samples,
+                'hottest': profiler.hottest(),
+                'collapsed': profiler.collapsed()
+            })
+            logger.info(f"Profiled {request.path}: {elapsed * 1000:.1f}ms, {profiler.samples} samples")
+            return response
+        return wrapper
+
+    def recent(self):
+        return list(self.profiles)
+
+
+def request_profiler():
+    """A RequestProfiler configured from PROFILE_REQUESTS and PROFILE_INTERVAL_MS"""
+    return RequestProfiler(enabled=os.getenv('PROFILE_REQUESTS', 'False').lower() == 'true',
+                           interval=float(os.getenv('PROFILE_INTERVAL_MS', 1)) / 1000)
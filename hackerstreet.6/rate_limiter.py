@@ -0,0 +1,201 @@
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from functools import wraps
+
+from flask import jsonify, request
+
+logger = logging.getLogger(__name__)
+
+def take_token(tokens, updated, now, capacity, rate, cost=1):
+    """Refill a token bucket up to now and try to take `cost` tokens.
+
+    Returns (allowed, tokens left, seconds until there are enough tokens).
+    """
+    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / rate
+
+
+class MemoryBackend:
+    """Per-process token buckets, sharded over independently locked stripes"""
+
+    def __init__(self, stripes=64, max_keys_per_stripe=4096):
+        self.max_keys_per_stripe = max_keys_per_stripe
+        self._stripes = [{} for _ in range(stripes)]
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._prune_at = [max_keys_per_stripe] * stripes
+
+    def acquire(self, key, capacity, rate, now, cost=1):
+        index = hash(key) % len(self._stripes)
+        buckets = self._stripes[index]
+        with self._locks[index]:
+            tokens, updated = buckets.get(key, (capacity, now))
+            allowed, tokens, retry_after = take_token(tokens, updated, now, capacity, rate, cost)
+            buckets[key] = (tokens, now)
+            if len(buckets) > self._prune_at[index]:
+                self._prune(index, capacity, rate, now)
+        return allowed, retry_after
+
+    def _prune(self, index, capacity, rate, now):
+        # A bucket that has refilled completely is the same as no bucket.
+        # Doubling the threshold keeps pruning amortized O(1) when most
+        # clients are active.
+        buckets = self._stripes[index]
+        for key, (tokens, updated) in list(buckets.items()):
+            if tokens + (now - updated) * rate >= capacity:
+                del buckets[key]
+        self._prune_at[index] = max(self.max_keys_per_stripe, 2 * len(buckets))
+
+
+class FileBackend:
+    """Token buckets in a memory-mapped file shared by every worker process on the host.
+
+    Clients hash to fixed slots; each slot is guarded by a thread lock stripe
+    within the process and an fcntl record lock across processes. Two clients
+    that land in the same slot share (and reset) it, so size slots well above
+    the number of concurrently active clients.
+    """
+
+    SLOT = struct.Struct('<Qdd')
+
+    def __init__(self, path, slots=65536, stripes=64):
+        # POSIX only, so imported here rather than for every platform
+        import fcntl
+        self._fcntl = fcntl
+        self.path = path
+        self.slots = slots
+        size = slots * self.SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._mmap = mmap.mmap(self._fd, size)
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def acquire(self, key, capacity, rate, now, cost=1):
+        # Python's hash() differs between processes, so use a stable digest
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+        slot = digest % self.slots
+        offset = slot * self.SLOT.size
+        fcntl = self._fcntl
+        with self._locks[slot % len(self._locks)]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self.SLOT.size, offset)
+            try:
+                stored, tokens, updated = self.SLOT.unpack_from(self._mmap, offset)
+                if stored != digest:
+                    tokens, updated = capacity, now
+                allowed, tokens, retry_after = take_token(tokens, updated, now, capacity, rate, cost)
+                self.SLOT.pack_into(self._mmap, offset, digest, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self.SLOT.size, offset)
+        return allowed, retry_after
+
+    def close(self):
+        self._mmap.close()
+        os.close(self._fd)
+
+
+class RateLimiter:
+    """Allows each client `limit` requests per `period` seconds, with bursts up to `limit`"""
+
+    def __init__(self, limit=10, period=60, backend=None):
+        if not limit > 0 or not 0 < period < math.inf:
+            raise ValueError(f"Rate limits need a positive limit and period, got {limit} per {period} seconds")
+        self.capacity = limit
+        self.rate = limit / period
+        self.backend = backend or MemoryBackend()
+
+    def acquire(self, key, cost=1):
+        """Take `cost` requests from key's budget; returns (allowed, seconds until it may retry).
+
+        A cost above the limit is never allowed.
+        """
+        # Wall-clock time, so buckets in a shared file mean the same thing in every process
+        return self.backend.acquire(key, self.capacity, self.rate, time.time(), cost)
+
+
+def backend_from_env():
+    """A FileBackend on RATE_LIMIT_FILE, shared by the worker processes, or None for per-process buckets"""
+    path = os.getenv('RATE_LIMIT_FILE')
+    return FileBackend(path) if path else None
+
+
+def api_keys_from_env():
+    """Comma-separated keys in API_KEYS, issued to clients"""
+    return frozenset(key.strip() for key in os.getenv('API_KEYS', '').split(',') if key.strip())
+
+
+class ClientLimiter:
+    """Rate limits Flask requests per client: per API key when a known one is sent,
+    otherwise per client address.
+
+    Any X-API-Key outside api_keys is ignored, so a client can't dodge its
+    limit by sending a new key with every request. error_fields are added to
+    the body of 429 responses.
+    """
+
+    def __init__(self, limiter, api_keys=frozenset(), scope='', **error_fields):
+        self.limiter = limiter
+        self.api_keys = api_keys
+        self.scope = scope
+        self.error_fields = error_fields
+
+    @classmethod
+    def from_env(cls, prefix='RATE_LIMIT', limit=10, period=60, backend=None, scope='', **error_fields):
+        """Configured by <prefix> requests per <prefix>_PERIOD seconds, RATE_LIMIT_FILE and API_KEYS.
+
+        Limiters that share a backend need distinct scopes to keep their buckets apart.
+        """
+        try:
+            limiter = RateLimiter(
+                limit=int(os.getenv(prefix, limit)),
+                period=float(os.getenv(f'{prefix}_PERIOD', period)),
+                backend=backend or backend_from_env()
+            )
+        except ValueError as e:
+            raise ValueError(f"Invalid {prefix} or {prefix}_PERIOD: {str(e)}") from e
+        return cls(limiter, api_keys_from_env(), scope, **error_fields)
+
+    def keep_in_memory(self):
+        """Switch to per-process buckets if a RATE_LIMIT_FILE is in use.
+
+        AsyncServer runs limited requests on the event loop, where the file's
+        record locks would stall every other request; pass this as on_start.
+        """
+        if isinstance(self.limiter.backend, FileBackend):
+            logger.warning(f"Rate limits are kept per process under ASGI; ignoring {self.limiter.backend.path}")
+            self.limiter.backend = MemoryBackend()
+
+    @property
+    def capacity(self):
+        return self.limiter.capacity
+
+    def client_key(self):
+        api_key = request.headers.get('X-API-Key')
+        client = f"key:{api_key}" if api_key in self.api_keys else f"ip:{request.remote_addr}"
+        return f"{self.scope}{client}"
+
+    def check(self, cost=1):
+        """Charge the current request's client; returns a 429 response when over the limit, else None"""
+        allowed, retry_after = self.limiter.acquire(self.client_key(), cost)
+        if allowed:
+            return None
+        response = jsonify({"error": "Rate limit exceeded. Please try again later.", **self.error_fields})
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response, 429
+
+    def limit(self, f):
+        """Decorator charging one request per call of a Flask view"""
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            limited = self.check()
+            if limited:
+                return limited
+            return f(*args, **kwargs)
+        return decorated_function
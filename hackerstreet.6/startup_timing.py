@@ -0,0 +1,51 @@
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Records how long each import/initialization phase of a server takes.
+
+    Imports and resources deferred until first use are recorded with
+    record_lazy() whenever they load, and reported apart from startup; a
+    resource's time includes any lazy imports it triggers.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+        self.lazy = []
+        self.finished = None
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block under the given phase name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def record_lazy(self, name, seconds):
+        """Record a lazily loaded import or resource; pass as on_load to lazy_loader"""
+        self.lazy.append((name, seconds))
+        logger.info(f"Loaded {name} on first use in {seconds * 1000:.1f}ms")
+
+    def report(self):
+        """Startup phase durations, total startup time and lazily loaded parts so far, in milliseconds"""
+        finished = self.finished if self.finished is not None else time.perf_counter()
+        return {
+            'phases': {name: round(seconds * 1000, 2) for name, seconds in self.phases},
+            'total_ms': round((finished - self.started) * 1000, 2),
+            'lazy': {name: round(seconds * 1000, 2) for name, seconds in list(self.lazy)}
+        }
+
+    def log_report(self, log=None):
+        """Mark startup as finished and log one line with the per-phase breakdown"""
+        self.finished = time.perf_counter()
+        report = self.report()
+        phases = ', '.join(f"{name}={ms:.1f}ms" for name, ms in report['phases'].items())
+        (log or logger).info(f"Startup took {report['total_ms']:.1f}ms ({phases})")
+        return report
@@ -0,0 +1,7 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Endpoint tests share one client address; keep them clear of the default limit
+os.environ.setdefault('RATE_LIMIT', '1000000')
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+import amortization
+from app import app, calculate_payment_plan
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def test_amortize_matches_scalar_plan():
+    loans = [(1000, 5, 2), (250000, 6.5, 30), (12000, 18, 4.5)]
+    principal, interest_rate, years = np.array(loans).T
+    result = amortization.amortize(principal, interest_rate, years)
+    for row, loan in enumerate(loans):
+        expected = calculate_payment_plan(*loan)
+        assert round(float(result['monthly_payment'][row]), 2) == expected['monthly_payment']
+        assert round(float(result['total_interest'][row]), 2) == expected['total_interest']
+
+
+def test_amortize_rejects_non_positive_values():
+    with pytest.raises(ValueError):
+        amortization.amortize([1000, 0], [5, 5], [2, 2])
+
+
+def test_schedule_pays_off_the_loan():
+    schedule = amortization.schedules([1000, 2000], [5, 7], [1, 2])
+    assert schedule['balance'].shape == (2, 24)
+    assert schedule['balance'][0, 11] == pytest.approx(0, abs=1e-6)
+    assert np.isnan(schedule['balance'][0, 12])
+    assert np.nansum(schedule['principal'][1]) == pytest.approx(2000)
+
+
+def test_batch_rejects_overflowing_plans_individually(client):
+    response = client.post('/api/payment-plans/batch', json={'plans': [
+        {'principal': 1e5, 'interest_rate': 1e5, 'years': 50},
+        {'principal': 1000, 'interest_rate': 5, 'years': 2},
+        {'principal': 1e306, 'interest_rate': 500, 'years': 50},
+    ]})
+    assert response.status_code == 200
+    plans = response.get_json()['plans']
+    assert 'error' in plans[0] and 'error' in plans[2]
+    assert plans[1]['monthly_payment'] == calculate_payment_plan(1000, 5, 2)['monthly_payment']
+
+
+def test_batch_schedule_matches_term(client):
+    response = client.post('/api/payment-plans/batch', json={
+        'schedule': True, 'plans': [{'principal': 1200, 'interest_rate': 12, 'years': 1}]})
+    plan = response.get_json()['plans'][0]
+    assert len(plan['schedule']['balance']) == 12
+    assert plan['schedule']['balance'][-1] == 0
+
+
+def test_batch_rejects_long_terms_individually(client):
+    response = client.post('/api/payment-plans/batch', json={'plans': [
+        {'principal': 1000, 'interest_rate': 5, 'years': 2},
+        {'principal': 1000, 'interest_rate': 5, 'years': 51},
+        {'principal': 5000, 'interest_rate': 3, 'years': 50},
+    ]})
+    assert response.status_code == 200
+    plans = response.get_json()['plans']
+    assert plans[1] == {'error': 'Terms are limited to 50 years'}
+    assert plans[0]['years'] == 2 and plans[2]['years'] == 50
@@ -0,0 +1,62 @@
+import asyncio
+
+from flask import Flask
+
+from async_server import AsyncServer, offload
+
+
+def make_app():
+    app = Flask(__name__)
+
+    @app.route('/fast')
+    def fast():
+        return 'fast'
+
+    @app.route('/slow')
+    def slow():
+        offload('model')
+        return 'slow'
+
+    return app
+
+
+def call(server, path):
+    messages = []
+    requests = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # Like a real server, wait until the client disconnects
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'headers': [], 'client': ('127.0.0.1', 1)}
+    asyncio.run(server(scope, receive, send))
+    status = messages[0]['status']
+    return status, b''.join(message.get('body', b'') for message in messages[1:])
+
+
+def test_inline_and_offloaded_requests():
+    server = AsyncServer(make_app())
+    try:
+        assert call(server, '/fast') == (200, b'fast')
+        assert call(server, '/slow') == (200, b'slow')
+        assert server.inline == 1 and server.offloaded == 1
+    finally:
+        for executor in server.executors.values():
+            executor.shutdown()
+
+
+def test_on_start_runs_once_without_lifespan():
+    started = []
+    server = AsyncServer(make_app(), on_start=(lambda: started.append(1),))
+    try:
+        call(server, '/fast')
+        call(server, '/fast')
+        assert started == [1]
+    finally:
+        for executor in server.executors.values():
+            executor.shutdown()
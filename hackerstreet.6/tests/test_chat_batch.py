@@ -0,0 +1,48 @@
+import pytest
+
+import app as server
+from rate_limiter import ClientLimiter, RateLimiter
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, 'limiter', ClientLimiter(RateLimiter(limit=10, period=60)))
+    monkeypatch.setattr(server, 'rate_limit', server.limiter.limit)
+    monkeypatch.setattr(server, 'batch_limiter', ClientLimiter(RateLimiter(limit=100, period=60), scope='batch:'))
+    server.response_cache.clear()
+    return server.app.test_client()
+
+
+def test_batch_answers_in_order(client):
+    response = client.post('/api/chat/batch', json={'messages': ['hello', '', 'tell me about Japan']})
+    results = response.get_json()['results']
+    assert response.status_code == 200
+    assert len(results) == 3
+    assert results[1] == {"error": "Invalid message format"}
+    assert results[2]['type'] == 'country_info'
+    assert results[2]['data']['name'] == 'Japan'
+
+
+def test_batch_is_not_capped_by_the_request_limit(client):
+    messages = ['hello'] * 40
+    assert client.post('/api/chat/batch', json={'messages': messages}).status_code == 200
+    assert client.post('/api/chat/batch', json={'messages': messages}).status_code == 200
+    # 80 of 100 messages used; the next batch of 40 is over budget
+    response = client.post('/api/chat/batch', json={'messages': messages})
+    assert response.status_code == 429
+    assert 'Retry-After' in response.headers
+
+
+def test_batch_larger_than_the_budget_is_rejected(client):
+    response = client.post('/api/chat/batch', json={'messages': ['hello'] * 101})
+    assert response.status_code == 400
+    assert '100' in response.get_json()['error']
+
+
+def test_repeated_greetings_count_one_miss(client):
+    before = server.response_cache.stats()
+    for _ in range(5):
+        client.post('/api/chat', json={'message': 'hello'})
+    after = server.response_cache.stats()
+    assert after['hits'] - before['hits'] == 4
+    assert after['misses'] - before['misses'] == 1
@@ -0,0 +1,112 @@
+import sqlite3
+
+from chat_history import HistoryStore
+
+
+def fill(store, count, session_id=None, start=0):
+    for i in range(start, start + count):
+        store.append(f'message {i}', f'response {i}', 'success', f't{i}', session_id=session_id)
+    store.flush()
+
+
+def messages(entries):
+    return [entry['message'] for entry in entries]
+
+
+def test_pages_in_memory_oldest_first():
+    store = HistoryStore(capacity=10)
+    fill(store, 5)
+    entries, cursor = store.page(0, 3)
+    assert messages(entries) == ['message 0', 'message 1', 'message 2']
+    entries, cursor = store.page(cursor, 3)
+    assert messages(entries) == ['message 3', 'message 4']
+    assert cursor is None
+
+
+def test_memory_only_store_forgets_evicted_entries():
+    store = HistoryStore(capacity=3)
+    fill(store, 5)
+    entries, _ = store.page(0, 10)
+    assert messages(entries) == ['message 2', 'message 3', 'message 4']
+    assert not store.needs_disk(0)
+
+
+def test_older_pages_come_from_the_database(tmp_path):
+    store = HistoryStore(capacity=3, db_path=str(tmp_path / 'history.db'))
+    fill(store, 8)
+    assert store.needs_disk(0)
+    entries, cursor = store.page(0, 5)
+    assert messages(entries) == [f'message {i}' for i in range(5)]
+    entries, cursor = store.page(cursor, 5)
+    assert messages(entries) == ['message 5', 'message 6', 'message 7']
+    assert cursor is None
+
+
+def test_filters_by_session(tmp_path):
+    store = HistoryStore(capacity=4, db_path=str(tmp_path / 'history.db'))
+    fill(store, 3, session_id='a')
+    fill(store, 3, session_id='b', start=3)
+    fill(store, 3, session_id='a', start=6)
+    entries, _ = store.page(0, 10, session_id='a')
+    assert messages(entries) == [f'message {i}' for i in (0, 1, 2, 6, 7, 8)]
+
+
+def test_shared_database_rows_are_not_skipped(tmp_path):
+    path = str(tmp_path / 'history.db')
+    first = HistoryStore(capacity=100, db_path=path)
+    second = HistoryStore(capacity=100, db_path=path)
+    for i in range(6):
+        store = first if i % 2 == 0 else second
+        store.append(f'message {i}', 'response', 'success', f't{i}')
+        store.flush()
+    assert first.needs_disk(0)
+    entries, cursor = first.page(0, 10)
+    assert messages(entries) == [f'message {i}' for i in range(6)]
+    assert cursor is None
+
+
+def test_rows_other_processes_write_later_are_seen(tmp_path):
+    path = str(tmp_path / 'history.db')
+    first = HistoryStore(capacity=100, db_path=path)
+    second = HistoryStore(capacity=100, db_path=path)
+    fill(first, 2)
+    entries, cursor = first.page(0, 10)
+    assert messages(entries) == ['message 0', 'message 1'] and cursor is None
+    # Written by the other store only; the first has written nothing since
+    fill(second, 3, start=2)
+    entries, cursor = first.page(0, 2)
+    assert messages(entries) == ['message 0', 'message 1']
+    assert cursor == 2
+    entries, cursor = first.page(cursor, 10)
+    assert messages(entries) == ['message 2', 'message 3', 'message 4']
+    assert cursor is None
+
+
+def test_queued_entries_are_paged_without_flushing(tmp_path):
+    store = HistoryStore(capacity=10, db_path=str(tmp_path / 'history.db'))
+    for i in range(3):
+        store.append(f'message {i}', 'response', 'success', f't{i}')
+    entries, _ = store.page(0, 10)
+    assert messages(entries) == ['message 0', 'message 1', 'message 2']
+
+
+def test_restart_warms_the_ring_from_disk(tmp_path):
+    path = str(tmp_path / 'history.db')
+    fill(HistoryStore(capacity=5, db_path=path), 7)
+    store = HistoryStore(capacity=5, db_path=path)
+    entries, _ = store.page(0, 10)
+    assert messages(entries) == [f'message {i}' for i in range(7)]
+
+
+def test_one_bad_entry_does_not_lose_its_batch(tmp_path):
+    path = str(tmp_path / 'history.db')
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE chat_history (id INTEGER PRIMARY KEY, session_id TEXT, timestamp TEXT, "
+                           "message TEXT, response TEXT, status TEXT CHECK (status != 'bad'))")
+    store = HistoryStore(capacity=10, db_path=path, batch_size=256)
+    for i in range(5):
+        store.append(f'message {i}', 'response', 'bad' if i == 2 else 'success', f't{i}')
+    store.append({'text': 'not a string'}, 'response', 'success', 't5')
+    store.flush()
+    entries, _ = store.page(0, 10)
+    assert messages(entries) == ['message 0', 'message 1', 'message 3', 'message 4', '{"text": "not a string"}']
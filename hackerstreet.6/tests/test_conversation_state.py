@@ -0,0 +1,26 @@
+import pytest
+
+from conversation_state import Conversation, ConversationStore
+
+
+def test_history_budget_must_leave_room_for_the_answer():
+    with pytest.raises(ValueError, match='max_history_tokens'):
+        ConversationStore(max_history_tokens=101, max_new_tokens=100)
+    with pytest.raises(ValueError):
+        ConversationStore(max_history_tokens=50, max_new_tokens=100)
+    ConversationStore(max_history_tokens=102, max_new_tokens=100)
+
+
+def test_truncate_keeps_the_newest_tokens():
+    conversation = Conversation()
+    conversation.turns = [[1, 2, 3], [4, 5, 6], [7, 8, 9, 10]]
+    conversation._truncate(5)
+    assert conversation.turns == [[7, 8, 9, 10]]
+    assert conversation.past_key_values is None
+
+
+def test_truncate_cuts_a_single_long_turn_from_the_front():
+    conversation = Conversation()
+    conversation.turns = [list(range(10))]
+    conversation._truncate(4)
+    assert conversation.turns == [[6, 7, 8, 9]]
@@ -0,0 +1,78 @@
+import os
+
+from data_cache import load_debt_frame
+
+CSV = "Country,Year,Debt-to-GDP Ratio,Total Debt (USD)\nA,2020,50.0,100\nA,2021,55.0,110\n"
+
+
+def write_csv(path, text=CSV):
+    with open(path, 'w') as f:
+        f.write(text)
+    return str(path)
+
+
+def test_cache_round_trip(tmp_path):
+    csv = write_csv(tmp_path / 'debt.csv')
+    first = load_debt_frame(csv, str(tmp_path / 'cache'))
+    second = load_debt_frame(csv, str(tmp_path / 'cache'))
+    assert first['Country'].tolist() == second['Country'].tolist() == ['A', 'A']
+    assert second['Year'].tolist() == [2020, 2021]
+
+
+def test_prune_keeps_unrelated_entries(tmp_path):
+    cache = tmp_path / 'cache'
+    (cache / 'important_project').mkdir(parents=True)
+    (cache / ('0' * 64)).mkdir()
+    load_debt_frame(write_csv(tmp_path / 'debt.csv'), str(cache))
+    assert (cache / 'important_project').is_dir()
+    assert (cache / ('0' * 64)).is_dir()
+
+
+def test_prune_only_removes_stale_versions_of_the_same_source(tmp_path):
+    cache = str(tmp_path / 'cache')
+    debt = write_csv(tmp_path / 'debt.csv')
+    other = write_csv(tmp_path / 'other.csv')
+    load_debt_frame(debt, cache)
+    load_debt_frame(other, cache)
+    assert len(os.listdir(cache)) == 2
+
+    write_csv(debt, CSV + "B,2020,70.0,200\n")
+    load_debt_frame(debt, cache)
+    assert len(os.listdir(cache)) == 2
+    assert load_debt_frame(other, cache)['Country'].tolist() == ['A', 'A']
+    assert load_debt_frame(debt, cache)['Country'].tolist() == ['A', 'A', 'B']
+
+
+def test_reloader_maps_the_lookup_index_from_the_cache(tmp_path):
+    import numpy as np
+
+    from data_processor import DebtDataProcessor
+    from data_reloader import DatasetReloader
+
+    csv = write_csv(tmp_path / 'debt.csv', CSV + "B,2021,70.0,200\nA,2019,45.0,90\n")
+    DatasetReloader(csv, cache_dir=str(tmp_path / 'cache'))
+    processor = DatasetReloader(csv, cache_dir=str(tmp_path / 'cache')).current()
+    assert isinstance(processor._ratio_col, np.memmap)
+    assert isinstance(processor._by_year, np.memmap)
+
+    plain = DebtDataProcessor(csv)
+    for country in ('A', 'B', 'C'):
+        assert processor.get_country_debt(country) == plain.get_country_debt(country)
+        assert processor.get_country_debt(country, 2020) == plain.get_country_debt(country, 2020)
+        assert processor.get_historical_data(country).equals(plain.get_historical_data(country))
+
+
+def test_entries_without_arrays_are_rewritten_with_them(tmp_path):
+    from data_cache import load_debt_dataset, read_array_cache, source_digest
+    from data_processor import DebtDataProcessor
+
+    cache = str(tmp_path / 'cache')
+    csv = write_csv(tmp_path / 'debt.csv')
+    load_debt_frame(csv, cache)
+    digest = source_digest(csv)
+    assert read_array_cache(cache, digest, csv) is None
+
+    data, index = load_debt_dataset(csv, cache, build_arrays=DebtDataProcessor.build_row_index)
+    assert index['countries'].tolist() == ['A']
+    assert set(read_array_cache(cache, digest, csv)) == set(index)
+    assert len(os.listdir(cache)) == 1
@@ -0,0 +1,146 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_processor import DebtDataProcessor
+
+
+class MaskedProcessor:
+    """The original boolean-mask lookups, kept as the reference for the index"""
+
+    def __init__(self, data):
+        self.data = data
+        self.years = sorted(data['Year'].unique())
+
+    def get_country_debt(self, country, year=None):
+        if year:
+            mask = (self.data['Country'] == country) & (self.data['Year'] == year)
+        else:
+            mask = self.data['Country'] == country
+            year = self.years[-1]
+        country_data = self.data[mask]
+        if country_data.empty:
+            return None
+        latest = country_data.iloc[-1]
+        return {
+            'country': country,
+            'year': year,
+            'debt_to_gdp': latest['Debt-to-GDP Ratio'],
+            'total_debt': latest['Total Debt (USD)'],
+            'trend': self._calculate_trend(country)
+        }
+
+    def get_top_countries(self, metric='debt_to_gdp', n=5, highest=True, year=None):
+        year_data = self.data[self.data['Year'] == (year or self.years[-1])]
+        column = 'Debt-to-GDP Ratio' if metric == 'debt_to_gdp' else 'Total Debt (USD)'
+        return year_data.sort_values(column, ascending=not highest).head(n)[
+            ['Country', 'Debt-to-GDP Ratio', 'Total Debt (USD)']]
+
+    def get_debt_trend(self, country):
+        country_data = self.data[self.data['Country'] == country]
+        if len(country_data) < 2:
+            return "Insufficient data"
+        latest_ratio = country_data.iloc[-1]['Debt-to-GDP Ratio']
+        previous_ratio = country_data.iloc[-2]['Debt-to-GDP Ratio']
+        if latest_ratio > previous_ratio:
+            return "Increasing"
+        elif latest_ratio < previous_ratio:
+            return "Decreasing"
+        return "Stable"
+
+    def _calculate_trend(self, country):
+        ratios = self.data[self.data['Country'] == country]['Debt-to-GDP Ratio'].values
+        if len(ratios) < 3:
+            return "Insufficient data"
+        if all(ratios[i] <= ratios[i+1] for i in range(len(ratios)-1)):
+            return "Increasing"
+        elif all(ratios[i] >= ratios[i+1] for i in range(len(ratios)-1)):
+            return "Decreasing"
+        return "Fluctuating"
+
+    def get_comparison(self, countries):
+        comparison = []
+        for country in countries:
+            data = self.get_country_debt(country, self.years[-1])
+            if data:
+                comparison.append({key: data[key] for key in ('country', 'debt_to_gdp', 'total_debt', 'trend')})
+        return comparison
+
+    def get_historical_data(self, country, start_year=None, end_year=None):
+        mask = self.data['Country'] == country
+        if start_year:
+            mask &= self.data['Year'] >= start_year
+        if end_year:
+            mask &= self.data['Year'] <= end_year
+        return self.data[mask][['Year', 'Debt-to-GDP Ratio', 'Total Debt (USD)']]
+
+
+def random_table(rng):
+    """Rows in shuffled order with repeated years, missing countries and missing ratios"""
+    n = int(rng.integers(1, 80))
+    countries = np.array(['A', 'B', 'C', 'D', 'E', None], dtype=object)
+    ratio = np.round(rng.uniform(10, 120, n), 0)
+    ratio[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({
+        'Country': countries[rng.integers(0, len(countries), n)],
+        'Year': rng.integers(2015, 2024, n),
+        'Debt-to-GDP Ratio': ratio,
+        'Total Debt (USD)': np.round(rng.uniform(1, 50, n), 1)
+    })
+
+
+def same(a, b):
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(same(a[k], b[k]) for k in a)
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return a == b
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_index_matches_mask_lookups(seed):
+    rng = np.random.default_rng(seed)
+    data = random_table(rng)
+    processor = DebtDataProcessor(None, data=data)
+    reference = MaskedProcessor(data)
+    countries = list(data['Country'].unique()) + ['Nowhere']
+
+    for country in countries:
+        assert same(processor.get_country_debt(country), reference.get_country_debt(country))
+        for year in range(2014, 2025):
+            assert same(processor.get_country_debt(country, year), reference.get_country_debt(country, year))
+        assert processor.get_debt_trend(country) == reference.get_debt_trend(country)
+        assert processor._calculate_trend(country) == reference._calculate_trend(country)
+        for start, end in ((None, None), (2017, None), (None, 2020), (2018, 2021)):
+            pd.testing.assert_frame_equal(processor.get_historical_data(country, start, end),
+                                          reference.get_historical_data(country, start, end))
+
+    comparison = processor.get_comparison(countries)
+    expected = reference.get_comparison(countries)
+    assert len(comparison) == len(expected)
+    assert all(same(a, b) for a, b in zip(comparison, expected))
+
+    for year in (None, *processor.years):
+        for metric in ('debt_to_gdp', 'total_debt'):
+            for highest in (True, False):
+                pd.testing.assert_frame_equal(
+                    processor.get_top_countries(metric, 3, highest, year),
+                    reference.get_top_countries(metric, 3, highest, year))
+
+
+def test_latest_row_follows_file_order_not_year():
+    data = pd.DataFrame({
+        'Country': ['A', 'A', 'A', 'A'],
+        'Year': [2022, 2020, 2021, 2020],
+        'Debt-to-GDP Ratio': [70.0, 50.0, 60.0, 55.0],
+        'Total Debt (USD)': [7.0, 5.0, 6.0, 5.5]
+    })
+    processor = DebtDataProcessor(None, data=data)
+    assert processor.get_country_debt('A')['debt_to_gdp'] == 55.0
+    # The later of two rows for the same year wins
+    assert processor.get_country_debt('A', 2020)['debt_to_gdp'] == 55.0
+    assert processor.get_debt_trend('A') == "Decreasing"
+    assert processor._calculate_trend('A') == "Fluctuating"
+    assert processor.get_historical_data('A')['Year'].tolist() == [2022, 2020, 2021, 2020]
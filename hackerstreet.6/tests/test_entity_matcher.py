@@ -0,0 +1,54 @@
+from data_processor import DebtDataProcessor
+from entity_matcher import EntityMatcher
+
+COUNTRIES = ['Oman', 'India', 'Niger', 'Nigeria', 'United States', 'United Kingdom', 'Japan']
+
+
+def test_names_only_match_whole_words():
+    matcher = EntityMatcher(COUNTRIES)
+    assert matcher.find('a woman from romania') is None
+    assert matcher.find('debt in indiana') is None
+    assert matcher.find('debt in Oman, please') == 'Oman'
+
+
+def test_longest_name_wins():
+    matcher = EntityMatcher(COUNTRIES)
+    assert matcher.find('Nigeria debt') == 'Nigeria'
+    assert matcher.find('Niger debt') == 'Niger'
+    assert matcher.find_all('United States of America and Nigeria') == ['United States', 'Nigeria']
+
+
+def test_aliases_map_to_country_names():
+    matcher = EntityMatcher(COUNTRIES)
+    assert matcher.find('How is the UK doing?') == 'United Kingdom'
+    assert matcher.find('great britain') == 'United Kingdom'
+    assert matcher.find('compare USA and nippon') == 'United States'
+    assert matcher.find_all('compare U.S.A. and nippon') == ['United States', 'Japan']
+
+
+def test_case_handling():
+    matcher = EntityMatcher(COUNTRIES)
+    assert matcher.find('JAPAN vs japan') == 'Japan'
+    assert matcher.find('debt of the US') == 'United States'
+    assert matcher.find('tell us about debt') is None
+    assert matcher.find('tell Us about debt') is None
+
+
+def test_mentions_are_reported_once_in_order():
+    matcher = EntityMatcher(COUNTRIES)
+    assert matcher.find_all('Japan, India, japan and INDIA') == ['Japan', 'India']
+
+
+def test_no_countries():
+    assert EntityMatcher([]).find_all('Japan') == []
+
+
+def test_matcher_follows_reloads(tmp_path):
+    path = tmp_path / 'debt.csv'
+    path.write_text("Country,Year,Debt-to-GDP Ratio,Total Debt (USD)\nOman,2020,50.0,10\n")
+    processor = DebtDataProcessor(str(path))
+    assert processor.get_entity_matcher().find('Oman and Japan') == 'Oman'
+
+    path.write_text("Country,Year,Debt-to-GDP Ratio,Total Debt (USD)\nJapan,2020,250.0,100\n")
+    processor.reload()
+    assert processor.get_entity_matcher().find_all('Oman and Japan') == ['Japan']
@@ -0,0 +1,72 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from generation_scheduler import GenerationScheduler
+
+
+def slow_model(prompts, **options):
+    time.sleep(0.02)
+    return [f"{prompt} {dict(options)}" for prompt in prompts]
+
+
+def test_results_go_to_their_prompts():
+    scheduler = GenerationScheduler(slow_model, max_batch_size=4)
+    futures = [scheduler.submit(f"p{i}", max_length=i % 2) for i in range(10)]
+    assert [f.result(5) for f in futures] == [f"p{i} {{'max_length': {i % 2}}}" for i in range(10)]
+
+
+def test_concurrent_callers_share_batches():
+    scheduler = GenerationScheduler(slow_model, max_batch_size=8, max_wait=0.001)
+
+    def client(i):
+        return [scheduler.generate(f"{i}-{j}", timeout=5) for j in range(10)]
+
+    with ThreadPoolExecutor(16) as pool:
+        results = list(pool.map(client, range(16)))
+    assert results[3][4] == "3-4 {}"
+    stats = scheduler.stats()
+    assert stats['prompts'] == 160
+    # Sixteen callers keep the queue full, so batches should be close to full
+    assert stats['mean_batch_size'] > 4
+
+
+def test_batches_only_mix_matching_options():
+    seen = []
+
+    def model(prompts, **options):
+        seen.append((len(prompts), options))
+        time.sleep(0.01)
+        return list(prompts)
+
+    scheduler = GenerationScheduler(model, max_batch_size=8)
+    futures = [scheduler.submit(str(i), max_length=150 if i % 2 else 50) for i in range(12)]
+    for future in futures:
+        future.result(5)
+    assert sum(n for n, _ in seen) == 12
+    assert {options['max_length'] for _, options in seen} == {50, 150}
+
+
+def test_failed_batch_fails_its_prompts():
+    def broken(prompts, **options):
+        raise RuntimeError("model unavailable")
+
+    with pytest.raises(RuntimeError, match="unavailable"):
+        GenerationScheduler(broken).generate("hi", timeout=5)
+
+
+def test_missing_results_fail_instead_of_hanging():
+    release = threading.Event()
+
+    def short(prompts, **options):
+        release.wait(5)
+        return prompts[:1]
+
+    scheduler = GenerationScheduler(short, max_batch_size=4, max_wait=0.05)
+    futures = [scheduler.submit(str(i)) for i in range(3)]
+    release.set()
+    assert futures[0].result(5) == "0"
+    with pytest.raises(RuntimeError, match="No generated text"):
+        futures[2].result(5)
@@ -0,0 +1,57 @@
+import pytest
+
+from intent_router import Intent, IntentRouter, Message, keyword_flags, normalize_keyword
+
+
+def handler(answer):
+    return lambda message, **context: answer
+
+
+def test_message_terms_include_phrases():
+    message = Message("What is Compound Interest?")
+    assert message.has('compound_interest')
+    assert message.has('interest')
+    assert message.has('comp*')
+    assert not message.has('rate')
+
+
+def test_normalize_keyword():
+    assert normalize_keyword('Compound Interest') == 'compound_interest'
+    assert normalize_keyword('invest*') == 'invest*'
+    with pytest.raises(ValueError):
+        normalize_keyword('one two three four')
+    with pytest.raises(ValueError):
+        normalize_keyword('two words*')
+
+
+def test_every_group_must_match():
+    router = IntentRouter([Intent('plan', handler('plan'), ('payment', 'repay*'), ('plan', 'schedule'))])
+    assert router.route('make me a payment plan') == ('plan', 'plan')
+    assert router.route('repaying on a schedule') == ('plan', 'plan')
+    assert router.route('payment please') == (None, None)
+
+
+def test_priority_order_and_declines_fall_through():
+    router = IntentRouter([
+        Intent('general', handler('general'), ('debt',), priority=2),
+        Intent('declines', handler(None), ('debt',), priority=0),
+        Intent('specific', handler('specific'), ('debt',), ('japan',), priority=1),
+    ])
+    assert [intent.name for intent in router.match('debt of japan')] == ['declines', 'specific', 'general']
+    assert router.route('debt of japan') == ('specific', 'specific')
+    assert router.route('debt') == ('general', 'general')
+
+
+def test_intents_without_groups_are_always_candidates():
+    router = IntentRouter([
+        Intent('keyword', handler(None), ('hello',)),
+        Intent('country', lambda message, country=None: country, priority=1),
+    ])
+    assert router.route('hello', country='Japan') == ('country', 'Japan')
+    assert router.route('anything') == (None, None)
+
+
+def test_keyword_flags_cache_key():
+    key = keyword_flags('tips', 'compound interest')
+    assert key(Message('tips on compound interest')) == (True, True)
+    assert key(Message('tips')) == (True, False)
@@ -0,0 +1,45 @@
+import pytest
+
+import app as server
+from rate_limiter import ClientLimiter, RateLimiter
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, 'limiter', ClientLimiter(RateLimiter(limit=100, period=60)))
+    monkeypatch.setattr(server, 'rate_limit', server.limiter.limit)
+    server.response_cache.clear()
+    return server.app.test_client()
+
+
+def chat(client, message):
+    return client.post('/api/chat', json={'message': message}).get_json()
+
+
+@pytest.mark.parametrize('message, category', [
+    ('good morning', 'greeting'),
+    ('greetings friend', 'greeting'),
+    ('what services do you offer', 'capabilities'),
+    ('tell me about your abilities', 'capabilities'),
+    ('how long will my loan take', 'payment_plan'),
+    ('which card should I pay off first', 'payoff_plan'),
+])
+def test_topic_phrasings_are_answered_by_retrieval(client, message, category):
+    # None of these match a router keyword, so only retrieval can answer them
+    assert server.query_router.route(server.preprocess_text(message), raw_query=message) == (None, None)
+    response = chat(client, message)
+    assert response['type'] == category
+    assert response['message'] == server.knowledge_base[category][0]
+
+
+@pytest.mark.parametrize('message', ['what is the weather', 'tell me a joke', 'I like pizza'])
+def test_unrelated_messages_fall_back(client, message):
+    assert chat(client, message)['type'] == 'error'
+
+
+def test_every_phrasing_clears_the_threshold():
+    index = server.knowledge_search.get()
+    for category, phrasings in server.KNOWLEDGE_TOPICS.items():
+        for phrasing in phrasings:
+            answer = index.best(phrasing, server.RETRIEVAL_THRESHOLD)
+            assert answer is not None and answer['type'] == category, phrasing
@@ -0,0 +1,30 @@
+import sys
+
+from lazy_loader import LazyResource, ensure_loaded, is_loaded, lazy_import
+
+
+def test_module_attributes_are_not_shadowed():
+    json_module = lazy_import('json')
+    assert json_module.load is sys.modules['json'].load
+    assert json_module.loads('[1]') == [1]
+
+
+def test_import_is_deferred_until_used():
+    module = lazy_import('colorsys')
+    sys.modules.pop('colorsys', None)
+    assert not is_loaded(module)
+    assert ensure_loaded(module) is sys.modules['colorsys']
+    assert is_loaded(module)
+
+
+def test_plain_modules_pass_through():
+    assert ensure_loaded(sys) is sys
+    assert is_loaded(sys)
+
+
+def test_resource_is_built_once():
+    calls = []
+    resource = LazyResource('thing', lambda: calls.append(1) or object())
+    assert not resource.loaded
+    assert resource.get() is resource.get()
+    assert calls == [1]
@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+from metrics import Histogram, LabeledCounter, Metrics, _ThreadShards, _add_tallies
+from collections import Counter
+
+
+def test_histogram_snapshot_is_cumulative():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.observe(value)
+    cumulative, total, count = histogram.snapshot()
+    assert cumulative == [1, 3, 4]
+    assert total == pytest.approx(6.25)
+    assert count == 4
+
+
+def test_empty_shard_is_reused():
+    shards = _ThreadShards(Counter, _add_tallies)
+    assert shards.get() is shards.get()
+    assert len(shards._shards) == 1
+
+
+def test_counts_from_finished_threads_are_kept():
+    counter = LabeledCounter('requests_total', 'intent', 'Requests')
+    threads = [threading.Thread(target=counter.inc, args=('greeting',)) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+        thread.join()
+    counter.inc('greeting')
+    assert counter.values() == {'greeting': 21}
+
+
+def test_scrapes_while_other_threads_add_labels():
+    counter = LabeledCounter('requests_total', 'intent', 'Requests')
+    stop = threading.Event()
+
+    def write(prefix):
+        i = 0
+        while not stop.is_set():
+            # New labels keep resizing the shard's Counter
+            counter.inc(f'{prefix}{i % 5000}')
+            i += 1
+
+    writers = [threading.Thread(target=write, args=(f'w{n}-',)) for n in range(4)]
+    for writer in writers:
+        writer.start()
+    try:
+        for _ in range(100):
+            counter.values()
+    finally:
+        stop.set()
+        for writer in writers:
+            writer.join()
+    assert len(counter.values()) > 0
+
+
+def test_render_prometheus_text():
+    metrics = Metrics(buckets=(0.1,))
+    with metrics.stage('parse'):
+        pass
+    metrics.counter('chat_intents_total', 'intent', 'Answers by intent').inc('greeting', 2)
+    metrics.add_collector(lambda: [('cache_entries', 'gauge', 'Entries', {(): 3})])
+    text = metrics.render()
+    assert 'chat_stage_seconds_bucket{stage="parse",le="+Inf"} 1' in text
+    assert 'chat_stage_seconds_count{stage="parse"} 1' in text
+    assert 'chat_intents_total{intent="greeting"} 2' in text
+    assert 'cache_entries 3' in text
+
+
+def test_abandoned_stages_are_not_timed():
+    metrics = Metrics()
+
+    class Offloaded(BaseException):
+        pass
+
+    with pytest.raises(Offloaded):
+        with metrics.stage('generate'):
+            raise Offloaded()
+    with pytest.raises(ValueError):
+        with metrics.stage('generate'):
+            raise ValueError()
+    assert metrics.histogram('generate').snapshot()[2] == 1
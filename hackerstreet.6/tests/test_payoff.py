@@ -0,0 +1,79 @@
+from datetime import date
+
+import pytest
+
+import payoff
+from app import app
+
+DEBTS = dict(balances=[1000, 5000], annual_rates=[5, 20], minimum_payments=[50, 100])
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def test_avalanche_pays_highest_rate_first():
+    result = payoff.simulate_payoff(budget=500, strategy='avalanche', **DEBTS)
+    assert result['paid_off']
+    assert result['payoff_month'][1] < result['payoff_month'][0]
+
+
+def test_snowball_pays_smallest_balance_first():
+    result = payoff.simulate_payoff(budget=500, strategy='snowball', **DEBTS)
+    assert result['payoff_month'][0] < result['payoff_month'][1]
+
+
+def test_avalanche_never_costs_more_interest_than_snowball():
+    avalanche = payoff.simulate_payoff(budget=500, strategy='avalanche', **DEBTS)
+    snowball = payoff.simulate_payoff(budget=500, strategy='snowball', **DEBTS)
+    assert avalanche['total_interest'] <= snowball['total_interest']
+    assert avalanche['total_paid'] == pytest.approx(6000 + avalanche['total_interest'])
+
+
+def test_custom_order_matches_the_equivalent_strategy():
+    custom = payoff.simulate_payoff(budget=500, order=[1, 0], **DEBTS)
+    avalanche = payoff.simulate_payoff(budget=500, strategy='avalanche', **DEBTS)
+    assert custom['strategy'] == 'custom'
+    assert custom['total_interest'] == avalanche['total_interest']
+
+
+def test_budget_must_cover_minimums():
+    with pytest.raises(ValueError):
+        payoff.simulate_payoff(budget=100, **DEBTS)
+
+
+def test_stops_at_max_months():
+    result = payoff.simulate_payoff(budget=150, max_months=3, timeline=True, **DEBTS)
+    assert result['months'] == 3 and not result['paid_off']
+    assert result['timeline'].shape == (3, 2)
+
+
+def test_compare_strategies_reports_savings():
+    result = payoff.compare_strategies(budget=500, start=date(2024, 1, 15), **DEBTS)
+    plans = {plan['strategy']: plan for plan in result['plans']}
+    assert set(plans) == {'avalanche', 'snowball'}
+    assert plans['avalanche']['interest_saved'] > 0
+    assert plans['avalanche']['debt_free_date'] == payoff.add_months(date(2024, 1, 1),
+                                                                      plans['avalanche']['months']).isoformat()
+
+
+def test_add_months_wraps_years():
+    assert payoff.add_months(date(2024, 11, 20), 3) == date(2025, 2, 1)
+
+
+def request_body(**extra):
+    return {'debts': [{'balance': 1000, 'interest_rate': 5}, {'balance': 5000, 'interest_rate': 20}],
+            'budget': 500, **extra}
+
+
+def test_endpoint_compares_strategies(client):
+    response = client.post('/api/payoff-plans', json=request_body(orders=[[0, 1]]))
+    assert response.status_code == 200
+    assert [plan['strategy'] for plan in response.get_json()['plans']] == ['avalanche', 'snowball', 'custom']
+
+
+@pytest.mark.parametrize('max_months', [0, -5, 1e999, 'Infinity', 'soon'])
+def test_endpoint_rejects_bad_max_months(client, max_months):
+    response = client.post('/api/payoff-plans', json=request_body(max_months=max_months))
+    assert response.status_code == 400
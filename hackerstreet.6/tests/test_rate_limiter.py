@@ -0,0 +1,102 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from flask import Flask
+
+from rate_limiter import ClientLimiter, FileBackend, MemoryBackend, RateLimiter, take_token
+
+
+def test_take_token_refills_over_time():
+    assert take_token(0.0, 0.0, 5.0, capacity=10, rate=1.0) == (True, 4.0, 0.0)
+    assert take_token(0.0, 0.0, 0.5, capacity=10, rate=1.0) == (False, 0.5, 0.5)
+    assert take_token(3.0, 0.0, 100.0, capacity=10, rate=1.0)[1] == 9.0
+
+
+def test_memory_backend_limits_each_key_separately():
+    limiter = RateLimiter(limit=2, period=60)
+    assert limiter.acquire('a')[0] and limiter.acquire('a')[0]
+    allowed, retry_after = limiter.acquire('a')
+    assert not allowed and 0 < retry_after <= 30
+    assert limiter.acquire('b')[0]
+
+
+def test_cost_above_limit_is_never_allowed():
+    limiter = RateLimiter(limit=5, period=60)
+    assert not limiter.acquire('a', cost=6)[0]
+    assert limiter.acquire('a', cost=5)[0]
+
+
+def test_memory_backend_prunes_refilled_buckets():
+    backend = MemoryBackend(stripes=1, max_keys_per_stripe=4)
+    for i in range(10):
+        backend.acquire(f'client{i}', capacity=1, rate=1.0, now=float(i))
+    assert len(backend._stripes[0]) <= 8
+
+
+def test_file_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'buckets')
+    first = RateLimiter(limit=2, period=60, backend=FileBackend(path, slots=64))
+    second = RateLimiter(limit=2, period=60, backend=FileBackend(path, slots=64))
+    try:
+        assert first.acquire('a')[0] and second.acquire('a')[0]
+        assert not first.acquire('a')[0]
+    finally:
+        first.backend.close()
+        second.backend.close()
+
+
+def limited_app(api_keys=frozenset(), **error_fields):
+    app = Flask(__name__)
+    limiter = ClientLimiter(RateLimiter(limit=1, period=60), api_keys, **error_fields)
+
+    @app.route('/')
+    @limiter.limit
+    def index():
+        return 'ok'
+
+    return app.test_client()
+
+
+def test_client_limiter_answers_429_with_retry_after():
+    client = limited_app(status='error')
+    assert client.get('/').status_code == 200
+    response = client.get('/')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.get_json()['status'] == 'error'
+
+
+def test_only_known_api_keys_get_their_own_bucket():
+    client = limited_app(api_keys=frozenset({'known'}))
+    assert client.get('/', headers={'X-API-Key': 'made-up-1'}).status_code == 200
+    assert client.get('/', headers={'X-API-Key': 'made-up-2'}).status_code == 429
+    assert client.get('/', headers={'X-API-Key': 'known'}).status_code == 200
+
+
+def test_keep_in_memory_drops_the_file_backend(tmp_path):
+    limiter = ClientLimiter(RateLimiter(limit=1, period=60, backend=FileBackend(str(tmp_path / 'buckets'), slots=8)))
+    limiter.keep_in_memory()
+    assert isinstance(limiter.limiter.backend, MemoryBackend)
+
+
+@pytest.mark.parametrize('limit, period', [(0, 60), (-5, 60), (10, 0), (10, -1), (10, float('inf'))])
+def test_limits_must_be_positive(limit, period):
+    with pytest.raises(ValueError, match='positive'):
+        RateLimiter(limit=limit, period=period)
+
+
+def test_from_env_names_the_bad_setting(monkeypatch):
+    monkeypatch.setenv('TEST_RATE_LIMIT', '0')
+    with pytest.raises(ValueError, match='TEST_RATE_LIMIT'):
+        ClientLimiter.from_env('TEST_RATE_LIMIT')
+
+
+def test_memory_limits_work_without_fcntl():
+    # fcntl doesn't exist on Windows; only the file backend needs it
+    code = ("import sys; sys.modules['fcntl'] = None\n"
+            "from rate_limiter import RateLimiter\n"
+            "assert RateLimiter(limit=1).acquire('a')[0]")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', code], cwd=root, check=True)
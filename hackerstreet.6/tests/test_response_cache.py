@@ -0,0 +1,71 @@
+import time
+
+from intent_router import Intent, IntentRouter, no_entities
+from response_cache import MISSING, ResponseCache
+
+
+def test_hit_and_miss_counters():
+    cache = ResponseCache()
+    assert cache.get('a', MISSING) is MISSING
+    cache.put('a', 1)
+    assert cache.get('a') == 1
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire():
+    cache = ResponseCache(ttl=0.01)
+    cache.put('a', 1)
+    time.sleep(0.02)
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_router_caches_answers_by_intent():
+    calls = []
+
+    def greet(message):
+        calls.append(message.text)
+        return 'hello'
+
+    router = IntentRouter([Intent('greeting', greet, ('hi', 'hello'), cache_key=no_entities)],
+                          cache=ResponseCache())
+    assert router.route('hi there') == ('greeting', 'hello')
+    assert router.route('hello again') == ('greeting', 'hello')
+    assert calls == ['hi there']
+
+
+def test_router_does_not_cache_declines():
+    state = {'loaded': False}
+
+    def stats(message):
+        return 'stats' if state['loaded'] else None
+
+    router = IntentRouter([Intent('stats', stats, ('stats',), cache_key=no_entities)], cache=ResponseCache())
+    assert router.route('show stats') == (None, None)
+    state['loaded'] = True
+    assert router.route('show stats') == ('stats', 'stats')
+
+
+def test_router_skips_the_cache_without_a_key():
+    cache = ResponseCache()
+    router = IntentRouter([
+        Intent('country', lambda message: None, cache_key=lambda message: None),
+        Intent('greeting', lambda message: 'hello', ('hello',), priority=1, cache_key=no_entities)
+    ], cache=cache)
+    for _ in range(5):
+        assert router.route('hello') == ('greeting', 'hello')
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (4, 1, 1)
@@ -0,0 +1,19 @@
+import time
+
+from lazy_loader import LazyResource, ensure_loaded, lazy_import
+from startup_timing import StartupTimer
+
+
+def test_lazy_loads_are_reported_apart_from_startup():
+    timer = StartupTimer()
+    with timer.phase('flask'):
+        pass
+    total = timer.log_report()['total_ms']
+
+    ensure_loaded(lazy_import('wave', on_load=timer.record_lazy))
+    LazyResource('index', lambda: time.sleep(0.01) or 'built', on_load=timer.record_lazy).get()
+    report = timer.report()
+    assert set(report['phases']) == {'flask'}
+    assert set(report['lazy']) == {'wave', 'index'}
+    assert report['lazy']['index'] >= 10
+    assert report['total_ms'] == total
@@ -0,0 +1,51 @@
+import re
+
+import pytest
+
+from text_preprocessing import get_stop_words, normalize_batch, normalize_text, tokenize
+
+nltk_tokenize = pytest.importorskip('nltk.tokenize').NLTKWordTokenizer().tokenize
+
+CORPUS = [
+    "I can't pay, won't pay and shouldn't've borrowed!",
+    "Cannot, gimme, gonna, gotta, lemme, wanna go; wanna",
+    "CANNOT and Gonna in capitals",
+    "She said \"pay it off\" and 'never again'",
+    "``Quoted'' text with “curly” quotes and ‘single’ ones",
+    "What?!?! ... really --- no way!!!",
+    "$5,000 at 18% (min. $100), €250 or £30.50 — ¥1000",
+    "Crème brûlée costs 5€ in Zürich; naïve café résumé",
+    "Debt in 日本 and Россия is rising",
+    "tabs\tand\nnewlines\r\nbetween   words",
+    "under_scores and numbers 1st 2nd 3.5x",
+    "emoji 💰📊 and symbols © ® ™ ½",
+    "wanna\twanna\nwannabe cannotbe gonnaa",
+    "",
+    "   ",
+    "'tis o'clock y'all ma'am",
+]
+
+PUNCTUATION = re.compile(r'[^\w\s]')
+
+
+def reference(text):
+    """The original pipeline: strip punctuation, NLTK word tokenizer, drop stopwords"""
+    tokens = nltk_tokenize(PUNCTUATION.sub('', text.lower()))
+    return ' '.join(token for token in tokens if token not in get_stop_words())
+
+
+@pytest.mark.parametrize('text', CORPUS)
+def test_tokenize_matches_nltk(text):
+    stripped = PUNCTUATION.sub('', text.lower())
+    assert tokenize(stripped) == nltk_tokenize(stripped)
+    assert normalize_text(text) == reference(text)
+
+
+def test_batch_matches_one_at_a_time():
+    texts = CORPUS + CORPUS[:3]
+    assert normalize_batch(texts) == [normalize_text(text) for text in texts]
+
+
+def test_batch_falls_back_when_a_message_contains_the_separator():
+    texts = ["first\x1esecond", "gonna pay"]
+    assert normalize_batch(texts) == [normalize_text(text) for text in texts]
@@ -0,0 +1,99 @@
+import os
+import re
+from functools import lru_cache
+
+# Vendored NLTK resources; looked up locally, never downloaded at runtime
+NLTK_DATA_DIR = os.getenv('NLTK_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nltk_data'))
+REQUIRED_NLTK_RESOURCES = ('corpora/stopwords',)
+STOP_WORDS_FILE = os.path.join(NLTK_DATA_DIR, 'corpora', 'stopwords', 'english')
+
+NON_WORD = re.compile(r'[^\w\s]')
+
+# Once punctuation is stripped, the only Treebank word-tokenizer rules that
+# can still fire are these fused forms ("cannot" -> "can not", "gonna", ...).
+# Same patterns and order as nltk's MacIntyreContractions.CONTRACTIONS2.
+CONTRACTIONS = [re.compile(pattern) for pattern in (
+    r'(?i)\b(can)(?#X)(not)\b',
+    r'(?i)\b(gim)(?#X)(me)\b',
+    r'(?i)\b(gon)(?#X)(na)\b',
+    r'(?i)\b(got)(?#X)(ta)\b',
+    r'(?i)\b(lem)(?#X)(me)\b',
+    r'(?i)\b(wan)(?#X)(na)(?=\s)'
+)]
+
+# Joins messages for batch processing; it is whitespace, so it survives
+# punctuation stripping and acts as a word boundary
+BATCH_SEPARATOR = '\x1e'
+
+_stop_words = None
+
+
+def _nltk():
+    """Import nltk on demand; it pulls in numpy, scipy and sklearn, so only
+    resources missing from the vendored directory go through it"""
+    import nltk
+    if NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DATA_DIR)
+    return nltk
+
+
+def check_nltk_resources():
+    """Return the required NLTK resources that cannot be found locally"""
+    missing = []
+    for resource in REQUIRED_NLTK_RESOURCES:
+        if os.path.exists(os.path.join(NLTK_DATA_DIR, *resource.split('/'))):
+            continue
+        try:
+            _nltk().data.find(resource)
+        except LookupError:
+            missing.append(resource)
+    return missing
+
+
+def get_stop_words():
+    """English stopwords, read from the vendored corpus once per process"""
+    global _stop_words
+    if _stop_words is None:
+        if os.path.exists(STOP_WORDS_FILE):
+            with open(STOP_WORDS_FILE, encoding='utf-8') as f:
+                _stop_words = frozenset(line.strip() for line in f if line.strip())
+        else:
+            _stop_words = frozenset(_nltk().corpus.stopwords.words('english'))
+    return _stop_words
+
+
+def _split_contractions(text):
+    text = ' ' + text + ' '
+    for pattern in CONTRACTIONS:
+        text = pattern.sub(r' \1 \2 ', text)
+    return text
+
+
+def tokenize(text):
+    """Tokenize punctuation-free text exactly as nltk.word_tokenize would, without Punkt"""
+    return _split_contractions(text).split()
+
+
+def _drop_stop_words(tokens, stop_words):
+    return ' '.join(token for token in tokens if token not in stop_words)
+
+
+@lru_cache(maxsize=4096)
+def normalize_text(text):
+    """Lower-case, strip punctuation, tokenize and drop English stopwords"""
+    return _drop_stop_words(tokenize(NON_WORD.sub('', text.lower())), get_stop_words())
+
+
+def normalize_batch(texts):
+    """Normalize a list of messages with one regex pass over all distinct messages"""
+    stop_words = get_stop_words()
+    unique = list(dict.fromkeys(texts))
+    if any(BATCH_SEPARATOR in text for text in unique):
+        return [normalize_text(text) for text in texts]
+
+    joined = _split_contractions(NON_WORD.sub('', BATCH_SEPARATOR.join(unique).lower()))
+    normalized = {
+        text: _drop_stop_words(part.split(), stop_words)
+        for text, part in zip(unique, joined.split(BATCH_SEPARATOR))
+    }
+    return [normalized[text] for text in texts]
@@ -1,33 +1,126 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import torch
 import json
 import os
 from datetime import datetime
-from data_processor import DebtDataProcessor
+from async_server import AsyncServer, offload, resumed, serve
+from conversation_state import ConversationStore, stream_completion
+from data_reloader import DatasetReloader
+from entity_matcher import EntityMatcher
+from intent_router import Intent, IntentRouter, as_message, keyword_flags
+from generation_scheduler import GenerationScheduler
+from lazy_loader import LazyResource, lazy_import
+from model_runtime import inference_mode, load_causal_lm
+from metrics import CONTENT_TYPE, REGISTRY, cache_collector, intents, stage
+from profiling import request_profiler
+from rate_limiter import ClientLimiter
+from response_cache import ResponseCache
+
+transformers = lazy_import('transformers')
+knowledge_index_module = lazy_import('knowledge_index')
 
 app = Flask(__name__)
 CORS(app)
 
-# Initialize the model and tokenizer
 model_name = "microsoft/DialoGPT-medium"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForCausalLM.from_pretrained(model_name)
+MAX_BATCH_MESSAGES = 256
+
+# A batch can ask for hundreds of generations at once, so each of its messages
+# is charged to the client's batch budget: BATCH_RATE_LIMIT messages per
+# BATCH_RATE_LIMIT_PERIOD, four full batches a minute by default
+batch_limiter = ClientLimiter.from_env('BATCH_RATE_LIMIT', limit=4 * MAX_BATCH_MESSAGES,
+                                       scope='batch:', status="error")
+
+def load_chatbot():
+    """Load DialoGPT and wrap it in a text generation pipeline"""
+    # transformers and torch are only imported here, once a message actually
+    # needs the generative model. MODEL_INFERENCE_MODE=int8 quantizes it.
+    model, tokenizer = load_causal_lm(
+        model_name,
+        mode=os.getenv('MODEL_INFERENCE_MODE', 'fp32'),
+        num_threads=int(os.getenv('TORCH_NUM_THREADS', 0)) or None
+    )
+    # DialoGPT has no pad token; pad on the left so every prompt in a batch
+    # ends right where generation starts
+    tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = 'left'
+    return transformers.pipeline("text-generation", model=model, tokenizer=tokenizer)
+
+# The model is loaded on the first conversational message; set MODEL_WARMUP
+# to load it in the background at startup instead
+chatbot = LazyResource(model_name, load_chatbot)
+if os.getenv('MODEL_WARMUP', 'False').lower() == 'true':
+    chatbot.warm_up()
+
+def generate_batch(prompts, batch_size=None, max_length=150):
+    """Complete prompts like chatbot(prompt, max_length=...) does, in padded batches, by default all as one.
 
-# Create a text generation pipeline
-chatbot = pipeline("text-generation", model=model, tokenizer=tokenizer)
+    Each prompt is limited to max_length tokens in all, as if it were
+    generated on its own: a batch runs until its shortest prompt reaches the
+    limit and every completion is cut back to its own, so padding never
+    changes an answer. Returns each prompt followed by its continuation, like
+    the pipeline's generated_text.
+    """
+    pipe = chatbot.get()
+    model, tokenizer = pipe.model, pipe.tokenizer
+    size = batch_size or len(prompts)
+    results = []
+    for start in range(0, len(prompts), size):
+        chunk = prompts[start:start + size]
+        encoded = tokenizer(chunk, return_tensors='pt', padding=True)
+        width = encoded['input_ids'].shape[1]
+        lengths = encoded['attention_mask'].sum(dim=1).tolist()
+        room = [max(max_length - length, 0) for length in lengths]
+        output = None
+        if max(room):
+            with inference_mode():
+                output = model.generate(**encoded, max_new_tokens=max(room), pad_token_id=tokenizer.pad_token_id)
+        for row, prompt in enumerate(chunk):
+            new_ids = output[row, width:width + room[row]].tolist() if output is not None else []
+            if tokenizer.eos_token_id in new_ids:
+                new_ids = new_ids[:new_ids.index(tokenizer.eos_token_id)]
+            results.append(prompt + tokenizer.decode(new_ids, skip_special_tokens=True))
+    return results
 
-# Initialize the debt data processor with error handling
+# Concurrent fallback prompts are grouped into micro-batches instead of
+# running through the model one request at a time
+generation_scheduler = GenerationScheduler(
+    generate_batch,
+    max_batch_size=int(os.getenv('GENERATION_MAX_BATCH', 8)),
+    max_wait=float(os.getenv('GENERATION_MAX_WAIT_MS', 10)) / 1000
+)
+
+# Multi-turn DialoGPT state for requests that carry a session_id
+conversations = ConversationStore(
+    max_sessions=int(os.getenv('CONVERSATION_MAX_SESSIONS', 1000)),
+    ttl=float(os.getenv('CONVERSATION_TTL', 1800)),
+    max_cache_bytes=int(float(os.getenv('CONVERSATION_CACHE_MB', 512)) * 1024 * 1024),
+    max_history_tokens=int(os.getenv('CONVERSATION_MAX_TOKENS', 512))
+)
+
+# One-off messages are completed as they always were, by the pipeline with
+# max_length=150 and the model's default decoding, whether they are batched
+# or streamed
+ONE_OFF_OPTIONS = {'max_length': 150}
+
+# Initialize the debt dataset with error handling; it is re-read in the
+# background whenever the CSV changes
+dataset = None
 try:
     data_file = 'global_debt_data.csv'
     if not os.path.exists(data_file):
         raise FileNotFoundError(f"Data file {data_file} not found. Please download the dataset from Kaggle.")
-    data_processor = DebtDataProcessor(data_file)
+    chunksize = os.getenv('DEBT_DATA_CHUNKSIZE')
+    dataset = DatasetReloader(data_file, cache_dir=os.getenv('DEBT_DATA_CACHE_DIR'),
+                              stream_options={'chunksize': int(chunksize)} if chunksize else None)
+    dataset.start(float(os.getenv('DATA_RELOAD_INTERVAL', 30)))
     print(f"Successfully loaded data from {data_file}")
 except Exception as e:
     print(f"Error initializing data processor: {str(e)}")
-    data_processor = None
+
+def get_data_processor():
+    """Return the current dataset snapshot, or None if no data is loaded"""
+    return dataset.current() if dataset else None
 
 # Enhanced financial knowledge base
 financial_knowledge = {
@@ -131,150 +224,355 @@ financial_knowledge = {
     }
 }
 
-def process_debt_query(message):
+knowledge_country_matcher = EntityMatcher(financial_knowledge["debt_to_gdp"])
+
+def debt_comparison_response(message, data_processor, mentioned):
+    """Compare the latest debt figures of two or more mentioned countries"""
+    if len(mentioned) < 2:
+        return None
+    comparison = data_processor.get_comparison(mentioned)
+    response = "Comparison of selected countries:\n\n"
+    for data in comparison:
+        response += f"• {data['country']}:\n" \
+                  f"  - Debt-to-GDP: {data['debt_to_gdp']}%\n" \
+                  f"  - Total Debt: ${data['total_debt']:,.2f} trillion\n" \
+                  f"  - Trend: {data['trend']}\n\n"
+    return response + "Would you like to compare other countries?"
+
+def debt_history_response(message, data_processor, mentioned):
+    """List the historical debt figures of the first mentioned country with data"""
+    for country in mentioned:
+        historical_data = data_processor.get_historical_data(country)
+        if not historical_data.empty:
+            response = f"Historical Debt Data for {country}:\n\n"
+            for _, row in historical_data.iterrows():
+                response += f"• {row['Year']}: {row['Debt-to-GDP Ratio']}% " \
+                          f"(${row['Total Debt (USD)']:,.2f} trillion)\n"
+            return response + "\nWould you like to analyze this trend further?"
+    return None
+
+def country_debt_response(message, data_processor, mentioned):
+    """Summarize the latest debt data of the first mentioned country with data"""
+    for country in mentioned:
+        data = data_processor.get_country_debt(country)
+        if data:
+            return f"Here's the financial data for {country}:\n\n" \
+                   f"📊 Debt-to-GDP Ratio: {data['debt_to_gdp']}% (as of {data['year']})\n" \
+                   f"💰 Total Debt: ${data['total_debt']:,.2f} trillion\n" \
+                   f"📈 Trend: {data['trend']}\n\n" \
+                   f"Would you like to compare this with other countries or get historical data?"
+    return None
+
+def ranked_debt_response(highest):
+    def respond(message, data_processor, mentioned):
+        """List the countries with the highest or lowest debt-to-GDP ratios"""
+        top_countries = data_processor.get_top_countries(highest=highest)
+        response = f"Countries with {'highest' if highest else 'lowest'} debt-to-GDP ratios:\n\n"
+        for _, row in top_countries.iterrows():
+            response += f"• {row['Country']}: {row['Debt-to-GDP Ratio']}%\n"
+        return response + "\nWould you like more details about any of these countries?"
+    return respond
+
+def global_debt_response(message, data_processor, mentioned):
+    """Summarize global debt statistics for the latest year"""
+    global_data = data_processor.get_global_average()
+    return f"Global Debt Statistics:\n\n" \
+           f"📊 Average Debt-to-GDP Ratio: {global_data['avg_debt_to_gdp']:.1f}%\n" \
+           f"💰 Total Global Debt: ${global_data['total_global_debt']:,.2f} trillion\n" \
+           f"📅 Year: {global_data['year']}\n\n" \
+           f"Would you like to see how this compares to specific countries?"
+
+def dataset_key(message, data_processor, mentioned):
+    return (data_processor.version,)
+
+def mentioned_countries_key(message, data_processor, mentioned):
+    return data_processor.version, tuple(mentioned)
+
+# Factual answers depend only on the intent, its entities and the dataset
+# version, so they are cached; the generative fallback never is. Both
+# routers share the cache, so their intent names must not clash.
+response_cache = ResponseCache(
+    max_entries=int(os.getenv('RESPONSE_CACHE_SIZE', 1024)),
+    ttl=float(os.getenv('RESPONSE_CACHE_TTL', 300))
+)
+REGISTRY.add_collector(cache_collector(response_cache))
+
+# Opt-in sampling profiler for single requests; see /api/profiles
+profiler = request_profiler()
+
+# Intent tables, checked in priority order; keywords ending in * match as prefixes.
+# Comparison and history come before the single-country answer, which would
+# otherwise claim every message that names a country.
+debt_router = IntentRouter([
+    Intent("debt_comparison", debt_comparison_response, ("compare*",), priority=10,
+           cache_key=mentioned_countries_key),
+    Intent("debt_history", debt_history_response, ("historical*", "trend*"), priority=20,
+           cache_key=mentioned_countries_key),
+    Intent("country_debt", country_debt_response, priority=30, cache_key=mentioned_countries_key),
+    Intent("highest_debt", ranked_debt_response(True), ("highest",), ("debt*",), priority=40, cache_key=dataset_key),
+    Intent("lowest_debt", ranked_debt_response(False), ("lowest",), ("debt*",), priority=50, cache_key=dataset_key),
+    Intent("global_debt", global_debt_response, ("average*", "global*"), priority=60, cache_key=dataset_key)
+], cache=response_cache)
+
+def process_debt_query(message, data_processor=None):
+    if data_processor is None:
+        data_processor = get_data_processor()
     if not data_processor:
         return "I'm sorry, but I'm currently unable to access the debt data. Please try again later."
-        
-    message = message.lower()
     
     try:
-        # Check for country-specific queries
-        for country in data_processor.countries:
-            if country.lower() in message:
-                data = data_processor.get_country_debt(country)
-                if data:
-                    return f"Here's the financial data for {country}:\n\n" \
-                           f"📊 Debt-to-GDP Ratio: {data['debt_to_gdp']}% (as of {data['year']})\n" \
-                           f"💰 Total Debt: ${data['total_debt']:,.2f} trillion\n" \
-                           f"📈 Trend: {data['trend']}\n\n" \
-                           f"Would you like to compare this with other countries or get historical data?"
-
-        # Check for highest/lowest debt queries
-        if "highest" in message and "debt" in message:
-            top_countries = data_processor.get_top_countries(highest=True)
-            response = "Countries with highest debt-to-GDP ratios:\n\n"
-            for _, row in top_countries.iterrows():
-                response += f"• {row['Country']}: {row['Debt-to-GDP Ratio']}%\n"
-            return response + "\nWould you like more details about any of these countries?"
-
-        if "lowest" in message and "debt" in message:
-            top_countries = data_processor.get_top_countries(highest=False)
-            response = "Countries with lowest debt-to-GDP ratios:\n\n"
-            for _, row in top_countries.iterrows():
-                response += f"• {row['Country']}: {row['Debt-to-GDP Ratio']}%\n"
-            return response + "\nWould you like more details about any of these countries?"
-
-        # Check for global average queries
-        if "average" in message or "global" in message:
-            global_data = data_processor.get_global_average()
-            return f"Global Debt Statistics:\n\n" \
-                   f"📊 Average Debt-to-GDP Ratio: {global_data['avg_debt_to_gdp']:.1f}%\n" \
-                   f"💰 Total Global Debt: ${global_data['total_global_debt']:,.2f} trillion\n" \
-                   f"📅 Year: {global_data['year']}\n\n" \
-                   f"Would you like to see how this compares to specific countries?"
-
-        # Check for comparison queries
-        if "compare" in message:
-            countries = [c for c in data_processor.countries if c.lower() in message]
-            if len(countries) >= 2:
-                comparison = data_processor.get_comparison(countries)
-                response = "Comparison of selected countries:\n\n"
-                for data in comparison:
-                    response += f"• {data['country']}:\n" \
-                              f"  - Debt-to-GDP: {data['debt_to_gdp']}%\n" \
-                              f"  - Total Debt: ${data['total_debt']:,.2f} trillion\n" \
-                              f"  - Trend: {data['trend']}\n\n"
-                return response + "Would you like to compare other countries?"
-
-        # Check for historical data queries
-        if "historical" in message or "trend" in message:
-            for country in data_processor.countries:
-                if country.lower() in message:
-                    historical_data = data_processor.get_historical_data(country)
-                    if not historical_data.empty:
-                        response = f"Historical Debt Data for {country}:\n\n"
-                        for _, row in historical_data.iterrows():
-                            response += f"• {row['Year']}: {row['Debt-to-GDP Ratio']}% " \
-                                      f"(${row['Total Debt (USD)']:,.2f} trillion)\n"
-                        return response + "\nWould you like to analyze this trend further?"
-
+        message = as_message(message)
+        # Find every country mentioned, once, for all the handlers
+        mentioned = data_processor.get_entity_matcher().find_all(message.text)
+        intent, response = debt_router.route(message, data_processor=data_processor, mentioned=mentioned)
+        if intent:
+            intents.inc(intent)
+        return response
     except Exception as e:
         print(f"Error processing debt query: {str(e)}")
         return "I'm sorry, I encountered an error processing your request. Please try again."
 
+def knowledge_country_response(message, country):
+    """Answer from the static debt-to-GDP knowledge base"""
+    if not country:
+        return None
+    data = financial_knowledge["debt_to_gdp"][country]
+    return f"Here's the financial data for {country}:\n\n" \
+           f"📊 Debt-to-GDP Ratio: {data['ratio']}% (as of {data['year']})\n" \
+           f"📈 Trend: {data['trend']}\n\n" \
+           f"Would you like to compare this with other countries or get more details?"
+
+def investment_answer(profile):
+    """Describe the investment strategy for a risk profile"""
+    strategy = financial_knowledge["investment_strategies"][profile]
+    return f"Here's information about {strategy['description']}:\n\n" \
+           f"Risk Level: {strategy['risk_level']}\n" \
+           f"Expected Return: {strategy['expected_return']}\n\n" \
+           f"Investment Options:\n" + "\n".join([f"- {option}" for option in strategy['options']]) + \
+           f"\n\nWould you like more specific advice about any of these options?"
+
+def investment_response(message, country):
+    """Describe the investment strategy for the requested risk profile"""
+    if message.has("conservative*"):
+        return investment_answer("conservative")
+    elif message.has("aggressive*"):
+        return investment_answer("aggressive")
+    return investment_answer("balanced")
+
+def retirement_answer(age_group):
+    """Give retirement advice for an age group"""
+    advice = financial_knowledge["retirement_advice"][age_group]
+    return f"Retirement Planning Advice:\n\n" \
+           f"Strategy: {advice['strategy']}\n" \
+           f"Risk Tolerance: {advice['risk_tolerance']}\n" \
+           f"Time Horizon: {advice['time_horizon']}\n\n" \
+           f"Recommendations:\n" + "\n".join([f"- {rec}" for rec in advice['recommendations']]) + \
+           f"\n\nWould you like more detailed information about any of these recommendations?"
+
+def retirement_response(message, country):
+    """Give retirement advice for the requested age group"""
+    for age_group in ("young", "middle", "near"):
+        if message.has(age_group + "*"):
+            return retirement_answer(age_group)
+    return "It's important to start planning early. Would you like specific advice for your age group?"
+
+def term_definition_answer(term):
+    definition = financial_knowledge["financial_terms"][term]
+    return f"Definition of {term}:\n\n{definition}\n\nWould you like to know more about related concepts?"
+
+def term_definition_response(message, country):
+    """Define the first known financial term in the message"""
+    for term in financial_knowledge["financial_terms"]:
+        if message.has(term):
+            return term_definition_answer(term)
     return None
 
+def knowledge_country_key(message, country):
+    return country
+
+financial_router = IntentRouter([
+    Intent("knowledge_country", knowledge_country_response, priority=10, cache_key=knowledge_country_key),
+    Intent("investment", investment_response, ("invest*", "portfolio*"), priority=20,
+           cache_key=keyword_flags("conservative*", "aggressive*")),
+    Intent("retirement", retirement_response, ("retirement*",), priority=30,
+           cache_key=keyword_flags("young*", "middle*", "near*")),
+    Intent("term_definition", term_definition_response, tuple(financial_knowledge["financial_terms"]), priority=40,
+           cache_key=keyword_flags(*financial_knowledge["financial_terms"]))
+], cache=response_cache)
+
 def process_financial_query(message):
-    message = message.lower()
-    
-    # Check for country-specific queries
-    for country in financial_knowledge["debt_to_gdp"]:
-        if country.lower() in message:
-            data = financial_knowledge["debt_to_gdp"][country]
-            return f"Here's the financial data for {country}:\n\n" \
-                   f"📊 Debt-to-GDP Ratio: {data['ratio']}% (as of {data['year']})\n" \
-                   f"📈 Trend: {data['trend']}\n\n" \
-                   f"Would you like to compare this with other countries or get more details?"
-
-    # Check for investment queries
-    if "invest" in message or "portfolio" in message:
-        if "conservative" in message:
-            strategy = financial_knowledge["investment_strategies"]["conservative"]
-        elif "aggressive" in message:
-            strategy = financial_knowledge["investment_strategies"]["aggressive"]
-        else:
-            strategy = financial_knowledge["investment_strategies"]["balanced"]
-            
-        return f"Here's information about {strategy['description']}:\n\n" \
-               f"Risk Level: {strategy['risk_level']}\n" \
-               f"Expected Return: {strategy['expected_return']}\n\n" \
-               f"Investment Options:\n" + "\n".join([f"- {option}" for option in strategy['options']]) + \
-               f"\n\nWould you like more specific advice about any of these options?"
-
-    # Check for retirement queries
-    if "retirement" in message:
-        if "young" in message:
-            advice = financial_knowledge["retirement_advice"]["young"]
-        elif "middle" in message:
-            advice = financial_knowledge["retirement_advice"]["middle"]
-        elif "near" in message:
-            advice = financial_knowledge["retirement_advice"]["near"]
-        else:
-            return "It's important to start planning early. Would you like specific advice for your age group?"
-            
-        return f"Retirement Planning Advice:\n\n" \
-               f"Strategy: {advice['strategy']}\n" \
-               f"Risk Tolerance: {advice['risk_tolerance']}\n" \
-               f"Time Horizon: {advice['time_horizon']}\n\n" \
-               f"Recommendations:\n" + "\n".join([f"- {rec}" for rec in advice['recommendations']]) + \
-               f"\n\nWould you like more detailed information about any of these recommendations?"
-
-    # Check for financial term definitions
-    for term, definition in financial_knowledge["financial_terms"].items():
-        if term in message:
-            return f"Definition of {term}:\n\n{definition}\n\nWould you like to know more about related concepts?"
+    message = as_message(message)
+    intent, response = financial_router.route(message, country=knowledge_country_matcher.find(message.text))
+    if intent:
+        intents.inc(intent)
+    return response
 
-    return None
+def knowledge_entries():
+    """Searchable text for every knowledge-base answer"""
+    entries = [(f"{term} {definition}", term_definition_answer(term))
+               for term, definition in financial_knowledge["financial_terms"].items()]
+    entries += [(f"{profile} investment strategy portfolio {strategy['description']} {' '.join(strategy['options'])}",
+                 investment_answer(profile))
+                for profile, strategy in financial_knowledge["investment_strategies"].items()]
+    entries += [(f"{age_group} retirement planning {advice['strategy']} {' '.join(advice['recommendations'])}",
+                 retirement_answer(age_group))
+                for age_group, advice in financial_knowledge["retirement_advice"].items()]
+    return entries
 
-def generate_response(message):
-    # First try to get a factual response from our debt data
-    debt_response = process_debt_query(message)
-    if debt_response:
-        return debt_response
+# TF-IDF index over the knowledge base for questions the keyword routers
+# miss; KNOWLEDGE_INDEX_PATH persists it between restarts
+knowledge_index = LazyResource('knowledge index', lambda: knowledge_index_module.KnowledgeIndex.load_or_build(
+    knowledge_entries(), os.getenv('KNOWLEDGE_INDEX_PATH')))
+RETRIEVAL_THRESHOLD = float(os.getenv('RETRIEVAL_THRESHOLD', 0.3))
 
-    # If no debt-related response, try the financial knowledge base
-    financial_response = process_financial_query(message)
-    if financial_response:
-        return financial_response
+def retrieve_knowledge(message):
+    """The closest knowledge-base answer, or None if nothing is similar enough"""
+    try:
+        with stage('retrieve'):
+            response = knowledge_index.get().best(message.text, RETRIEVAL_THRESHOLD)
+        if response:
+            intents.inc('retrieval')
+        return response
+    except Exception as e:
+        print(f"Error searching the knowledge index: {str(e)}")
+        return None
+
+def retrieve_knowledge_batch(messages):
+    """retrieve_knowledge for many messages, scored in one pass"""
+    try:
+        with stage('retrieve'):
+            matches = knowledge_index.get().search_batch([message.text for message in messages], 1,
+                                                         RETRIEVAL_THRESHOLD)
+    except Exception as e:
+        print(f"Error searching the knowledge index: {str(e)}")
+        return [None] * len(messages)
+    responses = [found[0][0] if found else None for found in matches]
+    intents.inc('retrieval', sum(1 for response in responses if response))
+    return responses
+
+def factual_response(message):
+    """Answer from the debt data, the keyword knowledge base or retrieval, in that order"""
+    return process_debt_query(message) or process_financial_query(message) or retrieve_knowledge(message)
+
+def generate_response(message, session_id=None):
+    # Tokenize once for both rule-based routers
+    message = as_message(message)
 
-    # If no factual response, generate a conversational response
+    # First try a factual response: the debt data, then the financial
+    # knowledge base by keywords, then by similarity. A request resumed on
+    # the model executor has already found none.
+    if not resumed():
+        response = factual_response(message)
+        if response:
+            return response
+        offload('model')
+
+    # If no factual response, generate a conversational response; with a
+    # session_id the model also sees the earlier turns of the dialogue
+    intents.inc('generated')
     try:
-        response = chatbot(message, max_length=150, num_return_sequences=1)[0]['generated_text']
+        with stage('generate'):
+            if session_id:
+                pipe = chatbot.get()
+                return conversations.reply(session_id, message.text, pipe.model, pipe.tokenizer)
+            response = generation_scheduler.generate(message.text, **ONE_OFF_OPTIONS)
         return response
     except Exception as e:
         return f"I'm sorry, I encountered an error: {str(e)}"
 
+def factual_responses(messages):
+    """The factual answers among messages, and the distinct messages left for the model"""
+    unique = {text: as_message(text) for text in messages}
+    answers = {}
+    # One dataset snapshot for the whole batch, even if a reload lands mid-way
+    data_processor = get_data_processor()
+    for text, message in unique.items():
+        response = process_debt_query(message, data_processor) or process_financial_query(message)
+        if response:
+            answers[text] = response
+
+    pending = [text for text in unique if text not in answers]
+    if pending:
+        for text, response in zip(pending, retrieve_knowledge_batch([unique[text] for text in pending])):
+            if response:
+                answers[text] = response
+
+    prompts = [text for text in pending if text not in answers]
+    if prompts:
+        offload('model', (answers, prompts))
+    return answers, prompts
+
+def generate_responses(messages):
+    """Answer many one-off messages in order, like generate_response without a session.
+
+    Each distinct message is answered once. Those without a keyword answer
+    are scored against the knowledge index together, and the rest go
+    through the model in one generate call, padded into batches of
+    GENERATION_MAX_BATCH.
+    """
+    # Resumed on the model executor with the factual answers found inline
+    answers, prompts = resumed() or factual_responses(messages)
+    if prompts:
+        intents.inc('generated', len(prompts))
+        try:
+            with stage('generate'):
+                generated = generate_batch(prompts, batch_size=generation_scheduler.max_batch_size,
+                                           **ONE_OFF_OPTIONS)
+            answers.update(zip(prompts, generated))
+        except Exception as e:
+            answers.update((text, f"I'm sorry, I encountered an error: {str(e)}") for text in prompts)
+
+    return [answers[text] for text in messages]
+
+@app.route('/api/cache', methods=['GET'])
+def cache_stats():
+    return jsonify(response_cache.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Stage latencies, intents and cache statistics in Prometheus text format"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+@app.route('/api/profiles', methods=['GET'])
+def profiles():
+    """Sampled stacks of the latest requests sent with X-Profile: 1 (PROFILE_REQUESTS=true)"""
+    return jsonify({"enabled": profiler.enabled, "profiles": profiler.recent()})
+
+def stream_response(message, session_id=None):
+    """Yield the answer in pieces: factual answers whole, generated ones as tokens are decoded"""
+    message = as_message(message)
+    if not resumed():
+        response = factual_response(message)
+        if response:
+            yield response
+            return
+        offload('model')
+
+    intents.inc('generated')
+    pipe = chatbot.get()
+    if session_id:
+        yield from conversations.stream_reply(session_id, message.text, pipe.model, pipe.tokenizer)
+    else:
+        # One-off message: decode token by token instead of through the batch
+        # scheduler, to the same text as ONE_OFF_OPTIONS gives
+        yield from stream_completion(message.text, pipe.model, pipe.tokenizer, **ONE_OFF_OPTIONS)
+
+def server_sent_event(payload):
+    return f"data: {json.dumps(payload)}\n\n"
+
+def chat_events(message, session_id):
+    """Stream a chat answer as server-sent events, ending with the full response"""
+    pieces = []
+    try:
+        for piece in stream_response(message, session_id):
+            pieces.append(piece)
+            yield server_sent_event({"token": piece})
+        yield server_sent_event({"response": ''.join(pieces), "status": "success", "done": True})
+    except Exception as e:
+        yield server_sent_event({"error": str(e), "status": "error", "done": True})
+
 @app.route('/api/chat', methods=['POST'])
+@profiler.wrap
 def chat():
     try:
         data = request.get_json()
@@ -282,19 +580,71 @@ def chat():
             return jsonify({"error": "No message provided"}), 400
 
         message = data['message']
-        response = generate_response(message)
+        # Opt-in streaming: {"stream": true} answers with server-sent events
+        if data.get('stream'):
+            return Response(stream_with_context(chat_events(message, data.get('session_id'))),
+                            mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+        with stage('request'):
+            response = generate_response(message, data.get('session_id'))
+
+            with stage('format'):
+                return jsonify({
+                    "response": response,
+                    "status": "success"
+                })
         
+    except Exception as e:
         return jsonify({
-            "response": response,
-            "status": "success"
-        })
-        
+            "error": str(e),
+            "status": "error"
+        }), 500
+
+@app.route('/api/chat/batch', methods=['POST'])
+@profiler.wrap
+def chat_batch():
+    """Answer many messages in one request: {"messages": [...]} -> {"results": [...]}, in order.
+
+    Each message costs one token of the client's batch budget (BATCH_RATE_LIMIT
+    messages per BATCH_RATE_LIMIT_PERIOD).
+    """
+    try:
+        data = request.get_json()
+        messages = data.get('messages') if isinstance(data, dict) else None
+        if not isinstance(messages, list) or not messages:
+            return jsonify({"error": "messages must be a non-empty list", "status": "error"}), 400
+        max_messages = min(MAX_BATCH_MESSAGES, batch_limiter.capacity)
+        if len(messages) > max_messages:
+            return jsonify({"error": f"At most {max_messages} messages per request", "status": "error"}), 400
+        # Charged once, not again when the batch is resumed on the model executor
+        if not resumed():
+            limited = batch_limiter.check(cost=len(messages))
+            if limited:
+                return limited
+
+        valid = [message for message in messages if message and isinstance(message, str)]
+        answers = iter(generate_responses(valid) if valid else [])
+        results = [{"response": next(answers), "status": "success"} if message and isinstance(message, str)
+                   else {"error": "Invalid message format", "status": "error"}
+                   for message in messages]
+        with stage('format'):
+            return jsonify({"results": results, "status": "success"})
+
     except Exception as e:
         return jsonify({
             "error": str(e),
             "status": "error"
         }), 500
 
+# ASGI entry point: rule-based answers inline, generation on a bounded pool.
+# The knowledge index is built before serving rather than on the event loop,
+# and batch rate limits stay in memory rather than behind file locks.
+asgi_app = AsyncServer(app, warm_up=(knowledge_index.get,), on_start=(batch_limiter.keep_in_memory,))
+
 if __name__ == '__main__':
     print("Starting enhanced financial chatbot server...")
-    app.run(debug=True, port=5000, host='0.0.0.0') 
\ No newline at end of file
+    if os.getenv('SERVER_MODE') == 'asgi':
+        serve(asgi_app, host='0.0.0.0', port=5000)
+    else:
+        app.run(debug=True, port=5000, host='0.0.0.0') 
\ No newline at end of file